@@ -0,0 +1,45 @@
+# archive.py
+# Compressed on-disk archive of the raw matchCentreData payloads, one gzip JSON file per match_id
+import gzip
+import json
+import os
+import threading
+from datetime import datetime
+
+ARCHIVE_DIR = os.getenv('RAW_ARCHIVE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'raw_archive'))
+
+
+def archive_path(match_id, archive_dir=ARCHIVE_DIR):
+    return os.path.join(archive_dir, f"{match_id}.json.gz")
+
+
+def save_raw_match(match_id, competition, url, matchdict, archive_dir=ARCHIVE_DIR):
+    os.makedirs(archive_dir, exist_ok=True)
+    record = {
+        'match_id': match_id,
+        'competition': competition,
+        'url': url,
+        'scraped_at': datetime.utcnow().isoformat(timespec='seconds'),
+        'matchCentreData': matchdict
+    }
+    # Write to a temporary file first so a crash never leaves a truncated archive entry
+    path = archive_path(match_id, archive_dir)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"  # Unique per writer, one match can be fetched twice at once
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+        json.dump(record, f, separators=(',', ':'))
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_raw_match(match_id, archive_dir=ARCHIVE_DIR):
+    with gzip.open(archive_path(match_id, archive_dir), 'rt', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def archived_match_ids(archive_dir=ARCHIVE_DIR):
+    if not os.path.isdir(archive_dir):
+        return []
+    return sorted(
+        int(name[:-len('.json.gz')]) for name in os.listdir(archive_dir)
+        if name.endswith('.json.gz') and name[:-len('.json.gz')].isdigit()
+    )
@@ -0,0 +1,597 @@
+# benchmark.py
+# Micro-benchmarks for the scraping/preprocessing pipeline.
+# Run with: python benchmark.py <benchmark> [options]
+import argparse
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+import pandas as pd
+from utilities import preprocess_events
+
+
+# Saved match pages checked in for the parse benchmark and the tests, rewritten by `benchmark.py fixtures`
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tests', 'fixtures', 'match_pages')
+FIXTURE_EVENTS = 150  # Events per saved page, kept small so the corpus stays small
+FIXTURE_MATCHES = [
+    (1821060, 'Spain-LaLiga-2024-2025-Valencia-Barcelona', 53, 65),
+    (1821071, 'Spain-LaLiga-2024-2025-Barcelona-Athletic-Club', 65, 53),
+    (1839402, 'Europe-Champions-League-2024-2025-Monaco-Barcelona', 53, 65),
+]
+
+
+EVENT_TYPES = [
+    ('Pass', 1, 0.55), ('BallRecovery', 49, 0.05), ('Tackle', 7, 0.03), ('Aerial', 44, 0.04),
+    ('TakeOn', 3, 0.03), ('Clearance', 12, 0.04), ('Interception', 8, 0.02), ('Foul', 4, 0.03),
+    ('BallTouch', 61, 0.06), ('Dispossessed', 50, 0.02), ('SavedShot', 15, 0.01),
+    ('MissedShots', 13, 0.01), ('ShotOnPost', 14, 0.002), ('Goal', 16, 0.003),
+    ('CornerAwarded', 6, 0.02), ('Card', 17, 0.003), ('KeeperPickup', 52, 0.01),
+]
+
+
+def _display(value, name):
+    return {'value': value, 'displayName': name}
+
+
+def make_match_centre_data(match_id, n_events=1800, seed=0, home_team_id=65, away_team_id=53):
+    """Build a synthetic matchCentreData payload shaped like the WhoScored one."""
+    rng = random.Random(seed + match_id)
+    names, values, weights = zip(*EVENT_TYPES)
+
+    def team(team_id, name):
+        players = [
+            {'playerId': team_id * 1000 + n, 'name': f"{name} Player {n}", 'shirtNo': n,
+             'position': 'Sub' if n > 11 else 'FW', 'age': 20 + n, 'stats': {'ratings': {'0': 6.0}}}
+            for n in range(1, 19)
+        ]
+        return {
+            'teamId': team_id, 'name': name, 'countryName': 'Spain', 'managerName': f"{name} Manager",
+            'scores': {'halftime': 1, 'fulltime': 2},
+            'stats': {key: {'0': rng.randint(0, 5), '1': rng.randint(0, 5)} for key in [
+                'shotsTotal', 'shotsOnTarget', 'possession', 'passesTotal', 'passesAccurate',
+                'foulsCommited', 'cornersTotal', 'offsidesCaught']},
+            'players': players,
+        }
+
+    events = [{'id': match_id * 10000.0, 'eventId': 1, 'minute': 0, 'second': 0, 'teamId': home_team_id,
+               'period': _display(1, 'FirstHalf'), 'type': _display(32, 'Start'),
+               'outcomeType': _display(1, 'Successful'), 'qualifiers': [], 'isTouch': False}]
+    for n in range(1, n_events):
+        minute = n * 95 // n_events
+        team_id = rng.choice([home_team_id, away_team_id])
+        type_index = rng.choices(range(len(names)), weights=weights)[0]
+        event = {
+            'id': match_id * 10000.0 + n,
+            'eventId': n,
+            'minute': minute,
+            'second': rng.randint(0, 59),
+            'teamId': team_id,
+            'playerId': team_id * 1000 + rng.randint(1, 11),
+            'x': round(rng.uniform(0, 100), 1),
+            'y': round(rng.uniform(0, 100), 1),
+            'period': _display(1, 'FirstHalf') if minute < 45 else _display(2, 'SecondHalf'),
+            'type': _display(values[type_index], names[type_index]),
+            'outcomeType': _display(1, 'Successful') if rng.random() < 0.8 else _display(0, 'Unsuccessful'),
+            'qualifiers': [{'type': _display(56, 'Zone'), 'value': 'Center'}],
+            'satisfiedEventsTypes': [rng.randint(0, 200) for _ in range(4)],
+            'isTouch': True,
+        }
+        if names[type_index] == 'Pass':
+            event['endX'] = round(rng.uniform(0, 100), 1)
+            event['endY'] = round(rng.uniform(0, 100), 1)
+        if names[type_index] in ('SavedShot', 'MissedShots', 'ShotOnPost', 'Goal'):
+            event['isShot'] = True
+            event['goalMouthY'] = round(rng.uniform(40, 60), 1)
+            event['goalMouthZ'] = round(rng.uniform(0, 40), 1)
+            if names[type_index] == 'Goal':
+                event['isGoal'] = True
+        if names[type_index] == 'Card':
+            event['cardType'] = _display(31, 'Yellow')
+        events.append(event)
+
+    # One substitution per team so the pass networks have a cutoff
+    for n, (team_id, minute) in enumerate([(home_team_id, 58), (away_team_id, 64)]):
+        for offset, (name, value) in enumerate([('SubstitutionOff', 18), ('SubstitutionOn', 19)]):
+            events.append({
+                'id': match_id * 10000.0 + n_events + 2 * n + offset, 'eventId': n_events + 2 * n + offset,
+                'minute': minute, 'second': 0, 'teamId': team_id,
+                'playerId': team_id * 1000 + (11 if name == 'SubstitutionOff' else 12),
+                'period': _display(2, 'SecondHalf'), 'type': _display(value, name),
+                'outcomeType': _display(1, 'Successful'), 'qualifiers': [], 'isTouch': False,
+            })
+
+    team_names = {65: 'Barcelona'}
+    return {
+        'startTime': '2024-08-17T19:30:00',
+        'home': team(home_team_id, team_names.get(home_team_id, 'Valencia')),
+        'away': team(away_team_id, team_names.get(away_team_id, 'Valencia')),
+        'events': events,
+    }
+
+
+def make_raw_events(n_matches=60, events_per_match=1800, competition='La Liga'):
+    """Raw event records as scrape_match_data hands them to preprocess_events."""
+    all_events = []
+    for match_id in range(1, n_matches + 1):
+        matchdict = make_match_centre_data(match_id, events_per_match)
+        for event in matchdict['events']:
+            all_events.append({'competition': competition, 'match_id': match_id, **event})
+    return all_events
+
+
+def render_match_page(match_id, matchdict):
+    # Synthetic page, mirroring the script block WhoScored embeds matchCentreData in
+    return (
+        "<!DOCTYPE html>\n<html>\n<head><title>Match Centre</title></head>\n<body>\n"
+        "<div id=\"match-centre\"></div>\n"
+        "<script type=\"text/javascript\">\n"
+        "        require.config.params[\"args\"] = {\n"
+        f"            matchId: {match_id},\n"
+        f"            matchCentreData: {json.dumps(matchdict, separators=(',', ':'))},\n"
+        "            matchCentreEventTypeJson: {\"pass\":1,\"goal\":16},\n"
+        "            formationIdNameMappings: {\"2\":\"442\"}\n"
+        "        };\n"
+        "</script>\n</body>\n</html>\n"
+    )
+
+
+def write_fixture_pages(directory=FIXTURES_DIR, events_per_match=1800):
+    # Saved match pages plus the fixtures page linking to them
+    os.makedirs(directory, exist_ok=True)
+    links = []
+    for match_id, slug, home_team_id, away_team_id in FIXTURE_MATCHES:
+        matchdict = make_match_centre_data(match_id, events_per_match, home_team_id=home_team_id,
+                                           away_team_id=away_team_id)
+        with open(os.path.join(directory, f"{match_id}.html"), 'w') as f:
+            f.write(render_match_page(match_id, matchdict))
+        links.append(f"<a href=\"/Matches/{match_id}/Live/{slug}\">{slug}</a>")
+    with open(os.path.join(directory, 'fixtures.html'), 'w') as f:
+        f.write("<!DOCTYPE html>\n<html>\n<body>\n" + "\n".join(links) + "\n</body>\n</html>\n")
+
+
+class FixtureRequestHandler(SimpleHTTPRequestHandler):
+    # /Matches/<id>/... serves <id>.html, anything else serves the fixtures page
+    def translate_path(self, path):
+        match = re.match(r"/Matches/(\d+)/", path)
+        page = f"{match.group(1)}.html" if match else 'fixtures.html'
+        return os.path.join(self.directory, page)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def fixture_pages(directory=None, events_per_match=1800):
+    # Yields `directory`, or a temporary one the match pages are generated into when it is None
+    if directory is not None:
+        yield directory
+        return
+    with tempfile.TemporaryDirectory() as directory:
+        write_fixture_pages(directory, events_per_match)
+        yield directory
+
+
+@contextmanager
+def serve_fixtures(directory=None):
+    """Serve the match pages in `directory` (generated when None) on a local port, yields the fixtures page URL."""
+    with fixture_pages(directory) as directory:
+        handler = lambda *args, **kwargs: FixtureRequestHandler(*args, directory=directory, **kwargs)
+        server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            yield f"http://127.0.0.1:{server.server_address[1]}/Teams/65/Fixtures/Spain-Barcelona"
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+def _legacy_preprocess_events(all_events):
+    # Row-wise implementation kept as the baseline for the preprocess benchmark
+    events_df = pd.DataFrame(all_events)
+    required_columns = {
+        'competition': None, 'match_id': None, 'id': None, 'eventId': None, 'minute': 0, 'second': 0,
+        'teamId': None, 'period': None, 'playerId': None, 'type': None, 'outcomeType': None,
+        'x': 0.0, 'y': 0.0, 'endX': 0.0, 'endY': 0.0, 'goalMouthZ': 0.0, 'goalMouthY': 0.0,
+        'isTouch': False, 'isShot': False, 'isGoal': False, 'cardType': None, 'isOwnGoal': False
+    }
+    for col, default_value in required_columns.items():
+        if col not in events_df:
+            events_df[col] = default_value
+    events_df = events_df.dropna(subset=['playerId'])
+    for col in ['period', 'type', 'outcomeType', 'cardType']:
+        events_df[col] = events_df[col].apply(lambda x: x['displayName'] if isinstance(x, dict) else x)
+    for col in ['minute', 'second', 'x', 'y', 'endX', 'endY', 'goalMouthZ', 'goalMouthY']:
+        events_df[col] = pd.to_numeric(events_df[col], errors='coerce').fillna(0).astype(float)
+    for col in ['isTouch', 'isShot', 'isGoal', 'isOwnGoal']:
+        events_df[col] = events_df[col].astype(bool)
+    events_df = events_df[[
+        'competition', 'match_id', 'id', 'eventId', 'minute', 'second', 'teamId', 'period',
+        'playerId', 'type', 'outcomeType', 'x', 'y', 'endX', 'endY',
+        'goalMouthZ', 'goalMouthY', 'isTouch', 'isShot', 'isGoal', 'cardType', 'isOwnGoal'
+    ]]
+    events_df['total_seconds'] = events_df['minute'] * 60 + events_df['second']
+    events_df = events_df.sort_values(by=['match_id', 'total_seconds'])
+    events_df['passer'] = events_df.apply(lambda row: row['playerId'] if row['type'] == 'Pass' else None, axis=1)
+    successful_passes = events_df[(events_df['type'] == 'Pass') & (events_df['outcomeType'] == 'Successful')].copy()
+    successful_passes['recipient'] = successful_passes['playerId'].shift(-1)
+    events_df = pd.merge(
+        events_df, successful_passes[['id', 'total_seconds', 'type', 'recipient']],
+        how='left', on=['id', 'total_seconds', 'type']
+    )
+    events_df['passer'] = events_df['passer'].astype(pd.Int64Dtype())
+    events_df['recipient'] = events_df['recipient'].astype(pd.Int64Dtype())
+    return events_df
+
+
+def _best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def bench_preprocess(args):
+    all_events = make_raw_events(args.matches, args.events)
+    print(f"Preprocessing {len(all_events):,} raw events ({args.matches} matches, best of {args.repeat})")
+
+    legacy_time, _ = _best_of(lambda: _legacy_preprocess_events(all_events), args.repeat)
+    current_time, events_df = _best_of(lambda: preprocess_events(all_events), args.repeat)
+
+    print(f"  before (row-wise): {legacy_time:8.3f}s  {len(all_events) / legacy_time:12,.0f} events/s")
+    print(f"  after (columnar):  {current_time:8.3f}s  {len(all_events) / current_time:12,.0f} events/s")
+    print(f"  speed-up: {legacy_time / current_time:.1f}x, {len(events_df):,} events out")
+
+
+def bench_scrape_pool(args):
+    # Runs the real worker pool (headless Chrome or HTTP sessions) against the local fixture server
+    from fetchers import fetcher_factory
+    from scraper import TokenBucket, extract_match_urls, scrape_matches_parallel
+
+    create_fetcher = fetcher_factory(args.fetcher)
+    with serve_fixtures() as base_url, tempfile.TemporaryDirectory() as archive_dir:
+        fetcher = create_fetcher()
+        laliga_urls, champions_league_urls = extract_match_urls(fetcher, base_url)
+        fetcher.close()
+        urls = [(url, "La Liga") for url in laliga_urls] + [(url, "Champions League") for url in champions_league_urls]
+        jobs = [
+            (int(re.search(r"Matches/(\d+)/", url).group(1)), url, competition)
+            for url, competition in urls * args.pages
+        ][:args.pages]
+
+        print(f"Scraping {len(jobs)} pages with {args.workers} {args.fetcher} workers at {args.rate} pages/s")
+        start = time.perf_counter()
+        scraped = 0
+        for match_id, competition, result, error in scrape_matches_parallel(
+                jobs, args.workers, TokenBucket(args.rate), create_fetcher, archive_dir):
+            scraped += result is not None
+        elapsed = time.perf_counter() - start
+
+    print(f"  {scraped}/{len(jobs)} pages in {elapsed:.2f}s ({len(jobs) / elapsed:.2f} pages/s, limit {args.rate})")
+
+
+def _legacy_write(db, matches_df, teams_df, players_df, events_df):
+    # insert_many for matches/players/events and one update_one round-trip per team
+    from utilities import convert_to_json
+    matches_data, teams_data, players_data, events_data = convert_to_json(matches_df, teams_df, players_df, events_df)
+    for doc in events_data:
+        doc.pop('_id', None)
+    db.matches.insert_many(matches_data)
+    for team in teams_data:
+        db.teams.update_one({"_id": team["_id"]}, {"$set": team}, upsert=True)
+    db.players.insert_many(players_data)
+    db.events.insert_many(events_data)
+
+
+def bench_writes(args):
+    from scraper import build_match_data
+    from storage import write_match_data
+
+    if args.mongo_uri:
+        from pymongo import MongoClient
+        client = MongoClient(args.mongo_uri)
+    else:
+        import mongomock
+        client = mongomock.MongoClient()
+    legacy_db, db = client['bench_legacy'], client['bench_bulk']
+    for name in (legacy_db.name, db.name):
+        client.drop_database(name)
+
+    matches = [
+        build_match_data(make_match_centre_data(match_id, args.events), match_id, 'La Liga')
+        for match_id in range(1, args.matches + 1)
+    ]
+    n_events = sum(len(frames[3]) for frames in matches)
+    print(f"Writing {args.matches} matches ({n_events:,} events) to {'mongod' if args.mongo_uri else 'mongomock'}")
+
+    def timed(func):
+        start = time.perf_counter()
+        for frames in matches:
+            func(*frames)
+        return time.perf_counter() - start
+
+    legacy_time = timed(lambda *frames: _legacy_write(legacy_db, *frames))
+    first_time = timed(lambda *frames: write_match_data(db, *frames))
+    again_time = timed(lambda *frames: write_match_data(db, *frames))
+
+    print(f"  insert_many + update_one:  {legacy_time:8.3f}s  {n_events / legacy_time:12,.0f} events/s")
+    print(f"  bulk upsert (first):       {first_time:8.3f}s  {n_events / first_time:12,.0f} events/s")
+    print(f"  bulk upsert (re-ingest):   {again_time:8.3f}s  {n_events / again_time:12,.0f} events/s")
+    print(f"  events stored: {db.events.count_documents({}):,} (re-ingest added no duplicates)")
+    if not args.mongo_uri:
+        print("  mongomock scans the collection on every upsert, time the write paths with --mongo-uri")
+    for name in (legacy_db.name, db.name):
+        client.drop_database(name)
+
+
+def _legacy_safe_to_dict(df):
+    # One lambda call per cell, then to_dict
+    return df.applymap(lambda x: None if pd.isna(x) else x).to_dict(orient='records')
+
+
+def bench_serialize(args):
+    # DataFrame -> MongoDB documents for a season of events
+    from scraper import build_match_data
+    from utilities import compact_events, iter_documents
+
+    events_df = compact_events(pd.concat([
+        build_match_data(make_match_centre_data(match_id, args.events), match_id, 'La Liga')[3]
+        for match_id in range(args.matches)
+    ], ignore_index=True))
+    print(f"Serializing {len(events_df):,} events ({args.matches} matches, best of {args.repeat})")
+
+    legacy_time, legacy_docs = _best_of(lambda: _legacy_safe_to_dict(events_df), args.repeat)
+    current_time, batches = _best_of(lambda: list(iter_documents(events_df, args.batch_size)), args.repeat)
+    documents = [document for batch in batches for document in batch]
+    # The old path keeps the float32 rounding error and lets NaN through for nullable integers
+    same = all(
+        doc.keys() == legacy.keys() and all(
+            value == legacy[key] or (value is None and pd.isna(legacy[key])) or
+            (isinstance(value, float) and abs(value - legacy[key]) < 1e-4)
+            for key, value in doc.items()
+        ) for doc, legacy in zip(documents, legacy_docs)
+    )
+
+    print(f"  before (applymap):  {legacy_time:8.3f}s  {len(events_df) / legacy_time:12,.0f} events/s")
+    print(f"  after (columnar):   {current_time:8.3f}s  {len(events_df) / current_time:12,.0f} events/s")
+    print(f"  speed-up: {legacy_time / current_time:.1f}x, {len(batches)} batches, same documents: {same}")
+
+
+def _rss_mb(pid='self'):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def bench_render_soak(args):
+    # Simulated dashboard reruns with the figure cache disabled, so every rerun renders all six figures
+    from scraper import build_match_data
+    from utilities import build_pass_networks
+    from data_loader import pass_network_frames
+    from figure_cache import create_render_pool, render_match_figures
+    from visualizations import (
+        plot_pass_network, create_shotmap, create_match_stats_graph_dynamic, create_momentum_graph
+    )
+    import matplotlib.pyplot as plt
+
+    matches_df, _, players_df, events_df = build_match_data(make_match_centre_data(1, args.events), 1, 'La Liga')
+    pass_networks = pass_network_frames(build_pass_networks(events_df, players_df))
+    nodes_df, edges_df = pass_networks
+
+    def legacy_rerun():
+        # What dashboard.py did before: six figures per rerun, none of them closed
+        for team_id in (65, 53):
+            plot_pass_network(nodes_df[nodes_df['team_id'] == team_id], edges_df[edges_df['team_id'] == team_id])
+        create_match_stats_graph_dynamic(matches_df, 1)
+        create_momentum_graph(events_df, 1, 65, 53, interval=3)
+        for team_id in (65, 53):
+            fig, ax = plt.subplots(figsize=(6, 4))
+            create_shotmap(events_df, 1, team_id, ax)
+
+    if args.legacy:
+        print(f"Legacy in-process rendering, {args.reruns} reruns")
+        for rerun in range(1, args.reruns + 1):
+            legacy_rerun()
+            if rerun % args.report_every == 0:
+                print(f"  rerun {rerun:5d}: dashboard RSS {_rss_mb():8.1f} MB, open figures {len(plt.get_fignums())}")
+        return
+
+    print(f"Render pool with {args.workers} workers, {args.reruns} reruns")
+    with create_render_pool(args.workers) as pool:
+        start = time.perf_counter()
+        for rerun in range(1, args.reruns + 1):
+            render_match_figures(matches_df, events_df, pass_networks, 1, cache_dir=None, pool=pool)
+            if rerun % args.report_every == 0:
+                workers_rss = sum(_rss_mb(pid) for pid in pool.worker_pids())
+                print(f"  rerun {rerun:5d}: dashboard RSS {_rss_mb():8.1f} MB, workers RSS {workers_rss:8.1f} MB, "
+                      f"{(time.perf_counter() - start) / rerun:.2f}s/rerun")
+
+
+def bench_render(args):
+    # Time to draw and encode each dashboard figure of one match, no cache and no pool
+    from scraper import build_match_data
+    from utilities import build_pass_networks
+    from data_loader import pass_network_frames
+    from figure_cache import figure_specs, render_png
+
+    matches_df, _, players_df, events_df = build_match_data(make_match_centre_data(1, args.events), 1, 'La Liga')
+    pass_networks = pass_network_frames(build_pass_networks(events_df, players_df))
+    print(f"Best of {args.repeat} renders, {len(events_df)} events, {args.profile} profile")
+    for name, function_name, _, params, render_args in figure_specs(matches_df, events_df, pass_networks, 1, args.profile):
+        seconds, png = _best_of(lambda: render_png(function_name, render_args, params), args.repeat)
+        print(f"  {name:20s} {seconds * 1000:8.1f} ms  {len(png) / 1024:8.1f} KiB")
+
+
+def bench_chains(args):
+    # Possession chain segmentation and summaries over a season of synthetic matches
+    from scraper import build_match_data
+    from utilities import build_possession_chains, possession_chain_ids
+
+    events_df = pd.concat([
+        build_match_data(make_match_centre_data(match_id, args.events), match_id, 'La Liga')[3]
+        for match_id in range(args.matches)
+    ], ignore_index=True)
+    segment_time, chain_ids = _best_of(lambda: possession_chain_ids(events_df), args.repeat)
+    summary_time, chains = _best_of(lambda: build_possession_chains(events_df), args.repeat)
+    print(f"{args.matches} matches, {len(events_df)} events, {len(chains)} chains")
+    print(f"  segmentation: {segment_time:.3f}s ({len(events_df) / segment_time:,.0f} events/s)")
+    print(f"  summaries:    {summary_time:.3f}s")
+
+
+# Events dtypes before the compact schema, see utilities.EVENT_SCHEMA
+LEGACY_EVENT_DTYPES = {
+    'competition': 'object', 'match_id': 'int64', 'event_type_id': 'float64', 'minute': 'float64',
+    'second': 'float64', 'team_id': 'int64', 'period': 'object', 'player_id': 'float64', 'type': 'object',
+    'type_outcome': 'object', 'x': 'float64', 'y': 'float64', 'end_x': 'float64', 'end_y': 'float64',
+    'goal_mouth_z': 'float64', 'goal_mouth_y': 'float64', 'card_type': 'object', 'total_seconds': 'float64',
+    'passer': 'Int64', 'recipient': 'Int64', 'chain_id': 'Int64',
+}
+
+
+def bench_memory(args):
+    # Bytes per event of a season of preprocessed events and of the dashboard's projection of it
+    from scraper import build_match_data
+    from data_loader import EVENT_FIELDS
+    from utilities import compact_events
+
+    # Matches concatenate to object columns when their categories differ
+    events_df = compact_events(pd.concat([
+        build_match_data(make_match_centre_data(match_id, args.events), match_id, 'La Liga')[3]
+        for match_id in range(args.matches)
+    ], ignore_index=True))
+    legacy_df = events_df.astype(LEGACY_EVENT_DTYPES)
+    print(f"{args.matches} matches, {len(events_df):,} events")
+    for label, df in [('preprocessed', events_df), ('dashboard', events_df[[c for c in EVENT_FIELDS if c in events_df]])]:
+        before = legacy_df[df.columns].memory_usage(deep=True).sum()
+        after = df.memory_usage(deep=True).sum()
+        print(f"  {label:12s} before: {before / len(df):7.1f} bytes/event  after: {after / len(df):7.1f} bytes/event  "
+              f"({before / after:.1f}x, {after / 2 ** 20:.1f} MiB)")
+
+
+def _legacy_extract_match_centre_data(page):
+    # Full html.parser DOM, a :-soup-contains search over the scripts and a split on the text
+    from bs4 import BeautifulSoup
+    element = BeautifulSoup(page, 'html.parser').select_one('script:-soup-contains("matchCentreData")')
+    return json.loads(element.text.split("matchCentreData: ")[1].split(',\n')[0])
+
+
+def bench_parse(args):
+    # matchCentreData extraction from the saved match pages, or from full-size generated ones
+    import scraper
+
+    pages = []
+    with fixture_pages(None if args.generate else args.pages_dir, args.generate) as pages_dir:
+        for name in sorted(os.listdir(pages_dir)):
+            if re.fullmatch(r"\d+\.html", name):
+                with open(os.path.join(pages_dir, name), encoding='utf-8') as f:
+                    pages.append(f.read())
+    size = sum(len(page) for page in pages)
+    print(f"Parsing {len(pages)} match pages ({size / 2 ** 20:.1f} MiB, best of {args.repeat})")
+
+    def parse_all(extract):
+        return [extract(page) for page in pages]
+
+    legacy_time, legacy = _best_of(lambda: parse_all(_legacy_extract_match_centre_data), args.repeat)
+    current_time, current = _best_of(lambda: parse_all(scraper.extract_match_centre_data), args.repeat)
+    timings = [('before (BeautifulSoup)', legacy_time), ('after (str.find + orjson)', current_time)]
+    if scraper.orjson is not None:
+        orjson, scraper.orjson = scraper.orjson, None
+        try:
+            timings.append(('after (str.find + json)', _best_of(lambda: parse_all(scraper.extract_match_centre_data), args.repeat)[0]))
+        finally:
+            scraper.orjson = orjson
+    else:
+        timings[1] = ('after (str.find + json)', current_time)
+
+    for label, seconds in timings:
+        print(f"  {label:26s} {seconds / len(pages) * 1000:8.1f} ms/page  {size / seconds / 2 ** 20:8.1f} MiB/s")
+    print(f"  speed-up: {legacy_time / current_time:.1f}x, same payloads: {legacy == current}")
+
+
+def bench_fixtures(args):
+    write_fixture_pages(args.pages_dir, args.events)
+    print(f"Wrote {len(FIXTURE_MATCHES)} match pages to {args.pages_dir}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pipeline benchmarks")
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    preprocess_parser = subparsers.add_parser('preprocess', help="preprocess_events throughput")
+    preprocess_parser.add_argument('--matches', type=int, default=60)
+    preprocess_parser.add_argument('--events', type=int, default=1800, help="events per match")
+    preprocess_parser.add_argument('--repeat', type=int, default=3)
+    preprocess_parser.set_defaults(func=bench_preprocess)
+
+    pool_parser = subparsers.add_parser('scrape-pool', help="scraper worker pool against local fixtures")
+    pool_parser.add_argument('--pages', type=int, default=12)
+    pool_parser.add_argument('--workers', type=int, default=4)
+    pool_parser.add_argument('--rate', type=float, default=2.0, help="page loads per second")
+    pool_parser.add_argument('--fetcher', choices=['selenium', 'http'], default='selenium')
+    pool_parser.set_defaults(func=bench_scrape_pool)
+
+    writes_parser = subparsers.add_parser('writes', help="MongoDB write path")
+    writes_parser.add_argument('--matches', type=int, default=10)
+    writes_parser.add_argument('--events', type=int, default=1800, help="events per match")
+    writes_parser.add_argument('--mongo-uri', help="local mongod to write to, mongomock when omitted")
+    writes_parser.set_defaults(func=bench_writes)
+
+    serialize_parser = subparsers.add_parser('serialize', help="events DataFrame to MongoDB documents")
+    serialize_parser.add_argument('--matches', type=int, default=38)
+    serialize_parser.add_argument('--events', type=int, default=1800, help="events per match")
+    serialize_parser.add_argument('--batch-size', type=int, default=1000)
+    serialize_parser.add_argument('--repeat', type=int, default=3)
+    serialize_parser.set_defaults(func=bench_serialize)
+
+    soak_parser = subparsers.add_parser('render-soak', help="memory over repeated dashboard renders")
+    soak_parser.add_argument('--reruns', type=int, default=1000)
+    soak_parser.add_argument('--workers', type=int, default=2)
+    soak_parser.add_argument('--events', type=int, default=1800, help="events in the rendered match")
+    soak_parser.add_argument('--report-every', type=int, default=50)
+    soak_parser.add_argument('--legacy', action='store_true', help="render in-process without closing figures")
+    soak_parser.set_defaults(func=bench_render_soak)
+
+    render_parser = subparsers.add_parser('render', help="render time of each dashboard figure")
+    render_parser.add_argument('--events', type=int, default=1800, help="events in the rendered match")
+    render_parser.add_argument('--repeat', type=int, default=5)
+    render_parser.add_argument('--profile', choices=['thumbnail', 'dashboard', 'print'], default='dashboard')
+    render_parser.set_defaults(func=bench_render)
+
+    chains_parser = subparsers.add_parser('chains', help="possession chain segmentation over a season")
+    chains_parser.add_argument('--matches', type=int, default=38)
+    chains_parser.add_argument('--events', type=int, default=1800, help="events per match")
+    chains_parser.add_argument('--repeat', type=int, default=3)
+    chains_parser.set_defaults(func=bench_chains)
+
+    memory_parser = subparsers.add_parser('memory', help="memory footprint of the events frame")
+    memory_parser.add_argument('--matches', type=int, default=38)
+    memory_parser.add_argument('--events', type=int, default=1800, help="events per match")
+    memory_parser.set_defaults(func=bench_memory)
+
+    parse_parser = subparsers.add_parser('parse', help="matchCentreData extraction from the match pages")
+    parse_parser.add_argument('--pages-dir', default=FIXTURES_DIR, help="saved match pages")
+    parse_parser.add_argument('--generate', type=int, metavar='EVENTS',
+                              help="time generated pages of EVENTS events per match instead")
+    parse_parser.add_argument('--repeat', type=int, default=5)
+    parse_parser.set_defaults(func=bench_parse)
+
+    fixtures_parser = subparsers.add_parser('fixtures', help="rewrite the saved synthetic match pages")
+    fixtures_parser.add_argument('--pages-dir', default=FIXTURES_DIR)
+    fixtures_parser.add_argument('--events', type=int, default=FIXTURE_EVENTS, help="events per match")
+    fixtures_parser.set_defaults(func=bench_fixtures)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
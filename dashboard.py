@@ -1,177 +1,255 @@
 import streamlit as st
 import pandas as pd
-from data_loader import load_data_from_mongo
-from visualizations import plot_pass_network, create_shotmap, create_match_stats_graph_dynamic, create_momentum_graph
-from utilities import load_and_resize_logo
+from data_loader import (
+    DB_NAME, MatchCache, get_mongo_uri, load_live_momentum, load_match, load_match_data, load_matches,
+    load_pass_networks, load_shot_events,
+)
+from figure_cache import create_render_pool, momentum_metric, render_match_figures, stored_data_version
+from logos import load_logo_manifest, team_logo
+from visualizations import MOMENTUM_LABELS
 from datetime import datetime
-import matplotlib.pyplot as plt
 import os
 from pymongo import MongoClient
+from xt import load_xt_version
 
 
-
-
-st.set_page_config(page_title="FC Barcelona Dashboard", layout="wide")# Custom CSS for centering and controlling the width
-st.markdown(
-    """
-    <style>
-    /* Set a maximum width for the main container */
-    .appview-container .block-container {
-        max-width: 1600px;  /* Adjust as needed for "zoom out" effect */
-        margin: 0 auto;  /* Center the container */
-        padding: 1rem;  /* Add some padding for aesthetics */
-    }
-    </style>
-    """,
-    unsafe_allow_html=True
-)
+# Number of matches whose events and players are kept in memory
+MATCH_CACHE_SIZE = int(os.getenv('MATCH_CACHE_SIZE', 8))
+# Seconds before the match list is read again, so matches followed live show up
+MATCH_LIST_TTL = int(os.getenv('MATCH_LIST_TTL', 60))
+# Seconds between two refreshes of a live match report
+LIVE_REFRESH_SECONDS = int(os.getenv('LIVE_REFRESH_SECONDS', 15))
 
 @st.cache_resource
 def init_connection():
-    MONGO_URI = f"mongodb+srv://{os.getenv('DB_USERNAME', st.secrets['mongo']['DB_USERNAME'])}:" \
-                f"{os.getenv('DB_PASSWORD', st.secrets['mongo']['DB_PASSWORD'])}@" \
-                f"{os.getenv('DB_CLUSTER', st.secrets['mongo']['DB_CLUSTER'])}.mongodb.net/" \
-                f"{os.getenv('DB_NAME', st.secrets['mongo']['DB_NAME'])}?retryWrites=true&w=majority"
-    return pymongo.MongoClient(MONGO_URI)
-
-@st.cache_data
-def load_data():
-    # Call the function from data_loader to fetch data from MongoDB
-    matches_df, teams_df, players_df, events_df = load_data_from_mongo()
-    return matches_df, teams_df, players_df, events_df
-
-# Load data (this will now use caching to avoid repeated MongoDB calls)
-matches_df, teams_df, players_df, events_df = load_data()
-
-# Create an 'opponent' column to display only the opposing team name in the dropdown
-matches_df['opponent'] = matches_df.apply(
-    lambda row: row['away_team_name'] if row['home_team_name'] == "Barcelona" else row['home_team_name'], axis=1
-)
+    return MongoClient(get_mongo_uri())
 
-# Display dropdown for match selection using the opponent name
-match_options = matches_df['opponent'].tolist()
-selected_opponent = st.sidebar.selectbox("Select Match", match_options)
-# Filter the selected match based on the opponent
-match_data = matches_df[matches_df['opponent'] == selected_opponent].iloc[0]
-match_id = match_data['_id']
-home_team_id = match_data['home_team_id']
-away_team_id = match_data['away_team_id']
-
-# Generate pass network and momentum plots
-home_team_pass_network = plot_pass_network(events_df, match_id, home_team_id, players_df)
-away_team_pass_network = plot_pass_network(events_df, match_id, away_team_id, players_df)
-match_stats_fig = create_match_stats_graph_dynamic(matches_df, match_id)
-momentum_graph = create_momentum_graph(events_df, match_id, home_team_id, away_team_id, interval=3)
-
-
-
-
-
-# Title
-st.markdown("<h1 style='text-align: center; color: white;'>FC Barcelona Match Report</h1>", unsafe_allow_html=True)
-
-# Format date to show only the date part (without time)
-match_date = datetime.strptime(str(match_data['date']).split()[0], "%Y-%m-%d").strftime("%d-%m-%Y")
-#match_date = datetime.strptime(match_data['date'], "%Y-%m-%dT%H:%M:%S").date()
-#match_date = match_data['date'].date()
-
-# Row 1: Display match information in the first row
-col1, col2, col3 = st.columns([2, 2, 2])
+@st.cache_resource
+def get_match_cache():
+    # One cache per process, shared by every session
+    return MatchCache(MATCH_CACHE_SIZE)
 
-with col1:
-    home_logo = load_and_resize_logo(match_data['home_team_name'])
-    st.markdown(
-        f"""
-        <div style='text-align: center; height: 200px; display: flex; flex-direction: column; justify-content: center; align-items: center;'>
-            <img src='data:image/png;base64,{home_logo}' width='120' style='object-fit: contain; margin-bottom: 10px;' />
-            <h2 style='color: white; margin: 0 0 10px 0; font-size: 28px; font-weight: bold;'></h2>
-        </div>
-        """, 
-        unsafe_allow_html=True
-    )
+@st.cache_resource
+def get_render_pool():
+    # Figures are drawn in worker processes, the dashboard only ever holds PNG bytes
+    return create_render_pool()
 
-with col2:
-    st.markdown(
-        f"""
-        <div style='text-align: center;'>
-            <h3 style='color: white; font-size: 38px; font-weight: bold;'>{match_date}</h3>
-            <h1 style='font-size: 40px; font-weight: bold;'>
-                <span style='color: white ;'>{match_data['home_score_fulltime']}</span>
-                <span style='color: white;'> - </span>
-                <span style='color:white;'>{match_data['away_score_fulltime']}</span>
-            </h1>
-        </div>
-        """, 
-        unsafe_allow_html=True
-    )
+@st.cache_resource
+def get_logo_manifest():
+    # Ready base64 logos keyed by normalized team name, read once per process
+    return load_logo_manifest()
 
-with col3:
-    away_logo = load_and_resize_logo(match_data['away_team_name'])
+@st.cache_data(ttl=MATCH_LIST_TTL)
+def load_data():
+    # Only the matches are loaded up front, events and players are fetched per selected match
+    return load_matches(init_connection()[DB_NAME])
+
+@st.cache_data(ttl=MATCH_LIST_TTL)
+def load_xt_grid_version():
+    # Read again with the match list, a refit then reaches the match and figure caches
+    return load_xt_version(init_connection()[DB_NAME])
+
+def load_selected_match(match_id, data_version, xt_version):
+    db = init_connection()[DB_NAME]
+
+    def load(key):
+        # Raw events feed the shot maps and momentum, the pass networks come precomputed
+        events_df, _ = load_match_data(db, match_id)
+        return events_df, load_pass_networks(db, match_id)
+
+    # A match committed again (completed after a live ingest, replayed) has a new data_version, and events
+    # cached before a refit carry the earlier xT: either way the cached entry is not used again
+    return get_match_cache().get((match_id, data_version, xt_version), load)
+
+def load_live_match(match_id):
+    # A live match skips the match and figure caches, every refresh reads what live.py stored last:
+    # the match document, its shots, the running pass networks and the running momentum
+    db = init_connection()[DB_NAME]
+    match_df = load_match(db, match_id)
+    pass_networks = load_pass_networks(db, match_id, mirror_dir=None)
+    shots_df = load_shot_events(db, match_id)
+    momentum = load_live_momentum(db, match_id)
+    figures = render_match_figures(match_df, shots_df, pass_networks, match_id, cache_dir=None,
+                                   pool=get_render_pool(), momentum=momentum)
+    return match_df, figures, momentum_metric(shots_df, momentum)
+
+def show_match_report(match_data, figures, metric, live=False):
+    # Format date to show only the date part (without time)
+    match_date = datetime.strptime(str(match_data['date']).split()[0], "%Y-%m-%d").strftime("%d-%m-%Y")
+    #match_date = datetime.strptime(match_data['date'], "%Y-%m-%dT%H:%M:%S").date()
+    #match_date = match_data['date'].date()
+    # Matches followed by live.py show the minute of their last stored event
+    if live:
+        live_minute = f"<h3 style='color: red; margin: 0;'>LIVE {int(match_data['live_minute'])}'</h3>"
+    elif match_data.get('partial', False):
+        live_minute = f"<h3 style='color: orange; margin: 0;'>Stopped at {int(match_data['live_minute'])}'</h3>"
+    else:
+        live_minute = ""
+
+    # Row 1: Display match information in the first row
+    col1, col2, col3 = st.columns([2, 2, 2])
+
+    with col1:
+        home_logo = team_logo(get_logo_manifest(), match_data['home_team_name'])
+        st.markdown(
+            f"""
+            <div style='text-align: center; height: 200px; display: flex; flex-direction: column; justify-content: center; align-items: center;'>
+                <img src='data:image/png;base64,{home_logo}' width='120' style='object-fit: contain; margin-bottom: 10px;' />
+                <h2 style='color: white; margin: 0 0 10px 0; font-size: 28px; font-weight: bold;'></h2>
+            </div>
+            """, 
+            unsafe_allow_html=True
+        )
+
+    with col2:
+        st.markdown(
+            f"""
+            <div style='text-align: center;'>
+                <h3 style='color: white; font-size: 38px; font-weight: bold;'>{match_date}</h3>
+                {live_minute}
+                <h1 style='font-size: 40px; font-weight: bold;'>
+                    <span style='color: white ;'>{match_data['home_score_fulltime']}</span>
+                    <span style='color: white;'> - </span>
+                    <span style='color:white;'>{match_data['away_score_fulltime']}</span>
+                </h1>
+            </div>
+            """, 
+            unsafe_allow_html=True
+        )
+
+    with col3:
+        away_logo = team_logo(get_logo_manifest(), match_data['away_team_name'])
+        st.markdown(
+            f"""
+            <div style='text-align: center; height: 200px; display: flex; flex-direction: column; justify-content: center; align-items: center;'>
+                <img src='data:image/png;base64,{away_logo}' width='120' style='object-fit: contain; margin-bottom: 10px;' />
+                <h2 style='color: white; margin: 0 0 0px 0; font-size: 28px; font-weight: bold;'></h2>
+            </div>
+            """, 
+            unsafe_allow_html=True
+        )
+
+    st.markdown("<div style='height: 30px;'></div>", unsafe_allow_html=True)  # Adjust the height as needed
+
+    # Row 2: Pass Networks and Match Statistics
+    col4, col5, col6 = st.columns([1, 1, 1])
+
+    with col4:
+        st.markdown(
+            f"<div style='display: flex; flex-direction: column; align-items: center;'>"
+            f"<h3 style='text-align: center; color: white; margin-bottom: 0;'>{match_data['home_team_name']} Pass Network</h3>"
+            f"</div>",
+            unsafe_allow_html=True
+        )
+        st.image(figures['home_pass_network'], use_container_width=True)  # Ensures full width in the container
+
+    with col5:
+        st.markdown(
+            "<div class='boxed-section' style='display: flex; flex-direction: column; align-items: center;'>"
+            "<h3 style='text-align: center; color: white;'>Match Statistics</h3>"
+            "</div>",
+            unsafe_allow_html=True
+        )
+        st.image(figures['match_stats'], use_container_width=True)
+
+    with col6:
+        st.markdown(
+            f"<div style='display: flex; flex-direction: column; align-items: center;'>"
+            f"<h3 style='text-align: center; color: white; margin-bottom: 0;'>{match_data['away_team_name']} Pass Network</h3>"
+            f"</div>",
+            unsafe_allow_html=True
+        )
+        st.image(figures['away_pass_network'], use_container_width=True)  # Ensures full width in the container
+
+    st.markdown("<div style='height: 30px;'></div>", unsafe_allow_html=True)  # Adjust the height as needed
+
+    # Row 3: Shot Maps and xG Flow Chart
+    col7, col8, col9 = st.columns([1, 1, 1])
+
+    with col7:
+        st.markdown('<div class="boxed-section">', unsafe_allow_html=True)
+        st.markdown(f"<h3 style='text-align: center; color: white;'>{match_data['home_team_name']} Shot Map</h3>", unsafe_allow_html=True)
+        st.image(figures['home_shot_map'], use_container_width=True)
+        st.markdown('</div>', unsafe_allow_html=True)
+
+    with col8:
+        st.markdown('<div class="boxed-section">', unsafe_allow_html=True)
+        st.markdown(f"<h3 style='text-align: center; color: white;'>Momentum ({MOMENTUM_LABELS[metric]})</h3>", unsafe_allow_html=True)
+        st.image(figures['momentum'], use_container_width=True)
+        st.markdown('</div>', unsafe_allow_html=True)
+
+    with col9:
+        st.markdown('<div class="boxed-section">', unsafe_allow_html=True)
+        st.markdown(f"<h3 style='text-align: center; color: white;'>{match_data['away_team_name']} Shot Map</h3>", unsafe_allow_html=True)
+        st.image(figures['away_shot_map'], use_container_width=True)
+        st.markdown('</div>', unsafe_allow_html=True)
+
+
+def main():
+    # Streamlit runs this script as __main__, the render workers import it again without running the page
+    st.set_page_config(page_title="FC Barcelona Dashboard", layout="wide")# Custom CSS for centering and controlling the width
     st.markdown(
-        f"""
-        <div style='text-align: center; height: 200px; display: flex; flex-direction: column; justify-content: center; align-items: center;'>
-            <img src='data:image/png;base64,{away_logo}' width='120' style='object-fit: contain; margin-bottom: 10px;' />
-            <h2 style='color: white; margin: 0 0 0px 0; font-size: 28px; font-weight: bold;'></h2>
-        </div>
-        """, 
+        """
+        <style>
+        /* Set a maximum width for the main container */
+        .appview-container .block-container {
+            max-width: 1600px;  /* Adjust as needed for "zoom out" effect */
+            margin: 0 auto;  /* Center the container */
+            padding: 1rem;  /* Add some padding for aesthetics */
+        }
+        </style>
+        """,
         unsafe_allow_html=True
     )
-    
-st.markdown("<div style='height: 30px;'></div>", unsafe_allow_html=True)  # Adjust the height as needed
 
-# Row 2: Pass Networks and Match Statistics
-col4, col5, col6 = st.columns([1, 1, 1])
+    # Load data (this will now use caching to avoid repeated MongoDB calls)
+    matches_df = load_data()
 
-with col4:
-    st.markdown(
-        f"<div style='display: flex; flex-direction: column; align-items: center;'>"
-        f"<h3 style='text-align: center; color: white; margin-bottom: 0;'>{match_data['home_team_name']} Pass Network</h3>"
-        f"</div>",
-        unsafe_allow_html=True
+    # Create an 'opponent' column to display only the opposing team name in the dropdown
+    matches_df['opponent'] = matches_df.apply(
+        lambda row: row['away_team_name'] if row['home_team_name'] == "Barcelona" else row['home_team_name'], axis=1
     )
-    st.pyplot(home_team_pass_network, use_container_width=True)  # Ensures full width in the container
 
-with col5:
-    st.markdown(
-        "<div class='boxed-section' style='display: flex; flex-direction: column; align-items: center;'>"
-        "<h3 style='text-align: center; color: white;'>Match Statistics</h3>"
-        "</div>",
-        unsafe_allow_html=True
-    )
-    st.pyplot(match_stats_fig)
-
-with col6:
-    st.markdown(
-        f"<div style='display: flex; flex-direction: column; align-items: center;'>"
-        f"<h3 style='text-align: center; color: white; margin-bottom: 0;'>{match_data['away_team_name']} Pass Network</h3>"
-        f"</div>",
-        unsafe_allow_html=True
-    )
-    st.pyplot(away_team_pass_network, use_container_width=True)  # Ensures full width in the container
-
-st.markdown("<div style='height: 30px;'></div>", unsafe_allow_html=True)  # Adjust the height as needed
-
-# Row 3: Shot Maps and xG Flow Chart
-col7, col8, col9 = st.columns([1, 1, 1])
-
-with col7:
-    st.markdown('<div class="boxed-section">', unsafe_allow_html=True)
-    st.markdown(f"<h3 style='text-align: center; color: white;'>{match_data['home_team_name']} Shot Map</h3>", unsafe_allow_html=True)
-    fig, ax = plt.subplots(figsize=(6, 4))
-    home_team_shot_map = create_shotmap(events_df, match_id, home_team_id, ax)
-    st.pyplot(home_team_shot_map)
-    st.markdown('</div>', unsafe_allow_html=True)
-
-with col8:
-    st.markdown('<div class="boxed-section">', unsafe_allow_html=True)
-    st.markdown("<h3 style='text-align: center; color: white;'>Momentum (Passes in Final Third)</h3>", unsafe_allow_html=True)
-    st.pyplot(momentum_graph, use_container_width=True) 
-    st.markdown('</div>', unsafe_allow_html=True)
-
-with col9:
-    st.markdown('<div class="boxed-section">', unsafe_allow_html=True)
-    st.markdown(f"<h3 style='text-align: center; color: white;'>{match_data['away_team_name']} Shot Map</h3>", unsafe_allow_html=True)
-    fig, ax = plt.subplots(figsize=(6, 4))
-    away_team_shot_map = create_shotmap(events_df, match_id, away_team_id, ax)
-    st.pyplot(away_team_shot_map)
-    st.markdown('</div>', unsafe_allow_html=True)
\ No newline at end of file
+    # Display dropdown for match selection using the opponent name
+    match_options = matches_df['opponent'].tolist()
+    selected_opponent = st.sidebar.selectbox("Select Match", match_options)
+    # Filter the selected match based on the opponent
+    match_data = matches_df[matches_df['opponent'] == selected_opponent].iloc[0]
+    match_id = int(match_data['_id'])
+    home_team_id = match_data['home_team_id']
+    away_team_id = match_data['away_team_id']
+
+    # Title
+    st.markdown("<h1 style='text-align: center; color: white;'>FC Barcelona Match Report</h1>", unsafe_allow_html=True)
+
+    if match_data['live']:
+        @st.fragment(run_every=LIVE_REFRESH_SECONDS)
+        def live_match_report():
+            # Only this part of the page reruns on every refresh
+            match_df, figures, metric = load_live_match(match_id)
+            if match_df.empty or not match_df['live'].iloc[0]:
+                # Full time: the committed match is shown like any other
+                load_data.clear()
+                st.rerun()
+            show_match_report(match_df.iloc[0], figures, metric, live=True)
+
+        st.sidebar.caption(f"Live, refreshed every {LIVE_REFRESH_SECONDS}s")
+        live_match_report()
+    else:
+        # Events and pass networks of the selected match come from the LRU cache
+        xt_version = load_xt_grid_version()
+        events_df, pass_networks = load_selected_match(match_id, stored_data_version(match_data), xt_version)
+        match_cache = get_match_cache()
+        st.sidebar.caption(
+            f"Match cache: {len(match_cache)}/{match_cache.maxsize} matches, "
+            f"{match_cache.hits} hits, {match_cache.misses} misses"
+        )
+
+        # Rendered figures come from the on-disk figure cache, only new matches are drawn
+        figures = render_match_figures(matches_df, events_df, pass_networks, match_id, pool=get_render_pool(),
+                                       xt_version=xt_version)
+        show_match_report(match_data, figures, momentum_metric(events_df))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,244 @@
 # data_loader.py
-from pymongo import MongoClient
+from collections import OrderedDict
+import threading
 import pandas as pd
+import pyarrow as pa
 from dotenv import load_dotenv
 import os
 import streamlit as st
+from utilities import EVENT_SCHEMA, compact_events
 
 
 # Load environment variables from .env file
 load_dotenv()
-def load_data_from_mongo():
-    MONGO_URI = f"mongodb+srv://{os.getenv('DB_USERNAME', st.secrets['mongo']['DB_USERNAME'])}:" \
-                f"{os.getenv('DB_PASSWORD', st.secrets['mongo']['DB_PASSWORD'])}@" \
-                f"{os.getenv('DB_CLUSTER', st.secrets['mongo']['DB_CLUSTER'])}.mongodb.net/" \
-                f"{os.getenv('DB_NAME', st.secrets['mongo']['DB_NAME'])}?retryWrites=true&w=majority"
-    client = MongoClient(MONGO_URI)
-    db = client['fcb2425']
-    matches_data = list(db.matches.find())
-    teams_data = list(db.teams.find())
-    players_data = list(db.players.find())
-    events_data = list(db.events.find())
-    client.close()
-    
-    matches_df = pd.DataFrame(matches_data)
-    teams_df = pd.DataFrame(teams_data)
-    players_df = pd.DataFrame(players_data)
-    events_df = pd.DataFrame(events_data)
-    
-    
-    return matches_df, teams_df, players_df, events_df
\ No newline at end of file
+
+DB_NAME = 'fcb2425'
+CHUNK_SIZE = 5000  # Documents per cursor batch
+
+# Local columnar snapshot of the collections written by `python mirror.py sync`, read instead of MongoDB when set
+MIRROR_DIR = os.getenv('MIRROR_DIR')
+MIRROR_COLLECTIONS = ['matches', 'appearances', 'events']  # Partitioned by match_id, teams and players are single files
+
+# Only the fields the dashboard and visualizations read, with the dtype of each column
+MATCH_FIELDS = {
+    '_id': 'int64', 'competition': 'object', 'date': 'datetime64[ns]',
+    'home_team_id': 'int64', 'away_team_id': 'int64', 'home_team_name': 'object', 'away_team_name': 'object',
+    'home_score_fulltime': 'int64', 'away_score_fulltime': 'int64',
+    'home_shots_total': 'float64', 'home_shots_on_target': 'float64', 'home_possession': 'float64',
+    'home_passes_total': 'float64', 'home_pass_completion': 'float64', 'home_corners': 'float64',
+    'home_offsides_caught': 'float64',
+    'away_shots_total': 'float64', 'away_shots_on_target': 'float64', 'away_possession': 'float64',
+    'away_passes_total': 'float64', 'away_pass_completion': 'float64', 'away_corners': 'float64',
+    'away_offsides_caught': 'float64',
+    # Set by live.py: live while it ingests the match, partial until the whole match is committed
+    'live': 'bool', 'partial': 'bool', 'live_minute': 'float64',
+    'data_version': 'object',  # Fingerprint of the stored data, see utilities.match_data_version
+}
+TEAM_FIELDS = {'_id': 'int64', 'name': 'object'}
+PLAYER_FIELDS = {'_id': 'int64', 'name': 'object'}  # Keyed by player_id
+APPEARANCE_FIELDS = {
+    '_id': 'object', 'player_id': 'int64', 'match_id': 'int64', 'team_id': 'int64',
+    'shirt_no': 'int64', 'position': 'object',
+}
+EVENT_FIELDS = {
+    field: EVENT_SCHEMA.get(field, 'object') for field in [
+        '_id', 'match_id', 'team_id', 'player_id', 'minute', 'second', 'total_seconds', 'type', 'type_outcome',
+        'x', 'y', 'end_x', 'end_y', 'passer', 'recipient', 'xt', 'chain_id',
+    ]
+}
+# Flattened pass network aggregates, see utilities.build_pass_networks
+PASS_NETWORK_NODE_FIELDS = {
+    'match_id': 'int64', 'team_id': 'int64', 'player_id': 'int64', 'shirt_no': 'int64',
+    'x': 'float64', 'y': 'float64', 'count': 'int64',
+}
+PASS_NETWORK_EDGE_FIELDS = {
+    'match_id': 'int64', 'team_id': 'int64', 'passer': 'int64', 'recipient': 'int64', 'pass_count': 'int64',
+}
+
+
+def _mongo_setting(name):
+    # Environment first, Streamlit secrets only when the variable is not set
+    return os.getenv(name) or st.secrets['mongo'][name]
+
+
+def get_mongo_uri():
+    return f"mongodb+srv://{_mongo_setting('DB_USERNAME')}:{_mongo_setting('DB_PASSWORD')}@" \
+           f"{_mongo_setting('DB_CLUSTER')}.mongodb.net/{_mongo_setting('DB_NAME')}?retryWrites=true&w=majority"
+
+
+def _typed_chunk(documents, fields):
+    # Build each column straight from the documents with its final dtype
+    return pd.DataFrame({
+        field: pd.Series([doc.get(field) for doc in documents], dtype=dtype)
+        for field, dtype in fields.items()
+    })
+
+
+def read_collection(collection, fields, query=None, batch_size=CHUNK_SIZE):
+    """Read a collection with a projection on `fields`, `batch_size` documents at a time."""
+    cursor = collection.find(query or {}, {field: 1 for field in fields}).batch_size(batch_size)
+    chunks = []
+    documents = []
+    for document in cursor:
+        documents.append(document)
+        if len(documents) == batch_size:
+            chunks.append(_typed_chunk(documents, fields))
+            documents = []
+    if documents or not chunks:
+        chunks.append(_typed_chunk(documents, fields))
+    if len(chunks) == 1:
+        return chunks[0]
+    # Chunks with different categories concatenate to object columns
+    categories = {field: 'category' for field, dtype in fields.items() if dtype == 'category'}
+    return pd.concat(chunks, ignore_index=True).astype(categories)
+
+
+def mirror_partition_path(mirror_dir, collection, match_id):
+    return os.path.join(mirror_dir, collection, f"match_id={match_id}.arrow")
+
+
+def mirrored_match_ids(mirror_dir):
+    # A match is complete once its matches partition exists, it is written last
+    matches_dir = os.path.join(mirror_dir, 'matches')
+    if not os.path.isdir(matches_dir):
+        return set()
+    return {
+        int(name[len('match_id='):-len('.arrow')]) for name in os.listdir(matches_dir)
+        if name.startswith('match_id=') and name.endswith('.arrow')
+    }
+
+
+def _read_arrow(path):
+    # Memory-mapped Arrow IPC read, the column buffers are not copied until pandas needs them
+    with pa.memory_map(path) as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def read_mirror(mirror_dir, collection, match_ids=None):
+    """Read a mirrored collection, all partitions or only those of `match_ids`."""
+    if collection in ('teams', 'players'):
+        return _read_arrow(os.path.join(mirror_dir, f"{collection}.arrow")).to_pandas()
+    if match_ids is None:
+        match_ids = sorted(mirrored_match_ids(mirror_dir))
+    tables = [_read_arrow(mirror_partition_path(mirror_dir, collection, match_id)) for match_id in match_ids]
+    if not tables:
+        fields = {
+            'matches': MATCH_FIELDS, 'appearances': APPEARANCE_FIELDS, 'events': EVENT_FIELDS,
+            'pass_network_nodes': PASS_NETWORK_NODE_FIELDS, 'pass_network_edges': PASS_NETWORK_EDGE_FIELDS,
+        }[collection]
+        return _typed_chunk([], fields)
+    df = pa.concat_tables(tables).to_pandas()
+    # Mirrors written before the compact event schema still hold float64 and string columns
+    return compact_events(df) if collection == 'events' else df
+
+
+def load_matches(db, mirror_dir=MIRROR_DIR):
+    # Small matches-only query that drives the match selector
+    if mirror_dir:
+        # Partial matches (in progress or stopped) are not mirrored, they are read from MongoDB
+        matches_df = pd.concat(
+            [read_mirror(mirror_dir, 'matches'), read_collection(db.matches, MATCH_FIELDS, {'partial': True})],
+            ignore_index=True
+        )
+        for flag in ['live', 'partial']:
+            matches_df[flag] = matches_df[flag].fillna(False).astype(bool)
+    else:
+        matches_df = read_collection(db.matches, MATCH_FIELDS)
+    return matches_df.sort_values('date', ignore_index=True)
+
+
+def load_match(db, match_id):
+    # A single match document, read again on every refresh of a live match
+    return read_collection(db.matches, MATCH_FIELDS, {'_id': int(match_id)})
+
+
+def load_shot_events(db, match_id):
+    # Shots and goals of a match, all a live match's shot maps and momentum goal markers need
+    query = {'match_id': int(match_id), '$or': [{'is_shot': True}, {'type': 'Goal'}]}
+    return read_collection(db.events, EVENT_FIELDS, query)
+
+
+def load_live_momentum(db, match_id):
+    """(metric, home, away) momentum per minute kept by live.py, None when the match is not live."""
+    document = db.live_momentum.find_one({'_id': int(match_id)})
+    if document is None:
+        return None
+
+    def per_minute(values):
+        minutes = pd.Index([int(minute) for minute in values], dtype='int64', name='minute')
+        return pd.Series(list(values.values()), index=minutes, dtype='float64').sort_index()
+
+    return document['metric'], per_minute(document['home']), per_minute(document['away'])
+
+
+def load_match_data(db, match_id, mirror_dir=MIRROR_DIR):
+    # Events and player appearances of a single match, served by the match_id indexes
+    if mirror_dir and int(match_id) in mirrored_match_ids(mirror_dir):
+        return read_mirror(mirror_dir, 'events', [match_id]), read_mirror(mirror_dir, 'appearances', [match_id])
+    query = {'match_id': int(match_id)}
+    events_df = read_collection(db.events, EVENT_FIELDS, query)
+    appearances_df = read_collection(db.appearances, APPEARANCE_FIELDS, query)
+    return events_df, appearances_df
+
+
+def pass_network_frames(documents):
+    # Flatten pass network documents into node and edge frames, both keyed by match_id and team_id
+    nodes = [{'match_id': doc['match_id'], 'team_id': doc['team_id'], **node} for doc in documents for node in doc['nodes']]
+    edges = [{'match_id': doc['match_id'], 'team_id': doc['team_id'], **edge} for doc in documents for edge in doc['edges']]
+    return _typed_chunk(nodes, PASS_NETWORK_NODE_FIELDS), _typed_chunk(edges, PASS_NETWORK_EDGE_FIELDS)
+
+
+def load_pass_networks(db, match_id, mirror_dir=MIRROR_DIR):
+    # Pass network aggregates of both teams of a match as (nodes_df, edges_df)
+    if mirror_dir and os.path.exists(mirror_partition_path(mirror_dir, 'pass_network_edges', match_id)):
+        return (read_mirror(mirror_dir, 'pass_network_nodes', [match_id]),
+                read_mirror(mirror_dir, 'pass_network_edges', [match_id]))
+    return pass_network_frames(list(db.pass_networks.find({'match_id': int(match_id)})))
+
+
+class MatchCache:
+    """Bounded LRU cache of per-match data with hit/miss counters.
+
+    Keys are any hashable value identifying a match's data, e.g. the dashboard's
+    (match_id, data_version, xt_version).
+    """
+
+    def __init__(self, maxsize=8):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()  # Streamlit sessions share the cache from several threads
+        self.loading = {}             # key -> Event set once its load in flight is over
+
+    def get(self, key, loader):
+        # loader(key) is only called on a miss, the least recently used entry is evicted. It runs outside
+        # the lock, so a cold load never holds up the other keys; concurrent misses of one key wait for it
+        while True:
+            with self.lock:
+                if key in self.entries:
+                    self.hits += 1
+                    self.entries.move_to_end(key)
+                    return self.entries[key]
+                loading = self.loading.get(key)
+                if loading is None:
+                    self.misses += 1
+                    loading = self.loading[key] = threading.Event()
+                    break
+            # Loaded by another thread meanwhile, or its load failed and this thread takes over
+            loading.wait()
+
+        try:
+            value = loader(key)
+            with self.lock:
+                self.entries[key] = value
+                if len(self.entries) > self.maxsize:
+                    self.entries.popitem(last=False)
+            return value
+        finally:
+            with self.lock:
+                del self.loading[key]
+            loading.set()
+
+    def __len__(self):
+        return len(self.entries)
@@ -0,0 +1,96 @@
+# fetchers.py
+# Page fetchers used by the scraper, both return the page HTML and the URL it was served from.
+# SeleniumFetcher drives a Chrome instance; HttpFetcher is a pooled HTTP session for pages that carry
+# their data in the HTML itself. Both raise FetchError when a page cannot be fetched.
+import os
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from urllib3.util.retry import Retry
+
+FETCHERS = ['selenium', 'http']
+DEFAULT_FETCHER = os.getenv('SCRAPER_FETCHER', 'selenium')
+HTTP_TIMEOUT = float(os.getenv('SCRAPER_HTTP_TIMEOUT', 30))  # Seconds per request
+HTTP_POOL_SIZE = 8  # Keep-alive connections per host
+HTTP_RETRIES = 3    # Retries of a failed connection or a 429/5xx response, with backoff
+HTTP_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'en-GB,en;q=0.9',
+}
+
+
+def create_driver(headless=True):
+    options = webdriver.ChromeOptions()
+    if headless:
+        options.add_argument('--headless=new')
+    return webdriver.Chrome(options=options)
+
+
+class FetchError(Exception):
+    """A page could not be fetched, whatever the fetcher and the cause (the original error is chained)."""
+
+
+class SeleniumFetcher:
+    """Pages rendered by a Chrome instance, waiting `settle_seconds` after each load for scripts to run."""
+
+    def __init__(self, headless=True, settle_seconds=0, driver=None):
+        self.driver = driver or create_driver(headless=headless)
+        self.settle_seconds = settle_seconds
+
+    def fetch(self, url):
+        try:
+            self.driver.get(url)
+        except WebDriverException as exc:
+            raise FetchError(f"{url}: {exc.msg}") from exc
+        if self.settle_seconds:
+            time.sleep(self.settle_seconds)
+        return self.driver.page_source, self.driver.current_url
+
+    def close(self):
+        self.driver.quit()
+
+
+class HttpFetcher:
+    """Pages served to a requests.Session: keep-alive connection pool, compressed responses and cookies
+    carried over between requests (pass the same `cookies` jar to share them between fetchers).
+
+    Failed connections and 429/5xx responses are retried `retries` times with backoff. A page that still
+    fails, or any other error status, raises FetchError.
+    """
+
+    def __init__(self, timeout=HTTP_TIMEOUT, pool_size=HTTP_POOL_SIZE, cookies=None, headers=None,
+                 retries=HTTP_RETRIES):
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update(headers or HTTP_HEADERS)
+        if cookies is not None:
+            self.session.cookies = cookies
+        retry = Retry(total=retries, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504])
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def fetch(self, url):
+        # Retries running out raise RetryError or ConnectionError rather than HTTPError, all become FetchError
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+            response.raise_for_status()
+        except requests.RequestException as exc:
+            raise FetchError(f"{url}: {exc}") from exc
+        return response.text, response.url
+
+    def close(self):
+        self.session.close()
+
+
+def fetcher_factory(kind=DEFAULT_FETCHER, headless=True, settle_seconds=0):
+    """Function creating one fetcher per scraping worker, the HTTP fetchers share their cookies."""
+    if kind == 'selenium':
+        return lambda: SeleniumFetcher(headless=headless, settle_seconds=settle_seconds)
+    if kind == 'http':
+        cookies = requests.cookies.RequestsCookieJar()
+        return lambda: HttpFetcher(cookies=cookies)
+    raise ValueError(f"Unknown fetcher {kind!r}, expected one of {', '.join(FETCHERS)}")
@@ -0,0 +1,277 @@
+# figure_cache.py
+# Content-addressed PNG cache for the dashboard figures, a finished match never has to be drawn twice.
+# Figures that are not cached yet are rendered in a small process pool, so the dashboard process
+# never holds matplotlib figures.
+# Run with: python figure_cache.py prerender [--match-id ID ...]
+#      or:  python figure_cache.py export [--match-id ID ...] [--profile print]
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import pandas as pd
+from visualizations import (
+    VISUALIZATION_VERSION, plot_pass_network, create_shotmap, create_match_stats_graph_dynamic, create_momentum_graph
+)
+
+FIGURE_CACHE_DIR = os.getenv('FIGURE_CACHE_DIR', 'figure_cache')
+SAVEFIG_KWARGS = {'format': 'png', 'dpi': 200, 'bbox_inches': 'tight'}  # Same output as st.pyplot
+DASHBOARD_PROFILE = 'dashboard'  # Render profile of the dashboard figures, see visualizations.RENDER_PROFILES
+EXPORT_DIR = 'exports'
+
+# Render pool size, the workers are replaced after this many figures each so their memory is returned
+RENDER_WORKERS = int(os.getenv('RENDER_WORKERS', 2))
+RENDER_TASKS_PER_CHILD = int(os.getenv('RENDER_TASKS_PER_CHILD', 60))
+
+RENDERERS = {
+    'plot_pass_network': plot_pass_network,
+    'create_shotmap': create_shotmap,
+    'create_match_stats_graph_dynamic': create_match_stats_graph_dynamic,
+    'create_momentum_graph': create_momentum_graph,
+}
+
+
+def cache_key(function_name, match_id, team_id=None, params=None, data_version=None):
+    # data_version fingerprints the match's stored data (see utilities.match_data_version), so a match
+    # committed again with other data, e.g. completed after a live ingest or replayed, is drawn again
+    payload = json.dumps([function_name, int(match_id), None if team_id is None else int(team_id),
+                          params or {}, VISUALIZATION_VERSION, data_version], sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def cache_path(key, cache_dir=FIGURE_CACHE_DIR):
+    return os.path.join(cache_dir, key[:2], f"{key}.png")
+
+
+def figure_to_png(fig, **savefig_kwargs):
+    # Render to PNG bytes and release the figure
+    buffer = BytesIO()
+    fig.savefig(buffer, **{**SAVEFIG_KWARGS, **savefig_kwargs})
+    plt.close(fig)
+    return buffer.getvalue()
+
+
+def render_png(function_name, args, params):
+    # Runs in a pool worker: draw one figure, return its PNG bytes and free everything it allocated
+    try:
+        fig = RENDERERS[function_name](*args, **params)
+        # Figures drawn with a render profile already carry its dpi
+        return figure_to_png(fig, dpi='figure') if 'profile' in params else figure_to_png(fig)
+    finally:
+        plt.close('all')
+
+
+def render_context():
+    # The dashboard process runs Streamlit's and pymongo's threads, so workers are never forked from it:
+    # the fork server starts them from a single-threaded process with this module already imported.
+    # Spawned or not, a worker imports the main module again, which must keep its work under a
+    # `if __name__ == "__main__"` guard (dashboard.py does)
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    context = multiprocessing.get_context(method)
+    if method == 'forkserver':
+        context.set_forkserver_preload(['figure_cache'])
+    return context
+
+
+class RenderPool:
+    """Process pool for render_png that starts fresh workers every `workers * tasks_per_child` tasks.
+
+    Recycling the whole pool rather than using max_tasks_per_child keeps it working on Python < 3.11.
+    """
+
+    def __init__(self, workers=RENDER_WORKERS, tasks_per_child=RENDER_TASKS_PER_CHILD):
+        self.workers = workers
+        self.tasks_per_pool = workers * tasks_per_child
+        self.lock = threading.Lock()
+        self.executor = None
+        self.submitted = 0
+
+    def submit(self, fn, *args):
+        with self.lock:
+            if self.executor is None or self.submitted >= self.tasks_per_pool:
+                if self.executor is not None:
+                    # Queued figures still finish, the old workers exit once they are done
+                    self.executor.shutdown(wait=False)
+                self.executor = ProcessPoolExecutor(self.workers, mp_context=render_context())
+                self.submitted = 0
+            self.submitted += 1
+            return self.executor.submit(fn, *args)
+
+    def worker_pids(self):
+        return list(self.executor._processes) if self.executor is not None else []
+
+    def shutdown(self):
+        with self.lock:
+            if self.executor is not None:
+                self.executor.shutdown()
+                self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+
+def create_render_pool(workers=RENDER_WORKERS, tasks_per_child=RENDER_TASKS_PER_CHILD):
+    return RenderPool(workers, tasks_per_child)
+
+
+def _read_cached(path):
+    if path and os.path.exists(path):
+        with open(path, 'rb') as f:
+            return f.read()
+    return None
+
+
+def _write_cached(path, png):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(png)
+    os.replace(tmp_path, path)
+
+
+def stored_data_version(match):
+    # data_version of a match row, None for matches committed before it was stored
+    data_version = match.get('data_version')
+    return None if pd.isna(data_version) else data_version
+
+
+def momentum_metric(events_df, momentum=None):
+    # Momentum uses the stored xT once the passes have been scored, live matches bring their own metric
+    if momentum is not None:
+        return momentum[0]
+    return 'xt' if 'xt' in events_df and events_df['xt'].notna().any() else 'final_third'
+
+
+def figure_specs(matches_df, events_df, pass_networks, match_id, profile=DASHBOARD_PROFILE, momentum=None):
+    # (figure name, renderer, team_id, params, args) of every dashboard figure of a match
+    # momentum: (metric, home per minute, away per minute) kept by a live ingest, see live.py
+    nodes_df, edges_df = pass_networks
+    match_rows = matches_df[matches_df['_id'] == match_id]
+    match_data = match_rows.iloc[0]
+    home_team_id = int(match_data['home_team_id'])
+    away_team_id = int(match_data['away_team_id'])
+    specs = []
+    for side, team_id in [('home', home_team_id), ('away', away_team_id)]:
+        specs.append((f"{side}_pass_network", 'plot_pass_network', team_id, {},
+                      (nodes_df[nodes_df['team_id'] == team_id], edges_df[edges_df['team_id'] == team_id])))
+        specs.append((f"{side}_shot_map", 'create_shotmap', team_id, {'figsize': [6, 4]},
+                      (events_df, match_id, team_id)))
+    specs.append(('match_stats', 'create_match_stats_graph_dynamic', None, {'profile': profile}, (match_rows, match_id)))
+    params = {'interval': 3, 'profile': profile, 'metric': momentum_metric(events_df, momentum)}
+    if momentum is not None:
+        params['per_minute'] = momentum[1:]
+    specs.append(('momentum', 'create_momentum_graph', None, params, (events_df, match_id, home_team_id, away_team_id)))
+    return specs
+
+
+def render_match_figures(matches_df, events_df, pass_networks, match_id, cache_dir=FIGURE_CACHE_DIR, pool=None,
+                         profile=DASHBOARD_PROFILE, momentum=None, xt_version=None):
+    """PNG bytes of every dashboard figure of a match, keyed by figure name.
+
+    pass_networks is the (nodes_df, edges_df) pair from data_loader.load_pass_networks, and `profile`
+    the render profile of the match stats and momentum figures.
+    Cached figures are read from `cache_dir`; the rest are rendered in parallel on `pool`
+    (in this process when no pool is given) and stored. cache_dir=None disables the cache, as live
+    matches do: they pass their running `momentum` and only the shots and goals as events_df.
+    xt_version (xt.load_xt_version) keys the figures drawn from stored xT, so a refit draws them again.
+    """
+    figures = {}
+    misses = []
+    specs = figure_specs(matches_df, events_df, pass_networks, match_id, profile, momentum)
+    data_version = stored_data_version(matches_df.loc[matches_df['_id'] == match_id].iloc[0])
+    for name, function_name, team_id, params, args in specs:
+        # Rescoring after a refit leaves the match's data_version as it was
+        key_params = {**params, 'xt_version': xt_version} if params.get('metric') == 'xt' else params
+        key = cache_key(function_name, match_id, team_id, key_params, data_version)
+        path = cache_path(key, cache_dir) if cache_dir else None
+        png = _read_cached(path)
+        if png is None:
+            misses.append((name, path, function_name, args, params))
+        else:
+            figures[name] = png
+
+    if pool is not None:
+        futures = [(name, path, pool.submit(render_png, function_name, args, params))
+                   for name, path, function_name, args, params in misses]
+        rendered = [(name, path, future.result()) for name, path, future in futures]
+    else:
+        rendered = [(name, path, render_png(function_name, args, params))
+                    for name, path, function_name, args, params in misses]
+
+    for name, path, png in rendered:
+        if path:
+            _write_cached(path, png)
+        figures[name] = png
+    return figures
+
+
+def prerender_matches(db, match_ids=None, cache_dir=FIGURE_CACHE_DIR, workers=RENDER_WORKERS):
+    # Fill the cache for the given matches (all stored matches by default), cached figures are skipped
+    from data_loader import load_match_data, load_matches, load_pass_networks
+    from xt import load_xt_version
+
+    matches_df = load_matches(db)
+    if match_ids is None:
+        match_ids = matches_df['_id'].tolist()
+    xt_version = load_xt_version(db)
+    with create_render_pool(workers) as pool:
+        for match_id in match_ids:
+            events_df, _ = load_match_data(db, match_id)
+            pass_networks = load_pass_networks(db, match_id)
+            render_match_figures(matches_df, events_df, pass_networks, int(match_id), cache_dir, pool,
+                                 xt_version=xt_version)
+            print(f"Prerendered figures for match: {match_id}")
+
+
+def export_matches(db, match_ids=None, export_dir=EXPORT_DIR, profile='print', workers=RENDER_WORKERS):
+    # Write every figure of the given matches to <export_dir>/<match_id>_<figure>.png, bypassing the cache
+    from data_loader import load_match_data, load_matches, load_pass_networks
+
+    matches_df = load_matches(db)
+    if match_ids is None:
+        match_ids = matches_df['_id'].tolist()
+    os.makedirs(export_dir, exist_ok=True)
+    with create_render_pool(workers) as pool:
+        for match_id in match_ids:
+            events_df, _ = load_match_data(db, match_id)
+            pass_networks = load_pass_networks(db, match_id)
+            figures = render_match_figures(matches_df, events_df, pass_networks, int(match_id), None, pool, profile)
+            for name, png in figures.items():
+                with open(os.path.join(export_dir, f"{match_id}_{name}.png"), 'wb') as f:
+                    f.write(png)
+            print(f"Exported figures for match: {match_id}")
+
+
+def main():
+    from pymongo import MongoClient
+    from data_loader import DB_NAME, get_mongo_uri
+    from visualizations import RENDER_PROFILES
+
+    parser = argparse.ArgumentParser(description="Dashboard figure cache")
+    parser.add_argument('command', choices=['prerender', 'export'])
+    parser.add_argument('--match-id', type=int, action='append', help="only these matches (repeatable)")
+    parser.add_argument('--cache-dir', default=FIGURE_CACHE_DIR)
+    parser.add_argument('--export-dir', default=EXPORT_DIR)
+    parser.add_argument('--profile', choices=sorted(RENDER_PROFILES), default='print', help="render profile of exports")
+    parser.add_argument('--workers', type=int, default=RENDER_WORKERS)
+    args = parser.parse_args()
+
+    client = MongoClient(get_mongo_uri())
+    if args.command == 'export':
+        export_matches(client[DB_NAME], args.match_id, args.export_dir, args.profile, args.workers)
+    else:
+        prerender_matches(client[DB_NAME], args.match_id, args.cache_dir, args.workers)
+    client.close()
+
+
+if __name__ == "__main__":
+    main()
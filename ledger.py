@@ -0,0 +1,153 @@
+# ledger.py
+# Durable SQLite ledger of the scrape jobs, one row per match URL found on the fixtures page.
+# discovered: found, never attempted; pending: failed, retried once its backoff has passed;
+# done: committed to MongoDB; failed: quarantined after MAX_ATTEMPTS failures.
+# Run with: python ledger.py status|retry [--ledger scrape_jobs.sqlite3]
+import argparse
+import os
+import sqlite3
+import time
+
+LEDGER_PATH = os.getenv('SCRAPER_LEDGER', 'scrape_jobs.sqlite3')
+MAX_ATTEMPTS = int(os.getenv('SCRAPER_MAX_ATTEMPTS', 5))        # Failures before a job is quarantined
+BACKOFF_SECONDS = float(os.getenv('SCRAPER_BACKOFF_SECONDS', 600))  # Wait after the first failure, doubled after each
+MAX_BACKOFF_SECONDS = 24 * 3600
+STATUSES = ['discovered', 'pending', 'done', 'failed']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    match_id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL,
+    competition TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL,
+    last_error TEXT,
+    updated_at REAL NOT NULL
+)
+"""
+
+
+def backoff_seconds(attempts, base=BACKOFF_SECONDS):
+    # 10 min, 20 min, 40 min, ... after the 1st, 2nd, 3rd failure, at most a day
+    return min(base * 2 ** (attempts - 1), MAX_BACKOFF_SECONDS)
+
+
+class JobLedger:
+    """Status, attempt count and next retry time of every scrape job, kept across runs."""
+
+    def __init__(self, path=LEDGER_PATH, max_attempts=MAX_ATTEMPTS, backoff=BACKOFF_SECONDS):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(SCHEMA)
+        self.connection.commit()
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+
+    def discover(self, jobs, committed_ids=(), partial_ids=()):
+        """Record (match_id, url, competition) jobs, those in `committed_ids` as done. Returns the new jobs.
+
+        Done jobs whose match is in `partial_ids` (stored with part of its events only) are requeued.
+        """
+        now = time.time()
+        committed_ids = set(committed_ids) - set(partial_ids)
+        known = {row[0] for row in self.connection.execute("SELECT match_id FROM jobs")}
+        new_jobs = [job for job in jobs if job[0] not in known]
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO jobs (match_id, url, competition, status, updated_at) VALUES (?, ?, ?, ?, ?)",
+                [(match_id, url, competition, 'done' if match_id in committed_ids else 'discovered', now)
+                 for match_id, url, competition in new_jobs]
+            )
+            # Matches committed by another run or a replay
+            self.connection.executemany(
+                "UPDATE jobs SET status = 'done', updated_at = ? WHERE match_id = ? AND status != 'done'",
+                [(now, match_id) for match_id in committed_ids]
+            )
+            self.connection.executemany(
+                "UPDATE jobs SET status = 'discovered', attempts = 0, next_attempt_at = NULL, updated_at = ? "
+                "WHERE match_id = ? AND status = 'done'",
+                [(now, match_id) for match_id in partial_ids]
+            )
+        return new_jobs
+
+    def outstanding(self, now=None):
+        # Jobs due now: never attempted, or failed with their backoff passed
+        rows = self.connection.execute(
+            "SELECT match_id, url, competition FROM jobs WHERE status IN ('discovered', 'pending') "
+            "AND (next_attempt_at IS NULL OR next_attempt_at <= ?) ORDER BY match_id",
+            (time.time() if now is None else now,)
+        )
+        return [tuple(row) for row in rows]
+
+    def mark_done(self, match_id):
+        with self.connection:
+            self.connection.execute(
+                "UPDATE jobs SET status = 'done', attempts = attempts + 1, next_attempt_at = NULL, "
+                "last_error = NULL, updated_at = ? WHERE match_id = ?", (time.time(), match_id)
+            )
+
+    def mark_failed(self, match_id, error):
+        """Count a failed attempt, back off before the next one or quarantine the job. Returns its new status."""
+        now = time.time()
+        attempts = self.connection.execute("SELECT attempts FROM jobs WHERE match_id = ?", (match_id,)).fetchone()[0] + 1
+        status = 'failed' if attempts >= self.max_attempts else 'pending'
+        next_attempt_at = None if status == 'failed' else now + backoff_seconds(attempts, self.backoff)
+        with self.connection:
+            self.connection.execute(
+                "UPDATE jobs SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ?, updated_at = ? "
+                "WHERE match_id = ?", (status, attempts, next_attempt_at, str(error), now, match_id)
+            )
+        return status
+
+    def retry_failed(self, match_ids=None):
+        # Give quarantined jobs a fresh set of attempts
+        query = "UPDATE jobs SET status = 'pending', attempts = 0, next_attempt_at = NULL, updated_at = ? " \
+                "WHERE status = 'failed'"
+        parameters = [time.time()]
+        if match_ids:
+            query += f" AND match_id IN ({', '.join('?' * len(match_ids))})"
+            parameters += list(match_ids)
+        with self.connection:
+            return self.connection.execute(query, parameters).rowcount
+
+    def counts(self):
+        counts = dict.fromkeys(STATUSES, 0)
+        counts.update(self.connection.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"))
+        return counts
+
+    def failures(self):
+        # Quarantined and backing-off jobs with their last error
+        rows = self.connection.execute(
+            "SELECT match_id, status, attempts, next_attempt_at, last_error, url FROM jobs "
+            "WHERE status IN ('pending', 'failed') ORDER BY status, match_id"
+        )
+        return [dict(zip(['match_id', 'status', 'attempts', 'next_attempt_at', 'last_error', 'url'], row))
+                for row in rows]
+
+    def close(self):
+        self.connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scrape job ledger")
+    parser.add_argument('command', choices=['status', 'retry'])
+    parser.add_argument('match_ids', nargs='*', type=int, help="quarantined matches to retry, all when omitted")
+    parser.add_argument('--ledger', default=LEDGER_PATH)
+    args = parser.parse_args()
+
+    ledger = JobLedger(args.ledger)
+    if args.command == 'retry':
+        print(f"Requeued {ledger.retry_failed(args.match_ids)} quarantined jobs")
+    else:
+        print(", ".join(f"{status}: {count}" for status, count in ledger.counts().items()))
+        for job in ledger.failures():
+            if job['status'] == 'failed':
+                retry = "quarantined"
+            else:
+                retry = f"retry in {max((job['next_attempt_at'] or 0) - time.time(), 0) / 60:.0f} min"
+            print(f"  {job['match_id']} ({job['attempts']} attempts, {retry}): {job['last_error']}")
+    ledger.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+# live.py
+# Live ingest of a match in progress, polled until full time. Each poll diffs the page's events against
+# the ones already seen (by WhoScored event id) and only the new ones are preprocessed and stored, with
+# the short tail of stored events they depend on: the open possession chain and the last successful pass,
+# whose recipient is only known once the next one arrives. Pass networks and momentum are running totals
+# updated from the new events. At full time the whole match is committed once, like a scraped match.
+# Run with: python scraper.py --live <match_id> [--live-url URL] [--live-interval 15]
+import os
+import time
+import numpy as np
+import pandas as pd
+from archive import ARCHIVE_DIR, save_raw_match
+from scraper import build_match_data, commit_match, fetch_match_centre_data
+from storage import write_match_data, write_pass_networks
+from utilities import DUEL_TYPES, momentum_per_minute
+from xt import score_xt
+
+LIVE_POLL_SECONDS = float(os.getenv('LIVE_POLL_SECONDS', 15))  # Seconds between two polls of the match page
+FINISHED = ['FT', 'AET', 'PEN']  # matchCentreData 'elapsed' once the match is over
+
+
+class LiveMatch:
+    """Incremental ingest state of one match in progress, fed one matchCentreData payload per poll."""
+
+    def __init__(self, db, match_id, competition, xt_grid=None):
+        self.db = db
+        self.match_id = match_id
+        self.competition = competition
+        self.xt_grid = xt_grid
+        self.metric = 'final_third' if xt_grid is None else 'xt'
+        self.minute = 0
+        self.seen = set()        # WhoScored ids of the events already processed
+        self.tail = []           # Raw stored events preprocessed again with the next new events
+        self.tail_ids = set()    # Their _id
+        self.tail_start = None   # (_id, chain_id) of the first tail event, to carry the chain numbering on
+        self.open_pass = None    # _id of the last successful pass, its recipient comes with the next one
+        self.cutoffs = {}        # team_id -> first substitution seconds, never earlier than halftime
+        self.nodes = {}          # (team_id, passer) -> [sum of x, sum of y, passes]
+        self.edges = {}          # (team_id, passer, recipient) -> passes
+        self.momentum = (pd.Series(dtype='float64'), pd.Series(dtype='float64'))
+
+    def update(self, matchdict):
+        """Store the events of the payload not seen before, returns how many there were."""
+        new_events = [event for event in matchdict['events'] if event.get('id') not in self.seen]
+        if not new_events:
+            return 0
+        # A poll failing halfway leaves the running state as it was, the next poll takes its events again
+        saved = self.save_state()
+        try:
+            self.ingest(matchdict, new_events)
+        except Exception:
+            self.restore_state(saved)
+            raise
+        self.seen.update(event.get('id') for event in new_events)
+        return len(new_events)
+
+    def save_state(self):
+        # Everything but the seen ids, which are only added once a poll has been stored
+        return {
+            'minute': self.minute, 'tail': self.tail, 'tail_ids': self.tail_ids, 'tail_start': self.tail_start,
+            'open_pass': self.open_pass, 'cutoffs': dict(self.cutoffs), 'edges': dict(self.edges),
+            'nodes': {key: list(node) for key, node in self.nodes.items()}, 'momentum': self.momentum,
+        }
+
+    def restore_state(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    def ingest(self, matchdict, new_events):
+        window = self.tail + new_events
+        matches_df, teams_df, players_df, events_df = build_match_data(
+            {**matchdict, 'events': window}, self.match_id, self.competition
+        )
+
+        # The window numbers its chains from 1, shift them onto the stored numbering
+        if self.tail_start is not None:
+            first_id, first_chain = self.tail_start
+            window_chain = events_df.loc[events_df['_id'] == first_id, 'chain_id']
+            if len(window_chain):
+                events_df['chain_id'] += first_chain - window_chain.iloc[0]
+        if self.xt_grid is not None:
+            events_df = events_df.assign(xt=score_xt(events_df, self.xt_grid))
+        is_new = ~events_df['_id'].isin(self.tail_ids)
+        if len(events_df):
+            self.minute = max(self.minute, int(events_df['minute'].max()))
+
+        # The data version changes with every poll, so figures cached from a stopped match are never stale
+        matches_df = matches_df.assign(live=True, partial=True, live_minute=float(self.minute),
+                                       data_version=f"partial-{len(self.seen) + len(new_events)}")
+        write_match_data(self.db, matches_df, teams_df, players_df, events_df)
+        self.update_pass_networks(events_df, is_new)
+        write_pass_networks(self.db, self.pass_network_documents(matches_df.iloc[0], players_df))
+        self.update_momentum(events_df[is_new], matches_df.iloc[0])
+        self.keep_tail(events_df, window)
+
+    def update_pass_networks(self, events_df, is_new):
+        # Same passes as utilities.build_pass_networks: successful, before the team's first substitution
+        substitutions = events_df[is_new & (events_df['type'] == 'SubstitutionOn')]
+        for team_id, seconds in substitutions.groupby('team_id', observed=True)['total_seconds'].min().items():
+            self.cutoffs.setdefault(int(team_id), max(float(seconds), 60 * 45))
+        passes = events_df[(events_df['type'] == 'Pass') & (events_df['type_outcome'] == 'Successful')]
+        cutoff = passes['team_id'].map(self.cutoffs)
+        passes = passes[cutoff.isna() | (passes['total_seconds'] < cutoff)]
+
+        new_passes = passes[is_new[passes.index]].astype({'x': 'float64', 'y': 'float64'})
+        for (team_id, passer), row in new_passes.groupby(['team_id', 'passer']).agg(
+                x=('x', 'sum'), y=('y', 'sum'), count=('x', 'size')).iterrows():
+            node = self.nodes.setdefault((int(team_id), int(passer)), [0.0, 0.0, 0])
+            node[0] += row['x']
+            node[1] += row['y']
+            node[2] += int(row['count'])
+
+        # Edges of the new passes and of the stored pass whose recipient this window found
+        resolved = passes[passes['recipient'].notna() & (is_new[passes.index] | (passes['_id'] == self.open_pass))]
+        for (team_id, passer, recipient), count in resolved.groupby(['team_id', 'passer', 'recipient']).size().items():
+            key = (int(team_id), int(passer), int(recipient))
+            self.edges[key] = self.edges.get(key, 0) + int(count)
+
+    def pass_network_documents(self, match, players_df):
+        # Same documents as utilities.build_pass_networks, from the running sums
+        shirts = dict(zip(players_df['player_id'], players_df['shirt_no']))
+        documents = []
+        for team_id in [int(match['home_team_id']), int(match['away_team_id'])]:
+            cutoff = self.cutoffs.get(team_id)
+            documents.append({
+                '_id': f"{self.match_id}_{team_id}",
+                'match_id': int(self.match_id),
+                'team_id': team_id,
+                'first_sub_seconds': cutoff,
+                'nodes': [
+                    {'player_id': passer, 'shirt_no': int(shirts[passer]), 'x': sum_x / count, 'y': sum_y / count,
+                     'count': count}
+                    for (team, passer), (sum_x, sum_y, count) in self.nodes.items() if team == team_id and passer in shirts
+                ],
+                'edges': [
+                    {'passer': passer, 'recipient': recipient, 'pass_count': count}
+                    for (team, passer, recipient), count in self.edges.items() if team == team_id
+                ],
+            })
+        return documents
+
+    def update_momentum(self, new_events_df, match):
+        home, away = momentum_per_minute(new_events_df, self.match_id, match['home_team_id'], match['away_team_id'],
+                                         self.metric)
+        self.momentum = (self.momentum[0].add(home, fill_value=0), self.momentum[1].add(away, fill_value=0))
+        # Read by data_loader.load_live_momentum
+        self.db.live_momentum.replace_one({'_id': self.match_id}, {
+            '_id': self.match_id,
+            'metric': self.metric,
+            'minute': self.minute,
+            'home': {str(int(minute)): float(value) for minute, value in self.momentum[0].items()},
+            'away': {str(int(minute)): float(value) for minute, value in self.momentum[1].items()},
+        }, upsert=True)
+
+    def keep_tail(self, events_df, window):
+        # From the last touch (its chain may go on) or the pass waiting for its recipient, whichever is first
+        lost_duel = events_df['type'].isin(DUEL_TYPES) & (events_df['type_outcome'] == 'Unsuccessful')
+        touches = np.flatnonzero((events_df['is_touch'] & ~lost_duel).to_numpy())
+        successful = (events_df['type'] == 'Pass') & (events_df['type_outcome'] == 'Successful')
+        open_passes = np.flatnonzero((successful & events_df['recipient'].isna()).to_numpy())
+        self.open_pass = events_df['_id'].iloc[open_passes[-1]] if len(open_passes) else None
+        starts = [positions[-1] for positions in (touches, open_passes) if len(positions)]
+        if not starts:
+            self.tail, self.tail_ids, self.tail_start = [], set(), None
+            return
+        tail_df = events_df.iloc[min(starts):]
+        raw_events = {f"{self.match_id}_{int(event['id'])}": event for event in window if event.get('id') is not None}
+        self.tail = [raw_events[event_id] for event_id in tail_df['_id'] if event_id in raw_events]
+        self.tail_ids = set(tail_df['_id'])
+        self.tail_start = (tail_df['_id'].iloc[0], tail_df['chain_id'].iloc[0])
+
+    def finish(self, matchdict, url=None, archive_dir=ARCHIVE_DIR):
+        # Full time: archive the payload and commit the whole match, its documents replace the live ones
+        save_raw_match(self.match_id, self.competition, url, matchdict, archive_dir)
+        commit_match(self.db, self.match_id, *build_match_data(matchdict, self.match_id, self.competition),
+                     xt_grid=self.xt_grid)
+        self.db.live_momentum.delete_one({'_id': self.match_id})
+
+    def stop(self):
+        # Stopped before full time: the match keeps its partial marker, so the scraper still treats it as
+        # outstanding and the next full scrape replaces it
+        self.db.matches.update_one({'_id': self.match_id}, {'$set': {'live': False, 'partial': True}})
+        self.db.live_momentum.delete_one({'_id': self.match_id})
+
+
+def run_live(db, match_id, url, competition, fetcher, interval=LIVE_POLL_SECONDS, xt_grid=None,
+             archive_dir=ARCHIVE_DIR):
+    """Poll the match page every `interval` seconds and store its new events, until full time."""
+    live = LiveMatch(db, match_id, competition, xt_grid)
+    print(f"Following match {match_id} live from {url}, polling every {interval:g}s")
+    finished = False
+    try:
+        while not finished:
+            started = time.perf_counter()
+            try:
+                matchdict = fetch_match_centre_data(fetcher, url)
+                fetched = time.perf_counter()
+                if matchdict is not None:
+                    new_events = live.update(matchdict)
+                    print(f"{live.minute}': {new_events} new events, fetched in {fetched - started:.2f}s, "
+                          f"stored in {time.perf_counter() - fetched:.2f}s")
+                    if matchdict.get('elapsed') in FINISHED:
+                        live.finish(matchdict, url, archive_dir)
+                        finished = True
+                        print(f"Full time, committed match {match_id}")
+                        continue
+            except Exception as exc:
+                # A failed poll (page, payload or MongoDB) is retried at the next interval
+                print(f"Poll failed: {exc}")
+            time.sleep(max(interval - (time.perf_counter() - started), 0))
+    except KeyboardInterrupt:
+        print(f"Stopped following match {match_id}")
+    finally:
+        # However the loop ends before full time, the match is left marked partial and no longer live
+        if not finished:
+            live.stop()
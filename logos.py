@@ -0,0 +1,93 @@
+# logos.py
+# Manifest of the team logos, cropped, resized and base64-encoded once instead of on every dashboard rerun.
+# Run with: python logos.py build [--logo-dir team_logos]
+import argparse
+import base64
+import json
+import os
+import re
+from io import BytesIO
+from PIL import Image, ImageDraw
+
+LOGO_DIR = 'team_logos'
+LOGO_MANIFEST_PATH = os.getenv('LOGO_MANIFEST_PATH', os.path.join(LOGO_DIR, 'manifest.json'))
+LOGO_BOX_SIZE = (150, 150)
+FALLBACK_KEY = '_fallback'  # Shown for teams without a logo file
+
+
+def normalize_team_name(name):
+    # "Aston Villa", "aston villa" and "aston_villa" share one key
+    return re.sub(r'[\s_]+', '_', name.strip().lower())
+
+
+def encode_png(logo):
+    buffered = BytesIO()
+    logo.save(buffered, format="PNG")
+    return base64.b64encode(buffered.getvalue()).decode('utf-8')
+
+
+def encode_logo(logo_path, box_size=LOGO_BOX_SIZE):
+    logo = Image.open(logo_path).convert("RGBA")  # Convert to RGBA to handle transparency
+
+    # Crop transparent padding around the image
+    bbox = logo.getbbox()
+    if bbox:
+        logo = logo.crop(bbox)
+
+    logo.thumbnail(box_size, Image.LANCZOS)
+    return encode_png(logo)
+
+
+def fallback_logo(box_size=LOGO_BOX_SIZE):
+    # Plain badge in the dashboard colors
+    logo = Image.new("RGBA", box_size, (0, 0, 0, 0))
+    ImageDraw.Draw(logo).ellipse(
+        [4, 4, box_size[0] - 5, box_size[1] - 5], fill='#0A0A2A', outline='#FDCB13', width=6
+    )
+    return encode_png(logo)
+
+
+def build_logo_manifest(logo_dir=LOGO_DIR, box_size=LOGO_BOX_SIZE):
+    """Encode every `<team name>_logo.png` of `logo_dir`, keyed by normalized team name."""
+    manifest = {FALLBACK_KEY: fallback_logo(box_size)}
+    for file_name in sorted(os.listdir(logo_dir)):
+        if file_name.endswith('_logo.png'):
+            team_name = file_name[:-len('_logo.png')]
+            manifest[normalize_team_name(team_name)] = encode_logo(os.path.join(logo_dir, file_name), box_size)
+    return manifest
+
+
+def write_logo_manifest(manifest, path=LOGO_MANIFEST_PATH):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, separators=(',', ':'), sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def load_logo_manifest(path=LOGO_MANIFEST_PATH, logo_dir=LOGO_DIR):
+    # Built in memory when the build step has not been run
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    return build_logo_manifest(logo_dir)
+
+
+def team_logo(manifest, team_name):
+    # Base64 PNG of the team's logo, the fallback badge when there is none
+    return manifest.get(normalize_team_name(team_name), manifest[FALLBACK_KEY])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Team logo manifest")
+    parser.add_argument('command', choices=['build'])
+    parser.add_argument('--logo-dir', default=LOGO_DIR)
+    parser.add_argument('--output', default=LOGO_MANIFEST_PATH)
+    args = parser.parse_args()
+
+    manifest = build_logo_manifest(args.logo_dir)
+    write_logo_manifest(manifest, args.output)
+    print(f"Wrote {len(manifest) - 1} logos to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# migrate.py
+# One-off migrations of databases written by earlier versions of the scraper.
+# players: databases written before the player dimension kept one `players` document per player and match
+# (_id "<player_id>_<match_id>"). Those become `appearances` and one `players` document per player_id,
+# without a replay, so matches scraped before the raw archive existed keep their players.
+# Run with: python migrate.py players [--dry-run]
+import argparse
+from pymongo import UpdateOne
+from storage import BATCH_SIZE, bulk_write_batches
+
+# Per-match player documents, the player dimension has neither a match_id nor a string _id
+LEGACY_PLAYERS_QUERY = {'$or': [{'match_id': {'$exists': True}}, {'_id': {'$not': {'$type': 'number'}}}]}
+APPEARANCE_KEYS = ['shirt_no', 'position', 'team_id', 'stats', 'competition', 'match_id']
+
+
+def legacy_player_id(doc):
+    # Older documents carry player_id, the first ones only have it in their _id
+    if doc.get('player_id') is not None:
+        return int(doc['player_id'])
+    prefix = str(doc['_id']).split('_')[0]
+    return int(prefix) if prefix.isdigit() else None
+
+
+def split_legacy_players(documents):
+    """Player dimension and appearance documents from legacy per-match player documents.
+
+    The dimension keeps the name and age of each player's latest match. Returns (players, appearances,
+    skipped), skipped being the documents whose player_id or match_id cannot be recovered.
+    """
+    players = {}
+    appearances = []
+    skipped = []
+    for doc in documents:
+        player_id = legacy_player_id(doc)
+        if player_id is None or doc.get('match_id') is None:
+            skipped.append(doc)
+            continue
+        match_id = int(doc['match_id'])
+        appearances.append({
+            '_id': f"{player_id}_{match_id}", 'player_id': player_id,
+            **{key: doc[key] for key in APPEARANCE_KEYS if key in doc}, 'match_id': match_id,
+        })
+        if player_id not in players or match_id >= players[player_id][0]:
+            players[player_id] = (match_id, {'_id': player_id, 'name': doc.get('name'), 'age': doc.get('age')})
+    return [player for _, player in players.values()], appearances, skipped
+
+
+def migrate_legacy_players(db, dry_run=False, batch_size=BATCH_SIZE):
+    """Move the legacy per-match documents out of `players`, returns the migration counts.
+
+    Documents written since the split win: existing appearances and players are never overwritten.
+    The legacy documents are deleted once both writes went through, so the migration can be run again.
+    """
+    documents = list(db.players.find(LEGACY_PLAYERS_QUERY))
+    players, appearances, skipped = split_legacy_players(documents)
+    counts = {'legacy': len(documents), 'players': len(players), 'appearances': len(appearances),
+              'skipped': len(skipped)}
+    if dry_run or not documents:
+        return counts
+
+    bulk_write_batches(db.appearances, [
+        UpdateOne({'_id': doc['_id']}, {'$setOnInsert': doc}, upsert=True) for doc in appearances
+    ], batch_size)
+    bulk_write_batches(db.players, [
+        UpdateOne({'_id': doc['_id']}, {'$setOnInsert': doc}, upsert=True) for doc in players
+    ], batch_size)
+    skipped_ids = {doc['_id'] for doc in skipped}
+    migrated_ids = [doc['_id'] for doc in documents if doc['_id'] not in skipped_ids]
+    for start in range(0, len(migrated_ids), batch_size):
+        db.players.delete_many({'_id': {'$in': migrated_ids[start:start + batch_size]}})
+    return counts
+
+
+def main():
+    from pymongo import MongoClient
+    from data_loader import DB_NAME, get_mongo_uri
+
+    parser = argparse.ArgumentParser(description="One-off database migrations")
+    parser.add_argument('command', choices=['players'])
+    parser.add_argument('--dry-run', action='store_true', help="only count the documents to migrate")
+    args = parser.parse_args()
+
+    client = MongoClient(get_mongo_uri())
+    counts = migrate_legacy_players(client[DB_NAME], args.dry_run)
+    print(f"{counts['legacy']} legacy player documents: {counts['players']} players, "
+          f"{counts['appearances']} appearances, {counts['skipped']} skipped"
+          + (" (dry run)" if args.dry_run else ""))
+    client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# mirror.py
+# Keeps a local columnar snapshot (Arrow IPC) of the MongoDB collections, partitioned by match_id.
+# Run with: python mirror.py sync [--mirror-dir mirror]
+import argparse
+import os
+import pyarrow as pa
+from pymongo import MongoClient
+from data_loader import (
+    APPEARANCE_FIELDS, DB_NAME, EVENT_FIELDS, MATCH_FIELDS, PLAYER_FIELDS, TEAM_FIELDS, get_mongo_uri,
+    mirror_partition_path, mirrored_match_ids, pass_network_frames, read_collection
+)
+
+DEFAULT_MIRROR_DIR = 'mirror'
+
+
+def write_arrow(df, path):
+    # Uncompressed IPC files so readers can memory-map them
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    tmp_path = f"{path}.tmp"
+    with pa.OSFile(tmp_path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+
+
+def sync_mirror(db, mirror_dir=DEFAULT_MIRROR_DIR, refresh=False):
+    """Fetch the matches missing from the snapshot, returns the synced match_ids.
+
+    With refresh=True every match is fetched again, e.g. after `scraper.py --replay`.
+    """
+    missing = set(db.matches.distinct('_id', {'partial': {'$ne': True}}))  # Live matches are mirrored once committed
+    if not refresh:
+        missing -= mirrored_match_ids(mirror_dir)
+    missing = sorted(missing)
+    for match_id in missing:
+        query = {'match_id': match_id}
+        write_arrow(read_collection(db.events, EVENT_FIELDS, query), mirror_partition_path(mirror_dir, 'events', match_id))
+        write_arrow(read_collection(db.appearances, APPEARANCE_FIELDS, query),
+                    mirror_partition_path(mirror_dir, 'appearances', match_id))
+        nodes_df, edges_df = pass_network_frames(list(db.pass_networks.find(query)))
+        write_arrow(nodes_df, mirror_partition_path(mirror_dir, 'pass_network_nodes', match_id))
+        write_arrow(edges_df, mirror_partition_path(mirror_dir, 'pass_network_edges', match_id))
+        # The matches partition marks the match as complete, so it is written last
+        write_arrow(read_collection(db.matches, MATCH_FIELDS, {'_id': match_id}),
+                    mirror_partition_path(mirror_dir, 'matches', match_id))
+        print(f"Mirrored match: {match_id}")
+
+    # Teams and players are small and updated in place, so they are always refreshed
+    for collection, fields in [('teams', TEAM_FIELDS), ('players', PLAYER_FIELDS)]:
+        path = os.path.join(mirror_dir, f"{collection}.arrow")
+        if missing or refresh or not os.path.exists(path):
+            write_arrow(read_collection(db[collection], fields), path)
+    return missing
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local columnar mirror of the MongoDB collections")
+    parser.add_argument('command', choices=['sync'])
+    parser.add_argument('--mirror-dir', default=os.getenv('MIRROR_DIR', DEFAULT_MIRROR_DIR))
+    parser.add_argument('--refresh', action='store_true', help="fetch every match again, not only the missing ones")
+    args = parser.parse_args()
+
+    client = MongoClient(get_mongo_uri())
+    synced = sync_mirror(client[DB_NAME], args.mirror_dir, args.refresh)
+    print(f"Synced {len(synced)} matches into {args.mirror_dir}")
+    client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,35 +1,85 @@
+import argparse
 import json
 import time
 import re
-import pandas as pd
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, as_completed, wait
 from bs4 import BeautifulSoup
-from selenium import webdriver
 from pymongo import MongoClient
 from dotenv import load_dotenv
 from datetime import datetime
+from urllib.parse import urljoin
 import os
-from utilities import preprocess_events, preprocess_data, convert_to_json
+from utilities import (
+    preprocess_data, build_pass_networks, build_possession_chains, build_spatial_grids,
+    match_data_version
+)
+from storage import (
+    ensure_indexes, write_match_data, prune_match_data, write_pass_networks, write_possession_chains,
+    write_spatial_grids
+)
+from season import update_season_aggregates
+from xt import load_xt_grid, score_xt
+from archive import ARCHIVE_DIR, save_raw_match, load_raw_match, archived_match_ids
+from fetchers import DEFAULT_FETCHER, FETCHERS, fetcher_factory
+from ledger import LEDGER_PATH, JobLedger
+
+try:
+    import orjson
+except ImportError:  # Optional, the standard library decoder is used without it
+    orjson = None
 
 # Load environment variables from .env file
 load_dotenv()
 
 # Database configuration
 MONGO_URI = f"mongodb+srv://{os.getenv('DB_USERNAME')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_CLUSTER')}.mongodb.net/{os.getenv('DB_NAME')}?retryWrites=true&w=majority"
-client = MongoClient(MONGO_URI)
 DB_NAME = "fcb2425"
 INTERVAL_SECONDS = 2  # Delay between requests
 BASE_URL = 'https://www.whoscored.com/Teams/65/Fixtures/Spain-Barcelona'
 
-def initialize_driver():
-    driver = webdriver.Chrome()
-    driver.get(BASE_URL)
-    time.sleep(3)
-    return driver
+# Worker pool configuration, the request budget is shared by all workers
+SCRAPER_WORKERS = int(os.getenv('SCRAPER_WORKERS', 4))
+REQUESTS_PER_SECOND = float(os.getenv('SCRAPER_REQUESTS_PER_SECOND', 1 / INTERVAL_SECONDS))
+
+# Where WhoScored embeds the match payload in the page's script, and the keys build_match_data needs
+MATCH_CENTRE_MARKER = 'matchCentreData:'
+MATCH_CENTRE_KEYS = ['startTime', 'home', 'away', 'events']
+
+
+FIXTURES_SETTLE_SECONDS = 3  # Time the fixtures page scripts get to fill in the match links
+
+
+class TokenBucket:
+    """Thread-safe token bucket shared by all scraping workers.
+
+    Tokens refill at `rate` per second up to `capacity`; `acquire` blocks until one is available.
+    """
 
-def extract_match_urls(driver):
-    soup = BeautifulSoup(driver.page_source, 'html.parser')
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+def extract_match_urls(fetcher, base_url=BASE_URL):
+    page, current_url = fetcher.fetch(base_url)
+    soup = BeautifulSoup(page, 'html.parser')
     all_urls = soup.select('a[href*="\/Live\/"]')
-    all_urls = list(set(['https://www.whoscored.com' + x.attrs['href'] for x in all_urls]))
+    all_urls = list(set([urljoin(current_url, x.attrs['href']) for x in all_urls]))
     laliga_urls = [url for url in all_urls if 'LaLiga' in url]
     champions_league_urls = [url for url in all_urls if 'Champions-League' in url]
     return laliga_urls, champions_league_urls
@@ -40,20 +90,75 @@ def sum_stats(stats_dict, exclude_keys=None):
 
 
 def get_existing_match_ids(db):
-    match_ids = set(item['_id'] for item in db.matches.find({}, {'_id': 1}))
+    # Complete matches only, those followed live and stopped before full time still have to be scraped
+    match_ids = set(item['_id'] for item in db.matches.find({'partial': {'$ne': True}}, {'_id': 1}))
     print("Existing match IDs in the database:", match_ids)
     return match_ids
 
-def scrape_match_data(driver, match_id, url, competition):
-    driver.get(url)
-    soup = BeautifulSoup(driver.page_source, 'html.parser')
-    element = soup.select_one('script:-soup-contains("matchCentreData")')
-    if element is None:
-        print(f"No matchCentreData found for URL: {url}")
+def get_partial_match_ids(db):
+    # Matches holding only part of their events: followed live, in progress or stopped
+    return set(db.matches.distinct('_id', {'partial': True}))
+
+class MatchCentreDataError(ValueError):
+    """The page does not carry matchCentreData in the format the scraper expects."""
+
+
+def _decode_json_object(page, start):
+    # The payload sits alone on its line, orjson decodes that line; otherwise the standard decoder finds its end
+    if orjson is not None:
+        line_end = page.find('\n', start)
+        line = page[start:line_end if line_end != -1 else len(page)].rstrip().rstrip(',')
+        try:
+            return orjson.loads(line)
+        except orjson.JSONDecodeError:
+            pass
+    return json.JSONDecoder().raw_decode(page, start)[0]
+
+
+def extract_match_centre_data(page):
+    """matchCentreData of a match page, None when the match has no data yet (`matchCentreData: null`).
+
+    The payload is located with str.find instead of parsing the page into a DOM tree.
+    Raises MatchCentreDataError when the page or the payload is not in the expected format.
+    """
+    marker = page.find(MATCH_CENTRE_MARKER)
+    if marker == -1:
+        raise MatchCentreDataError("no matchCentreData in the page")
+    start = marker + len(MATCH_CENTRE_MARKER)
+    while start < len(page) and page[start].isspace():
+        start += 1
+
+    if page.startswith('null', start):
         return None
+    if not page.startswith('{', start):
+        raise MatchCentreDataError(f"matchCentreData is not a JSON object: {page[start:start + 40]!r}")
+    try:
+        matchdict = _decode_json_object(page, start)
+    except json.JSONDecodeError as exc:
+        raise MatchCentreDataError(f"matchCentreData is not valid JSON: {exc}") from exc
 
-    matchdict = json.loads(element.text.split("matchCentreData: ")[1].split(',\n')[0])
-    
+    missing = [key for key in MATCH_CENTRE_KEYS if key not in matchdict]
+    if missing:
+        raise MatchCentreDataError(f"matchCentreData is missing {', '.join(missing)}")
+    return matchdict
+
+def fetch_match_centre_data(fetcher, url):
+    page, _ = fetcher.fetch(url)
+    matchdict = extract_match_centre_data(page)
+    if matchdict is None:
+        print(f"No matchCentreData yet for URL: {url}")
+    return matchdict
+
+def scrape_match_data(fetcher, match_id, url, competition, archive_dir=ARCHIVE_DIR):
+    matchdict = fetch_match_centre_data(fetcher, url)
+    if matchdict is None:
+        return None
+
+    # Keep the raw payload so preprocessing changes can be replayed without scraping again
+    save_raw_match(match_id, competition, url, matchdict, archive_dir)
+    return build_match_data(matchdict, match_id, competition)
+
+def build_match_data(matchdict, match_id, competition):
     match_info = {
         '_id': match_id,
         'competition': competition,
@@ -62,8 +167,9 @@ def scrape_match_data(driver, match_id, url, competition):
         'away_team_id': matchdict['away']['teamId'],
         'home_team_name': matchdict['home']['name'],
         'away_team_name': matchdict['away']['name'],
-        'home_score_fulltime': matchdict['home']['scores'].get('fulltime', 0),
-        'away_score_fulltime': matchdict['away']['scores'].get('fulltime', 0),
+        # The running score until full time, for matches scraped live
+        'home_score_fulltime': matchdict['home']['scores'].get('fulltime', matchdict['home']['scores'].get('running', 0)),
+        'away_score_fulltime': matchdict['away']['scores'].get('fulltime', matchdict['away']['scores'].get('running', 0)),
         'home_shots_total': sum_stats(matchdict['home']['stats'].get('shotsTotal', {})),
         'home_shots_on_target': sum_stats(matchdict['home']['stats'].get('shotsOnTarget', {})),
         'home_possession': sum_stats(matchdict['home']['stats'].get('possession', {})),
@@ -121,86 +227,223 @@ def scrape_match_data(driver, match_id, url, competition):
         events_data.append(event_info)
     
     
-    matches_df, teams_df, players_df, events_df = preprocess_data(match_info, teams_data, players_data, events_data)
+    matches_df, teams_df, players_df, events_df = preprocess_data([match_info], teams_data, players_data, events_data)
     return matches_df, teams_df, players_df, events_df
 
 
+def replay_match(match_id, archive_dir=ARCHIVE_DIR):
+    # Rebuild one match from its archived payload, runs in a worker process
+    record = load_raw_match(match_id, archive_dir)
+    return build_match_data(record['matchCentreData'], record['match_id'], record['competition'])
+
+
+def commit_match(db, match_id, matches_df, teams_df, players_df, events_df, xt_grid=None):
+    # Upserts are idempotent, so committing a match that is already stored is a no-op
+    if xt_grid is not None:
+        # xT added by each successful pass, stored with the events
+        events_df = events_df.assign(xt=score_xt(events_df, xt_grid))
+    matches_df = matches_df.assign(data_version=match_data_version(matches_df, players_df, events_df))
+    write_pass_networks(db, build_pass_networks(events_df, players_df))
+    write_possession_chains(db, match_id, build_possession_chains(events_df))
+    write_spatial_grids(db, match_id, build_spatial_grids(events_df))
+    update_season_aggregates(db, matches_df, players_df, events_df)
+    write_match_data(db, matches_df, teams_df, players_df, events_df)
+    prune_match_data(db, match_id, players_df, events_df)
+
+
+def discover_jobs(fetcher, base_url=BASE_URL):
+    # (match_id, url, competition) of every match linked from the fixtures page
+    laliga_urls, champions_league_urls = extract_match_urls(fetcher, base_url)
+    return [
+        (int(re.search(r"Matches/(\d+)/", url).group(1)), url, competition)
+        for competition, urls in [("La Liga", laliga_urls), ("Champions League", champions_league_urls)]
+        for url in urls
+    ]
+
+
+def rebuild_pass_networks(db):
+    # Recompute the pass network aggregates of every stored match from its events
+    from data_loader import load_match_data
+    for match_id in db.matches.distinct('_id'):
+        events_df, appearances_df = load_match_data(db, match_id, mirror_dir=None)
+        write_pass_networks(db, build_pass_networks(events_df, appearances_df))
+        print(f"Rebuilt pass networks for match: {match_id}")
+
+
+def replay_archive(db, archive_dir=ARCHIVE_DIR, workers=None):
+    """Rebuild matches/teams/players/events from the raw archive, no browser and no network.
+
+    Matches are preprocessed across all cores and each one is upserted over what is stored for its match_id.
+    A match that cannot be read, rebuilt or committed is reported and skipped, the others are still replayed.
+    Returns the (match_id, error) pairs of the skipped matches.
+    """
+    match_ids = archived_match_ids(archive_dir)
+    xt_grid = load_xt_grid(db)
+    print(f"Replaying {len(match_ids)} archived matches from {archive_dir}")
+    failures = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(replay_match, match_id, archive_dir): match_id for match_id in match_ids}
+        for future in as_completed(futures):
+            match_id = futures[future]
+            try:
+                commit_match(db, match_id, *future.result(), xt_grid)
+            except Exception as exc:
+                print(f"Failed to replay match {match_id}: {exc}")
+                failures.append((match_id, exc))
+                continue
+            print(f"Replayed match: {match_id}")
+    return failures
+
+
+def scrape_matches_parallel(jobs, workers=SCRAPER_WORKERS, rate_limiter=None, create_fetcher=None,
+                            archive_dir=ARCHIVE_DIR):
+    """Scrape (match_id, url, competition) jobs with a pool of fetchers (see fetchers.py).
+
+    Each worker thread owns one fetcher made by `create_fetcher` and every page load takes a token from the shared
+    rate limiter. Yields (match_id, competition, result, error) as matches finish, where result is
+    what scrape_match_data returned and error the exception it raised (result is then None).
+    At most 2 * workers jobs are in flight at once.
+    """
+    rate_limiter = rate_limiter or TokenBucket(REQUESTS_PER_SECOND)
+    create_fetcher = create_fetcher or fetcher_factory()
+    local = threading.local()
+    fetchers = []
+    fetchers_lock = threading.Lock()
+
+    def worker(match_id, url, competition):
+        if not hasattr(local, 'fetcher'):
+            local.fetcher = create_fetcher()
+            with fetchers_lock:
+                fetchers.append(local.fetcher)
+        rate_limiter.acquire()
+        return scrape_match_data(local.fetcher, match_id, url, competition, archive_dir)
+
+    # Only a few matches are in flight at a time so finished results never pile up in memory
+    jobs = iter(jobs)
+    in_flight = {}
+
+    def submit_next(executor):
+        job = next(jobs, None)
+        if job is not None:
+            match_id, url, competition = job
+            in_flight[executor.submit(worker, match_id, url, competition)] = (match_id, competition)
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for _ in range(workers * 2):
+                submit_next(executor)
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    match_id, competition = in_flight.pop(future)
+                    try:
+                        result, error = future.result(), None
+                    except Exception as exc:
+                        print(f"Failed to scrape match {match_id}: {exc}")
+                        result, error = None, exc
+                    yield match_id, competition, result, error
+                    submit_next(executor)
+    finally:
+        for fetcher in fetchers:
+            fetcher.close()
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Scrape new FC Barcelona matches into MongoDB")
+    parser.add_argument('--workers', type=int, default=SCRAPER_WORKERS, help="number of scraping workers")
+    parser.add_argument('--fetcher', choices=FETCHERS, default=DEFAULT_FETCHER,
+                        help="fetch the pages with headless Chrome or a plain HTTP session")
+    parser.add_argument('--rate', type=float, default=REQUESTS_PER_SECOND,
+                        help="page loads per second shared by all workers")
+    parser.add_argument('--base-url', default=BASE_URL, help="fixtures page listing the match URLs")
+    parser.add_argument('--no-headless', action='store_true', help="show the browser windows")
+    parser.add_argument('--replay', action='store_true',
+                        help="rebuild the stored matches from the raw archive instead of scraping")
+    parser.add_argument('--archive-dir', default=ARCHIVE_DIR, help="raw matchCentreData archive")
+    parser.add_argument('--rebuild-pass-networks', action='store_true',
+                        help="recompute the pass network aggregates of the stored matches")
+    parser.add_argument('--ledger', default=LEDGER_PATH, help="SQLite job ledger, see ledger.py")
+    parser.add_argument('--no-discover', action='store_true',
+                        help="skip the fixtures page, only work the outstanding jobs of the ledger")
+    parser.add_argument('--prerender', action='store_true', help="fill the figure cache for the new matches")
+    parser.add_argument('--live', type=int, metavar='MATCH_ID', help="follow a match in progress until full time")
+    parser.add_argument('--live-url', help="page polled by --live, the WhoScored live page of the match by default")
+    parser.add_argument('--live-interval', type=float, help="seconds between two polls (LIVE_POLL_SECONDS, 15)")
+    parser.add_argument('--competition', default="La Liga", help="competition of the --live match")
+    args = parser.parse_args()
+
     # MongoDB setup
     client = MongoClient(MONGO_URI)
     db = client[DB_NAME]
+    ensure_indexes(db)
+
+    if args.replay:
+        failures = replay_archive(db, args.archive_dir)
+        if failures:
+            print(f"{len(failures)} archived matches could not be replayed: "
+                  f"{', '.join(str(match_id) for match_id, _ in failures)}")
+        client.close()
+        return
+    if args.rebuild_pass_networks:
+        rebuild_pass_networks(db)
+        client.close()
+        return
+    if args.live:
+        from live import LIVE_POLL_SECONDS, run_live
+        url = args.live_url or f"https://www.whoscored.com/Matches/{args.live}/Live"
+        fetcher = fetcher_factory(args.fetcher, not args.no_headless)()
+        try:
+            run_live(db, args.live, url, args.competition, fetcher, args.live_interval or LIVE_POLL_SECONDS,
+                     load_xt_grid(db), args.archive_dir)
+        finally:
+            fetcher.close()
+            client.close()
+        return
     
-    # Get existing match IDs to avoid re-scraping
-    existing_match_ids = get_existing_match_ids(db)
-    
-    # Initialize WebDriver and scrape URLs
-    driver = initialize_driver()
-    laliga_urls, champions_league_urls = extract_match_urls(driver)
-    
-    # Initialize lists to hold new data
-    all_matches = []
-    all_teams = []
-    all_players = []
-    all_events = []
-    
-    # Loop over URLs for each competition
-    for competition, urls in [("La Liga", laliga_urls), ("Champions League", champions_league_urls)]:
-        for url in urls:
-            # Extract match ID
-            match_id = int(re.search(r"Matches/(\d+)/", url).group(1))
-            
-            # Skip if match already exists in the database
-            if match_id in existing_match_ids:
-                print(f"Match {match_id} already exists. Skipping...")
-                continue
-            
-            # Scrape match data
-            print(f"Scraping new match: {match_id} ({competition})")
-            matches_df, teams_df, players_df, events_df = scrape_match_data(driver, match_id, url, competition)
-
-            # Add scraped data to respective lists
-            if not matches_df.empty:
-                all_matches.extend(matches_df.to_dict(orient='records'))
-            if not teams_df.empty:
-                all_teams.extend(teams_df.to_dict(orient='records'))
-            if not players_df.empty:
-                all_players.extend(players_df.to_dict(orient='records'))
-            if not events_df.empty:
-                all_events.extend(events_df.to_dict(orient='records'))
-            
-            time.sleep(INTERVAL_SECONDS)  # Pause to respect site requests
-            
-            
-    # Preprocess data
-    if all_matches or all_teams or all_players or all_events:
-        # Preprocess the collected data
-        matches_df, teams_df, players_df, events_df = preprocess_data(all_matches, all_teams, all_players, all_events)
-        
-        # Convert to JSON-compatible format for MongoDB
-        matches_data, teams_data, players_data, events_data = convert_to_json(matches_df, teams_df, players_df, events_df)
-        
-        # Insert preprocessed data into MongoDB
-        if matches_data:
-            db.matches.insert_many(matches_data)
-        if teams_data:
-            for team in teams_data:
-                db.teams.update_one(
-                    {"_id": team["_id"]},  # Match by team ID
-                    {"$set": team},        # Update the document
-                    upsert=True            # Insert if it doesn't exist
-                )
-            #db.teams.insert_many(teams_data)
-        if players_data:
-            db.players.insert_many(players_data)
-        if events_data:
-            db.events.insert_many(events_data)
-
-
-    print("New data successfully inserted.")
+    # Record the match URLs of the fixtures page in the ledger, those already in the database as done
+    ledger = JobLedger(args.ledger)
+    if not args.no_discover:
+        fetcher = fetcher_factory(args.fetcher, not args.no_headless, FIXTURES_SETTLE_SECONDS)()
+        jobs = discover_jobs(fetcher, args.base_url)
+        fetcher.close()
+        new_jobs = ledger.discover(jobs, get_existing_match_ids(db), get_partial_match_ids(db))
+        print(f"Discovered {len(new_jobs)} new match URLs")
+
+    # Only the jobs never attempted or whose retry backoff has passed
+    jobs = ledger.outstanding()
+    print(f"{len(jobs)} jobs outstanding, ledger: {ledger.counts()}")
+
+    # Scrape the remaining matches with the worker pool and commit each one as soon as it is preprocessed
+    xt_grid = load_xt_grid(db)
+    if xt_grid is None:
+        print("No xT grid stored yet, run `python xt.py fit` to score the passes")
+    rate_limiter = TokenBucket(args.rate)
+    create_fetcher = fetcher_factory(args.fetcher, headless=not args.no_headless)
+    committed = []
+    for match_id, competition, result, error in scrape_matches_parallel(jobs, args.workers, rate_limiter,
+                                                                        create_fetcher, args.archive_dir):
+        if result is None:
+            status = ledger.mark_failed(match_id, error or "no matchCentreData in the page yet")
+            print(f"Match {match_id} not scraped ({status})")
+            continue
+        try:
+            commit_match(db, match_id, *result, xt_grid=xt_grid)
+        except Exception as exc:
+            # Commits are idempotent upserts, the retry rewrites whatever this attempt stored
+            status = ledger.mark_failed(match_id, f"commit failed: {exc}")
+            print(f"Match {match_id} not committed ({status}): {exc}")
+            continue
+        ledger.mark_done(match_id)
+        committed.append(match_id)
+        print(f"Committed new match: {match_id} ({competition})")
+
+    print(f"Committed {len(committed)} matches, ledger: {ledger.counts()}")
+    ledger.close()
+
+    if args.prerender and committed:
+        from figure_cache import prerender_matches
+        prerender_matches(db, sorted(committed))
     client.close()
-    driver.quit()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
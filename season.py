@@ -0,0 +1,285 @@
+# season.py
+# Season aggregates per player and per team, kept up to date by the scraper on every committed match.
+# Each season total carries the contribution of every match it includes, so re-ingesting a match only
+# applies the difference and the totals never need a full recompute.
+# Run with: python season.py rebuild | check
+import argparse
+import sys
+from collections import defaultdict
+import pandas as pd
+from pymongo import UpdateOne
+from storage import bulk_write_batches, upsert_documents
+
+PLAYER_STATS = ['matches', 'minutes', 'goals', 'shots', 'passes', 'passes_successful', 'touches']
+TEAM_STATS = [
+    'matches', 'minutes', 'wins', 'draws', 'losses', 'points',
+    'goals_for', 'goals_against', 'shots', 'passes', 'passes_successful',
+]
+FORM_MATCHES = 5  # Matches in a team's rolling form
+
+# Event fields the contributions are computed from
+SEASON_EVENT_FIELDS = {
+    'match_id': 'int64', 'team_id': 'int64', 'player_id': 'float64', 'minute': 'float64',
+    'type': 'object', 'type_outcome': 'object',
+    'is_goal': 'boolean', 'is_own_goal': 'boolean', 'is_shot': 'boolean', 'is_touch': 'boolean',
+}
+
+
+def season_of(date):
+    # Seasons start in July: 2024-08-17 belongs to "2024-2025"
+    year = date.year if date.month >= 7 else date.year - 1
+    return f"{year}-{year + 1}"
+
+
+def match_contributions(matches_df, players_df, events_df):
+    """Per player-match and per team-match stat rows of the given matches.
+
+    Minutes come from the substitution events: starters play from kickoff, substitutes from the minute
+    they come on, until they go off or the last event of the match (at least 90 minutes).
+    """
+    matches = matches_df.set_index('_id')
+    seasons = matches['date'].map(season_of).rename('season')
+    events = events_df.assign(
+        player_id=events_df['player_id'].astype('Int64'),
+        **{column: events_df[column].fillna(False).astype(bool)
+           for column in ['is_goal', 'is_own_goal', 'is_shot', 'is_touch']}
+    )
+    is_pass = events['type'] == 'Pass'
+    events = events.assign(
+        goals=events['is_goal'] & ~events['is_own_goal'], shots=events['is_shot'], passes=is_pass,
+        passes_successful=is_pass & (events['type_outcome'] == 'Successful'), touches=events['is_touch'],
+    )
+    match_minutes = events.groupby('match_id')['minute'].max().reindex(matches.index).fillna(90).clip(lower=90)
+
+    # Minutes played by each player
+    keys = ['match_id', 'player_id']
+    players = players_df[['player_id', 'match_id', 'team_id', 'position']].astype({'player_id': 'Int64'})
+    subs = events[events['type'].isin(['SubstitutionOn', 'SubstitutionOff'])]
+    sub_minutes = subs.pivot_table(index=keys, columns='type', values='minute', aggfunc='min', observed=True)
+    players = players.join(sub_minutes.reindex(columns=['SubstitutionOn', 'SubstitutionOff']), on=keys)
+    start = players['SubstitutionOn'].where(players['position'] == 'Sub', 0)
+    end = players['SubstitutionOff'].fillna(players['match_id'].map(match_minutes))
+    players['minutes'] = (end - start).clip(lower=0)
+
+    player_rows = players[start.notna()].join(
+        events.groupby(keys)[['goals', 'shots', 'passes', 'passes_successful', 'touches']].sum(), on=keys
+    )
+    player_rows = player_rows.join(seasons, on='match_id').join(matches['date'], on='match_id')
+    player_rows['matches'] = 1
+    player_rows[PLAYER_STATS] = player_rows[PLAYER_STATS].fillna(0).astype(int)
+    player_rows['player_id'] = player_rows['player_id'].astype(int)
+    player_rows['_id'] = player_rows['player_id'].astype(str) + '_' + player_rows['match_id'].astype(str)
+
+    # Both sides of every match
+    team_totals = events.groupby(['match_id', 'team_id'])[['shots', 'passes', 'passes_successful']].sum()
+    sides = []
+    for side, other in [('home', 'away'), ('away', 'home')]:
+        sides.append(pd.DataFrame({
+            'match_id': matches.index,
+            'team_id': matches[f"{side}_team_id"].to_numpy(),
+            'opponent_id': matches[f"{other}_team_id"].to_numpy(),
+            'goals_for': matches[f"{side}_score_fulltime"].to_numpy(),
+            'goals_against': matches[f"{other}_score_fulltime"].to_numpy(),
+        }))
+    team_rows = pd.concat(sides, ignore_index=True).join(team_totals, on=['match_id', 'team_id'])
+    team_rows = team_rows.join(seasons, on='match_id').join(matches['date'], on='match_id')
+    goal_difference = team_rows['goals_for'] - team_rows['goals_against']
+    team_rows['result'] = pd.Series('D', index=team_rows.index).mask(goal_difference > 0, 'W').mask(goal_difference < 0, 'L')
+    team_rows['wins'] = team_rows['result'] == 'W'
+    team_rows['draws'] = team_rows['result'] == 'D'
+    team_rows['losses'] = team_rows['result'] == 'L'
+    team_rows['points'] = 3 * team_rows['wins'] + team_rows['draws']
+    team_rows['matches'] = 1
+    team_rows['minutes'] = team_rows['match_id'].map(match_minutes)
+    team_rows[TEAM_STATS] = team_rows[TEAM_STATS].fillna(0).astype(int)
+    team_rows['_id'] = team_rows['team_id'].astype(str) + '_' + team_rows['match_id'].astype(str)
+
+    player_columns = ['_id', 'player_id', 'match_id', 'team_id', 'season', 'date'] + PLAYER_STATS
+    team_columns = ['_id', 'team_id', 'match_id', 'opponent_id', 'season', 'date', 'result'] + TEAM_STATS
+    return player_rows[player_columns].reset_index(drop=True), team_rows[team_columns].reset_index(drop=True)
+
+
+def _records(rows):
+    # Plain Python values for pymongo
+    return [
+        {key: (value.to_pydatetime() if isinstance(value, pd.Timestamp) else
+               value.item() if hasattr(value, 'item') else value) for key, value in row.items()}
+        for row in rows.to_dict(orient='records')
+    ]
+
+
+def _form(team_matches):
+    # The last FORM_MATCHES results of a team-season, most recent first
+    latest = sorted(team_matches, key=lambda doc: doc['date'], reverse=True)[:FORM_MATCHES]
+    return [{key: doc[key] for key in ['match_id', 'date', 'result', 'goals_for', 'goals_against']} for doc in latest]
+
+
+def update_season_aggregates(db, matches_df, players_df, events_df):
+    """Fold newly committed matches into the season aggregates.
+
+    Every season total keeps the contribution each match added to it under `applied.<match_id>`, and
+    the difference with the new contribution is applied in the same single-document update that
+    replaces it. Committing a match again, or again after a crash at any point, leaves the totals right.
+    A player's team_id is the one of their latest match by date (`last_date`), as in a rebuild, whatever
+    order the matches are committed in.
+    """
+    player_rows, team_rows = match_contributions(matches_df, players_df, events_df)
+    match_ids = [int(match_id) for match_id in matches_df['_id']]
+
+    for contributions, aggregates, entity, stats, rows in [
+        (db.player_match_stats, db.player_season_stats, 'player_id', PLAYER_STATS, player_rows),
+        (db.team_match_stats, db.team_season_stats, 'team_id', TEAM_STATS, team_rows),
+    ]:
+        new = _records(rows.sort_values('date', kind='stable'))
+        # Season totals that already hold a contribution of these matches
+        applied = aggregates.find({'$or': [{f"applied.{match_id}": {'$exists': True}} for match_id in match_ids]})
+
+        last_dates = {}
+        if entity == 'player_id':
+            keys = list({f"{doc[entity]}_{doc['season']}" for doc in new})
+            last_dates = {doc['_id']: doc.get('last_date')
+                          for doc in aggregates.find({'_id': {'$in': keys}}, {'last_date': 1})}
+
+        deltas = defaultdict(lambda: dict.fromkeys(stats, 0))
+        updates = defaultdict(dict)
+        removed = defaultdict(dict)
+        for doc in applied:
+            for match_id in match_ids:
+                previous = doc['applied'].get(str(match_id))
+                if previous is not None:
+                    for stat in stats:
+                        deltas[doc['_id']][stat] -= previous.get(stat, 0)
+                    removed[doc['_id']][f"applied.{match_id}"] = ''
+        for doc in new:
+            key = f"{doc[entity]}_{doc['season']}"
+            for stat in stats:
+                deltas[key][stat] += doc[stat]
+            updates[key].update({entity: doc[entity], 'season': doc['season']})
+            if entity == 'player_id' and (last_dates.get(key) is None or doc['date'] >= last_dates[key]):
+                updates[key].update({'team_id': doc['team_id'], 'last_date': doc['date']})
+                last_dates[key] = doc['date']
+            updates[key][f"applied.{doc['match_id']}"] = {stat: doc[stat] for stat in stats}
+            removed[key].pop(f"applied.{doc['match_id']}", None)
+
+        operations = []
+        for key in deltas:
+            update = {'$inc': deltas[key]}
+            if updates[key]:
+                update['$set'] = updates[key]
+            if removed[key]:
+                update['$unset'] = removed[key]
+            operations.append(UpdateOne({'_id': key}, update, upsert=True))
+        bulk_write_batches(aggregates, operations)
+
+        upsert_documents(contributions, new)
+        contributions.delete_many({'match_id': {'$in': match_ids}, '_id': {'$nin': [doc['_id'] for doc in new]}})
+
+    # Rolling form of the teams that played, from their stored team-match rows
+    for team_id, season in {(doc['team_id'], doc['season']) for doc in _records(team_rows)}:
+        team_matches = db.team_match_stats.find({'team_id': team_id, 'season': season})
+        db.team_season_stats.update_one({'_id': f"{team_id}_{season}"}, {'$set': {'form': _form(team_matches)}})
+
+
+def _stored_match_contributions(db):
+    # Recompute the contributions of every stored match, one match at a time
+    from data_loader import APPEARANCE_FIELDS, MATCH_FIELDS, read_collection
+
+    matches_df = read_collection(db.matches, MATCH_FIELDS)
+    player_chunks, team_chunks = [], []
+    for match_id in matches_df['_id']:
+        query = {'match_id': int(match_id)}
+        player_rows, team_rows = match_contributions(
+            matches_df[matches_df['_id'] == match_id],
+            read_collection(db.appearances, APPEARANCE_FIELDS, query),
+            read_collection(db.events, SEASON_EVENT_FIELDS, query),
+        )
+        player_chunks.append(player_rows)
+        team_chunks.append(team_rows)
+    return (pd.concat(player_chunks, ignore_index=True) if player_chunks else None,
+            pd.concat(team_chunks, ignore_index=True) if team_chunks else None)
+
+
+def _applied(group, stats):
+    # Contribution of each match to a season total, keyed by match_id
+    return {str(row['match_id']): {stat: row[stat] for stat in stats} for row in _records(group)}
+
+
+def season_aggregates(player_rows, team_rows):
+    # Full recompute of the season documents from the per-match rows
+    player_docs = []
+    if player_rows is not None:
+        for (player_id, season), group in player_rows.sort_values('date').groupby(['player_id', 'season']):
+            player_docs.append({
+                '_id': f"{player_id}_{season}", 'player_id': int(player_id), 'season': season,
+                'team_id': int(group['team_id'].iloc[-1]), 'last_date': group['date'].iloc[-1].to_pydatetime(),
+                **{stat: int(group[stat].sum()) for stat in PLAYER_STATS},
+                'applied': _applied(group, PLAYER_STATS),
+            })
+    team_docs = []
+    if team_rows is not None:
+        for (team_id, season), group in team_rows.groupby(['team_id', 'season']):
+            team_docs.append({
+                '_id': f"{team_id}_{season}", 'team_id': int(team_id), 'season': season,
+                **{stat: int(group[stat].sum()) for stat in TEAM_STATS},
+                'form': _form(_records(group)), 'applied': _applied(group, TEAM_STATS),
+            })
+    return player_docs, team_docs
+
+
+def rebuild_season_aggregates(db):
+    """Recompute every contribution and season total from the stored matches."""
+    player_rows, team_rows = _stored_match_contributions(db)
+    player_docs, team_docs = season_aggregates(player_rows, team_rows)
+    for collection in ['player_match_stats', 'team_match_stats', 'player_season_stats', 'team_season_stats']:
+        db[collection].delete_many({})
+    if player_rows is not None:
+        upsert_documents(db.player_match_stats, _records(player_rows))
+        upsert_documents(db.team_match_stats, _records(team_rows))
+    upsert_documents(db.player_season_stats, player_docs)
+    upsert_documents(db.team_season_stats, team_docs)
+    return len(player_docs), len(team_docs)
+
+
+def check_season_aggregates(db):
+    """Compare the stored season totals with a full recompute, returns one line per difference."""
+    player_docs, team_docs = season_aggregates(*_stored_match_contributions(db))
+    problems = []
+    for collection, expected_docs in [('player_season_stats', player_docs), ('team_season_stats', team_docs)]:
+        stored = {doc['_id']: doc for doc in db[collection].find()}
+        for expected in expected_docs:
+            doc = stored.pop(expected['_id'], None)
+            if doc is None:
+                problems.append(f"{collection} {expected['_id']}: missing")
+                continue
+            for field, value in expected.items():
+                if doc.get(field) != value:
+                    problems.append(f"{collection} {expected['_id']}: {field} is {doc.get(field)!r}, expected {value!r}")
+        problems.extend(f"{collection} {key}: not in any stored match" for key in stored)
+    return problems
+
+
+def main():
+    from pymongo import MongoClient
+    from data_loader import DB_NAME, get_mongo_uri
+
+    parser = argparse.ArgumentParser(description="Season aggregates per player and per team")
+    parser.add_argument('command', choices=['rebuild', 'check'])
+    args = parser.parse_args()
+
+    client = MongoClient(get_mongo_uri())
+    db = client[DB_NAME]
+    if args.command == 'rebuild':
+        players, teams = rebuild_season_aggregates(db)
+        print(f"Rebuilt season aggregates: {players} player-seasons, {teams} team-seasons")
+        client.close()
+        return
+    problems = check_season_aggregates(db)
+    client.close()
+    for problem in problems:
+        print(problem)
+    print(f"{len(problems)} differences between the stored and recomputed season aggregates")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
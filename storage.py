@@ -0,0 +1,101 @@
+# storage.py
+# Idempotent MongoDB writes for the preprocessed match data
+from itertools import chain, islice
+from pymongo import ASCENDING, ReplaceOne, UpdateOne
+from utilities import iter_documents, split_players
+
+BATCH_SIZE = 1000  # Operations per bulk_write call
+
+# Secondary indexes used by the loaders and the per-match deletes
+INDEXES = {
+    'events': ['match_id', 'team_id', 'type'],
+    'appearances': ['match_id', 'player_id'],
+    'pass_networks': ['match_id'],
+    'possession_chains': ['match_id'],
+    'spatial_grids': ['match_id', 'team_id', 'player_id'],
+    'player_match_stats': ['match_id'],
+    'team_match_stats': ['match_id', 'team_id'],
+    'player_season_stats': ['season'],
+    'team_season_stats': ['season'],
+}
+
+
+def ensure_indexes(db):
+    # create_index is a no-op when the index already exists
+    for collection, fields in INDEXES.items():
+        for field in fields:
+            db[collection].create_index([(field, ASCENDING)])
+
+
+def bulk_write_batches(collection, operations, batch_size=BATCH_SIZE):
+    # Unordered batches so one bad document does not stop the rest of the batch. `operations` can be a
+    # generator, only one batch of them is built at a time
+    operations = iter(operations)
+    upserted = modified = 0
+    while batch := list(islice(operations, batch_size)):
+        result = collection.bulk_write(batch, ordered=False)
+        upserted += result.upserted_count
+        modified += result.modified_count
+    return upserted, modified
+
+
+def replace_operation(doc):
+    # Documents carry a deterministic _id, so writing the same document twice changes nothing
+    return ReplaceOne({'_id': doc['_id']}, doc, upsert=True)
+
+
+def set_operation(doc):
+    # Refresh the given fields only, for documents shared between matches
+    return UpdateOne({'_id': doc['_id']}, {'$set': doc}, upsert=True)
+
+
+def upsert_documents(collection, documents, batch_size=BATCH_SIZE, operation=replace_operation):
+    return bulk_write_batches(collection, (operation(doc) for doc in documents), batch_size)
+
+
+def write_match_data(db, matches_df, teams_df, players_df, events_df, batch_size=BATCH_SIZE):
+    """Upsert one or more preprocessed matches, re-ingesting a match is a no-op.
+
+    Players are stored once per player_id in `players`, their per-match rows go to `appearances`.
+    The match documents go last so a stored match always has its teams, players and events.
+    Returns the number of upserted and modified documents per collection.
+    """
+    player_info_df, appearances_df = split_players(players_df)
+
+    def write(collection, df, operation=replace_operation):
+        # Documents are built one batch at a time by utilities.iter_documents
+        return upsert_documents(collection, chain.from_iterable(iter_documents(df, batch_size)), batch_size, operation)
+
+    counts = {}
+    # Teams and players are shared between matches, only their fields are refreshed
+    counts['teams'] = write(db.teams, teams_df, set_operation)
+    counts['players'] = write(db.players, player_info_df, set_operation)
+    counts['appearances'] = write(db.appearances, appearances_df)
+    counts['events'] = write(db.events, events_df)
+    counts['matches'] = write(db.matches, matches_df)
+    return counts
+
+
+def prune_match_data(db, match_id, players_df, events_df):
+    # Drop documents a previous ingest stored for this match that are no longer produced
+    db.appearances.delete_many({'match_id': match_id, '_id': {'$nin': players_df['_id'].tolist()}})
+    db.events.delete_many({'match_id': match_id, '_id': {'$nin': events_df['_id'].tolist()}})
+
+
+def write_pass_networks(db, documents, batch_size=BATCH_SIZE):
+    # One document per team-match, see utilities.build_pass_networks
+    return upsert_documents(db.pass_networks, documents, batch_size)
+
+
+def write_spatial_grids(db, match_id, documents, batch_size=BATCH_SIZE):
+    # One document per team, player and event family of the match, see utilities.build_spatial_grids
+    counts = upsert_documents(db.spatial_grids, documents, batch_size)
+    db.spatial_grids.delete_many({'match_id': match_id, '_id': {'$nin': [doc['_id'] for doc in documents]}})
+    return counts
+
+
+def write_possession_chains(db, match_id, documents, batch_size=BATCH_SIZE):
+    # One document per chain of the match, see utilities.build_possession_chains
+    counts = upsert_documents(db.possession_chains, documents, batch_size)
+    db.possession_chains.delete_many({'match_id': match_id, '_id': {'$nin': [doc['_id'] for doc in documents]}})
+    return counts
@@ -0,0 +1,59 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+from benchmark import _legacy_safe_to_dict, make_match_centre_data
+from scraper import build_match_data
+from utilities import iter_documents, safe_to_dict
+
+
+def events():
+    return build_match_data(make_match_centre_data(1839402, 600), 1839402, 'La Liga')[3]
+
+
+def test_documents_match_the_cell_by_cell_version():
+    events_df = events()
+    documents = safe_to_dict(events_df)
+    legacy_documents = _legacy_safe_to_dict(events_df)
+
+    assert len(documents) == len(legacy_documents)
+    for document, legacy in zip(documents, legacy_documents):
+        assert list(document) == list(legacy)
+        for key, value in document.items():
+            if value is None:
+                # The old version let the NaN of nullable integers through
+                assert legacy[key] is None or pd.isna(legacy[key]), key
+            elif isinstance(value, float):
+                assert math.isclose(value, legacy[key], rel_tol=1e-6), key
+            else:
+                assert value == legacy[key], key
+
+
+def test_documents_hold_plain_python_values():
+    events_df = events()
+    for document in safe_to_dict(events_df):
+        for value in document.values():
+            assert value is None or type(value) in (str, int, float, bool), type(value)
+            assert not (isinstance(value, float) and math.isnan(value))
+
+
+def test_nulls_categories_and_float32_decimals():
+    df = pd.DataFrame({
+        'type': pd.Categorical(['Pass', None, 'Goal']),
+        'recipient': pd.array([7, None, 9], dtype='Int32'),
+        'x': np.array([45.3, np.nan, 0.0], dtype=np.float32),
+    })
+    assert safe_to_dict(df) == [
+        {'type': 'Pass', 'recipient': 7, 'x': 45.3},
+        {'type': None, 'recipient': None, 'x': None},
+        {'type': 'Goal', 'recipient': 9, 'x': 0.0},
+    ]
+
+
+def test_documents_come_in_batches():
+    events_df = events()
+    batches = list(iter_documents(events_df, batch_size=100))
+    assert [len(batch) for batch in batches[:-1]] == [100] * (len(batches) - 1)
+    assert 0 < len(batches[-1]) <= 100
+    assert [document for batch in batches for document in batch] == safe_to_dict(events_df)
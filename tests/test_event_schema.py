@@ -0,0 +1,24 @@
+import pandas as pd
+
+from benchmark import _legacy_preprocess_events, make_raw_events
+from test_preprocess import LEGACY_NAMES
+from utilities import EVENT_SCHEMA, compact_events, preprocess_events
+
+
+def test_events_get_the_schema_dtypes():
+    events_df = preprocess_events(make_raw_events(2, 600))
+    for column, dtype in EVENT_SCHEMA.items():
+        if column in events_df:
+            assert events_df[column].dtype == dtype, column
+    # Columns the schema does not list keep theirs
+    assert events_df['_id'].dtype == object and events_df['is_touch'].dtype == bool
+
+
+def test_compact_events_keeps_the_values():
+    # The float64 and object frame events were kept in before the schema
+    wide_df = _legacy_preprocess_events(make_raw_events(2, 600)).rename(columns=LEGACY_NAMES)
+    compact_df = compact_events(wide_df)
+
+    # float32 coordinates hold the pitch's values to 6 significant digits
+    pd.testing.assert_frame_equal(compact_df, wide_df, check_dtype=False, check_categorical=False, rtol=1e-6)
+    assert compact_df.memory_usage(deep=True).sum() < wide_df.memory_usage(deep=True).sum() / 2
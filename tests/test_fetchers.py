@@ -0,0 +1,50 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from fetchers import FetchError, HttpFetcher
+
+
+class StatusHandler(BaseHTTPRequestHandler):
+    # /<status> answers with that status
+    def do_GET(self):
+        status = int(self.path.strip('/'))
+        self.send_response(status)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def base_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StatusHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_page_is_returned(base_url):
+    fetcher = HttpFetcher(retries=0)
+    assert fetcher.fetch(f"{base_url}/200") == ("ok", f"{base_url}/200")
+    fetcher.close()
+
+
+@pytest.mark.parametrize('status', [404, 503])
+def test_error_status_raises_fetch_error(base_url, status):
+    # 404 fails at once, 503 once its retries run out (RetryError in requests)
+    fetcher = HttpFetcher(retries=0)
+    with pytest.raises(FetchError, match=f"/{status}"):
+        fetcher.fetch(f"{base_url}/{status}")
+    fetcher.close()
+
+
+def test_connection_failure_raises_fetch_error(base_url):
+    fetcher = HttpFetcher(retries=0)
+    with pytest.raises(FetchError):
+        fetcher.fetch("http://127.0.0.1:9/")
+    fetcher.close()
@@ -0,0 +1,44 @@
+import pytest
+
+mongomock = pytest.importorskip('mongomock')
+
+from benchmark import make_match_centre_data
+from data_loader import load_match_data, load_matches, load_pass_networks
+from figure_cache import render_match_figures
+from scraper import build_match_data, commit_match
+
+MATCH_ID = 1839402
+
+
+def commit(db, seed):
+    commit_match(db, MATCH_ID, *build_match_data(make_match_centre_data(MATCH_ID, 600, seed=seed), MATCH_ID, 'La Liga'))
+
+
+def render(db, cache_dir):
+    # Same reads as the dashboard, without the mirror
+    events_df, _ = load_match_data(db, MATCH_ID, mirror_dir=None)
+    return render_match_figures(load_matches(db, mirror_dir=None), events_df,
+                                load_pass_networks(db, MATCH_ID, mirror_dir=None), MATCH_ID, cache_dir=str(cache_dir))
+
+
+def cached_files(cache_dir):
+    return sorted(path.name for path in cache_dir.rglob('*.png'))
+
+
+def test_recommitted_match_is_drawn_again(tmp_path):
+    db = mongomock.MongoClient().db
+    commit(db, seed=0)
+    first = render(db, tmp_path)
+    files = cached_files(tmp_path)
+
+    # Committed again unchanged: every figure comes from the cache
+    commit(db, seed=0)
+    assert render(db, tmp_path) == first
+    assert cached_files(tmp_path) == files
+
+    # Committed again with other events: nothing drawn from the earlier data is served
+    commit(db, seed=1)
+    second = render(db, tmp_path)
+    assert second.keys() == first.keys()
+    assert all(second[name] != first[name] for name in first)
+    assert len(cached_files(tmp_path)) == 2 * len(files)
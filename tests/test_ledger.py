@@ -0,0 +1,67 @@
+from types import SimpleNamespace
+
+import pytest
+
+import ledger
+
+JOBS = [(1, 'https://example.com/Matches/1/Live', 'La Liga'), (2, 'https://example.com/Matches/2/Live', 'La Liga')]
+NOW = 1_000_000.0
+
+
+@pytest.fixture
+def jobs_ledger(tmp_path, monkeypatch):
+    # The ledger's clock is frozen, outstanding() takes the time to look at
+    monkeypatch.setattr(ledger, 'time', SimpleNamespace(time=lambda: NOW))
+    jobs_ledger = ledger.JobLedger(str(tmp_path / 'jobs.sqlite3'), max_attempts=3, backoff=60)
+    jobs_ledger.discover(JOBS)
+    yield jobs_ledger
+    jobs_ledger.close()
+
+
+def test_backoff_doubles_up_to_a_day():
+    assert [ledger.backoff_seconds(attempts, 60) for attempts in [1, 2, 3]] == [60, 120, 240]
+    assert ledger.backoff_seconds(30, 60) == ledger.MAX_BACKOFF_SECONDS
+
+
+def test_failed_job_waits_for_its_backoff(jobs_ledger):
+    assert jobs_ledger.mark_failed(1, 'timeout') == 'pending'
+    assert jobs_ledger.outstanding(NOW) == [JOBS[1]]
+    assert jobs_ledger.outstanding(NOW + 59) == [JOBS[1]]
+    assert jobs_ledger.outstanding(NOW + 60) == JOBS
+
+    assert jobs_ledger.mark_failed(1, 'timeout') == 'pending'
+    assert jobs_ledger.outstanding(NOW + 119) == [JOBS[1]]
+    assert jobs_ledger.outstanding(NOW + 120) == JOBS
+
+
+def test_job_is_quarantined_after_max_attempts(jobs_ledger):
+    assert [jobs_ledger.mark_failed(1, f"error {attempt}") for attempt in range(3)] == ['pending', 'pending', 'failed']
+    assert jobs_ledger.outstanding(NOW + 10 ** 9) == [JOBS[1]]
+    assert jobs_ledger.counts() == {'discovered': 1, 'pending': 0, 'done': 0, 'failed': 1}
+    [failure] = jobs_ledger.failures()
+    assert (failure['match_id'], failure['attempts'], failure['last_error']) == (1, 3, 'error 2')
+
+    # Requeued with a fresh set of attempts, due at once
+    assert jobs_ledger.retry_failed([1]) == 1
+    assert jobs_ledger.outstanding(NOW) == JOBS
+    assert jobs_ledger.mark_failed(1, 'timeout') == 'pending'
+
+
+def test_done_job_leaves_the_queue(jobs_ledger):
+    jobs_ledger.mark_failed(1, 'timeout')
+    jobs_ledger.mark_done(1)
+    assert jobs_ledger.outstanding(NOW + 10 ** 9) == [JOBS[1]]
+    assert jobs_ledger.failures() == []
+
+
+def test_discover_only_adds_new_jobs(jobs_ledger):
+    jobs_ledger.mark_failed(1, 'timeout')
+    assert jobs_ledger.discover(JOBS + [(3, 'https://example.com/Matches/3/Live', 'La Liga')], committed_ids={3}) == \
+        [(3, 'https://example.com/Matches/3/Live', 'La Liga')]
+    assert jobs_ledger.counts() == {'discovered': 1, 'pending': 1, 'done': 1, 'failed': 0}
+
+
+def test_partial_match_is_requeued(jobs_ledger):
+    jobs_ledger.mark_done(1)
+    jobs_ledger.discover(JOBS, committed_ids={1}, partial_ids={1})
+    assert jobs_ledger.outstanding(NOW) == JOBS
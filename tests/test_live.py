@@ -0,0 +1,34 @@
+import pytest
+
+mongomock = pytest.importorskip('mongomock')
+
+from benchmark import make_match_centre_data
+from live import LiveMatch
+from scraper import build_match_data
+from utilities import build_pass_networks
+
+MATCH_ID = 1821060
+
+
+def network(document):
+    nodes = {node['player_id']: (node['shirt_no'], pytest.approx(node['x']), pytest.approx(node['y']), node['count'])
+             for node in document['nodes']}
+    edges = {(edge['passer'], edge['recipient']): edge['pass_count'] for edge in document['edges']}
+    return document['first_sub_seconds'], nodes, edges
+
+
+def test_polled_pass_networks_match_the_full_match():
+    matchdict = make_match_centre_data(MATCH_ID, 1200)
+    matchdict['events'].sort(key=lambda event: (event['minute'], event['second']))
+    db = mongomock.MongoClient().db
+    live = LiveMatch(db, MATCH_ID, 'La Liga')
+    # A poll every few minutes, each page showing the events up to then
+    for minute in list(range(0, 97, 7)) + [97]:
+        polled = [event for event in matchdict['events'] if event['minute'] < minute]
+        live.update({**matchdict, 'events': polled, 'elapsed': f"{minute}'"})
+
+    _, _, players_df, events_df = build_match_data(matchdict, MATCH_ID, 'La Liga')
+    expected = {document['_id']: network(document) for document in build_pass_networks(events_df, players_df)}
+    stored = {document['_id']: network(document) for document in db.pass_networks.find()}
+    assert stored == expected
+    assert all(edges for _, _, edges in expected.values())
@@ -0,0 +1,63 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from data_loader import MatchCache
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = MatchCache(maxsize=2)
+    for key in [1, 2, 1, 3]:
+        cache.get(key, lambda key: key * 10)
+    assert list(cache.entries) == [1, 3]
+    assert (cache.hits, cache.misses) == (1, 3)
+
+
+def test_cold_load_does_not_block_other_keys():
+    cache = MatchCache()
+    cache.get('cached', lambda key: 'value')
+    started, release = threading.Event(), threading.Event()
+
+    def slow_loader(key):
+        started.set()
+        release.wait(5)
+        return 'slow'
+
+    with ThreadPoolExecutor(2) as executor:
+        slow = executor.submit(cache.get, 'cold', slow_loader)
+        assert started.wait(5)
+        # Served while the other key is still loading
+        assert executor.submit(cache.get, 'cached', None).result(timeout=1) == 'value'
+        release.set()
+        assert slow.result(timeout=5) == 'slow'
+
+
+def test_concurrent_misses_of_one_key_load_once():
+    cache = MatchCache()
+    calls = []
+    release = threading.Event()
+
+    def loader(key):
+        calls.append(key)
+        release.wait(5)
+        return 'value'
+
+    with ThreadPoolExecutor(4) as executor:
+        futures = [executor.submit(cache.get, 'key', loader) for _ in range(4)]
+        release.set()
+        assert [future.result(timeout=5) for future in futures] == ['value'] * 4
+    assert calls == ['key']
+    assert cache.misses == 1
+
+
+def test_failed_load_is_not_cached():
+    cache = MatchCache()
+
+    def failing(key):
+        raise RuntimeError("MongoDB unavailable")
+
+    with pytest.raises(RuntimeError):
+        cache.get('key', failing)
+    assert cache.get('key', lambda key: 'value') == 'value'
+    assert cache.loading == {}
@@ -0,0 +1,66 @@
+import os
+
+import pytest
+
+import scraper
+from benchmark import FIXTURES_DIR, _legacy_extract_match_centre_data, make_match_centre_data, render_match_page
+from scraper import MATCH_CENTRE_KEYS, MatchCentreDataError, extract_match_centre_data
+
+MATCH_ID = 1821060
+
+
+@pytest.fixture(params=['orjson', 'json'])
+def decoder(request, monkeypatch):
+    # Both decoding paths: orjson on the payload's line, and the standard library's raw_decode
+    if request.param == 'orjson':
+        pytest.importorskip('orjson')
+    else:
+        monkeypatch.setattr(scraper, 'orjson', None)
+    return request.param
+
+
+@pytest.fixture
+def matchdict():
+    return make_match_centre_data(MATCH_ID, 100)
+
+
+def test_extracts_the_payload(decoder, matchdict):
+    assert extract_match_centre_data(render_match_page(MATCH_ID, matchdict)) == matchdict
+
+
+def test_match_without_data_yet(decoder):
+    page = render_match_page(MATCH_ID, None)
+    assert 'matchCentreData: null' in page
+    assert extract_match_centre_data(page) is None
+
+
+def test_absent_payload(decoder):
+    with pytest.raises(MatchCentreDataError, match="no matchCentreData"):
+        extract_match_centre_data("<html><body><script>var args = {};</script></body></html>")
+
+
+def test_truncated_payload(decoder, matchdict):
+    page = render_match_page(MATCH_ID, matchdict)
+    with pytest.raises(MatchCentreDataError, match="not valid JSON"):
+        extract_match_centre_data(page[:page.find('"events"') + 5000])
+
+
+def test_payload_that_is_not_an_object(decoder):
+    with pytest.raises(MatchCentreDataError, match="not a JSON object"):
+        extract_match_centre_data("require.config.params['args'] = { matchCentreData: [1, 2] };")
+
+
+def test_payload_missing_keys(decoder, matchdict):
+    del matchdict['events']
+    with pytest.raises(MatchCentreDataError, match="missing events"):
+        extract_match_centre_data(render_match_page(MATCH_ID, matchdict))
+
+
+@pytest.mark.parametrize('name', sorted(name for name in os.listdir(FIXTURES_DIR) if name[:-len('.html')].isdigit()))
+def test_saved_pages(decoder, name):
+    # Same payload as the BeautifulSoup extractor it replaced
+    with open(os.path.join(FIXTURES_DIR, name), encoding='utf-8') as f:
+        page = f.read()
+    matchdict = extract_match_centre_data(page)
+    assert set(MATCH_CENTRE_KEYS) <= set(matchdict)
+    assert matchdict == _legacy_extract_match_centre_data(page)
@@ -0,0 +1,34 @@
+import pytest
+
+from benchmark import make_match_centre_data
+from scraper import build_match_data
+from utilities import build_pass_networks
+
+MATCH_ID = 1839402
+
+
+def render_time_network(events_df, team_id):
+    # What plot_pass_network computed from the raw events before the networks were stored
+    team_events = events_df[(events_df['match_id'] == MATCH_ID) & (events_df['team_id'] == team_id)]
+    first_sub = max(team_events.loc[team_events['type'] == 'SubstitutionOn', 'total_seconds'].min(), 60 * 45)
+    passes = team_events[(team_events['total_seconds'] < first_sub) & (team_events['type'] == 'Pass')
+                         & (team_events['type_outcome'] == 'Successful')]
+    nodes = passes.groupby('passer').agg(x=('x', 'mean'), y=('y', 'mean'), count=('x', 'size'))
+    edges = passes.groupby(['passer', 'recipient']).size()
+    return first_sub, nodes, edges
+
+
+def test_stored_networks_match_the_render_time_ones():
+    _, _, players_df, events_df = build_match_data(make_match_centre_data(MATCH_ID, 1200), MATCH_ID, 'La Liga')
+    documents = build_pass_networks(events_df, players_df)
+    shirts = dict(zip(players_df['player_id'], players_df['shirt_no']))
+
+    assert sorted(document['team_id'] for document in documents) == [53, 65]
+    for document in documents:
+        first_sub, nodes, edges = render_time_network(events_df, document['team_id'])
+        assert document['first_sub_seconds'] == first_sub and len(nodes) and len(edges)
+        assert {node['player_id']: (node['x'], node['y'], node['count']) for node in document['nodes']} == {
+            passer: (pytest.approx(row['x']), pytest.approx(row['y']), row['count']) for passer, row in nodes.iterrows()
+        }
+        assert all(node['shirt_no'] == shirts[node['player_id']] for node in document['nodes'])
+        assert {(edge['passer'], edge['recipient']): edge['pass_count'] for edge in document['edges']} == edges.to_dict()
@@ -0,0 +1,37 @@
+import pandas as pd
+
+from benchmark import make_match_centre_data
+from scraper import build_match_data
+from utilities import split_players
+
+
+def season_players():
+    # The same squads in two matches, the second one a birthday later
+    players_df = pd.concat([
+        build_match_data(make_match_centre_data(match_id, 300), match_id, 'La Liga')[2] for match_id in (1, 2)
+    ], ignore_index=True)
+    players_df.loc[players_df['match_id'] == 2, 'age'] += 1
+    return players_df
+
+
+def test_one_dimension_row_per_player():
+    players_df = season_players()
+    player_info_df, _ = split_players(players_df)
+
+    assert player_info_df['_id'].is_unique
+    assert set(player_info_df['_id']) == set(players_df['player_id'])
+    # The latest row wins
+    latest = players_df.drop_duplicates('player_id', keep='last').set_index('player_id')
+    assert player_info_df.set_index('_id')[['name', 'age']].equals(latest[['name', 'age']].rename_axis('_id'))
+
+
+def test_appearances_and_dimension_give_back_the_players():
+    players_df = season_players()
+    player_info_df, appearances_df = split_players(players_df)
+
+    assert len(appearances_df) == len(players_df)
+    assert appearances_df['_id'].tolist() == players_df['_id'].tolist()
+    assert not {'name', 'age'} & set(appearances_df)
+    # Per-match rows joined back to the dimension, the names are the same as before the split
+    joined = appearances_df.merge(player_info_df.rename(columns={'_id': 'player_id'}), on='player_id', how='left')
+    pd.testing.assert_series_equal(joined['name'], players_df['name'], check_names=False)
@@ -0,0 +1,45 @@
+from utilities import preprocess_events
+
+
+def event(n, type_name, team_id=65, is_touch=True, outcome='Successful', minute=0):
+    return {
+        'competition': 'La Liga', 'match_id': 1, 'id': 1000 + n, 'eventId': n, 'minute': minute, 'second': n,
+        'teamId': team_id, 'playerId': team_id * 1000 + 1, 'period': {'value': 1, 'displayName': 'FirstHalf'},
+        'type': {'displayName': type_name}, 'outcomeType': {'displayName': outcome}, 'x': 50, 'y': 50,
+        'isTouch': is_touch,
+    }
+
+
+def chain_ids(events):
+    return preprocess_events(events)['chain_id'].tolist()
+
+
+def test_same_team_touches_share_a_chain():
+    assert chain_ids([event(1, 'Pass'), event(2, 'Pass'), event(3, 'TakeOn')]) == [1, 1, 1]
+
+
+def test_other_team_touch_starts_a_chain():
+    assert chain_ids([event(1, 'Pass'), event(2, 'Pass', team_id=53), event(3, 'Pass')]) == [1, 2, 3]
+
+
+def test_lost_duel_does_not_start_a_chain():
+    events = [event(1, 'Pass'), event(2, 'Tackle', team_id=53, outcome='Unsuccessful'), event(3, 'Pass')]
+    assert chain_ids(events) == [1, 1, 1]
+
+
+def test_restart_without_touch_starts_a_chain():
+    events = [event(1, 'Pass'), event(2, 'OffsideGiven', is_touch=False), event(3, 'Pass')]
+    assert chain_ids(events) == [1, 1, 2]
+
+
+def test_restart_that_is_a_touch_starts_a_chain():
+    # A touching corner or foul by the team keeping the ball still ends its chain
+    for restart in ['CornerAwarded', 'Foul']:
+        events = [event(1, 'Pass'), event(2, restart), event(3, 'Pass'), event(4, 'Pass')]
+        assert chain_ids(events) == [1, 1, 2, 2], restart
+
+
+def test_new_period_starts_a_chain():
+    second_half = event(2, 'Pass', minute=46)
+    second_half['period'] = {'value': 2, 'displayName': 'SecondHalf'}
+    assert chain_ids([event(1, 'Pass'), second_half]) == [1, 2]
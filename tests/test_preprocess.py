@@ -0,0 +1,44 @@
+import pandas as pd
+
+from benchmark import _legacy_preprocess_events, make_raw_events
+from utilities import compact_events, preprocess_events
+
+FLAGS = ['isTouch', 'isShot', 'isGoal', 'isOwnGoal']
+LEGACY_NAMES = {
+    'id': 'event_id', 'eventId': 'event_type_id', 'teamId': 'team_id', 'playerId': 'player_id',
+    'outcomeType': 'type_outcome', 'endX': 'end_x', 'endY': 'end_y', 'goalMouthZ': 'goal_mouth_z',
+    'goalMouthY': 'goal_mouth_y', 'isTouch': 'is_touch', 'isShot': 'is_shot', 'isGoal': 'is_goal',
+    'cardType': 'card_type', 'isOwnGoal': 'is_own_goal',
+}
+
+
+def by_event(events_df):
+    # Both sort by time, the row-wise version does not keep the page order of simultaneous events
+    return events_df.sort_values(['match_id', 'event_id']).reset_index(drop=True)
+
+
+def test_same_events_as_the_row_wise_version():
+    # The row-wise version read an absent flag as True, so the flags are spelled out for it
+    raw_events = [{**dict.fromkeys(FLAGS, False), **event} for event in make_raw_events(1, 600)]
+    events_df = by_event(preprocess_events(raw_events))
+    legacy_df = by_event(compact_events(_legacy_preprocess_events(raw_events).rename(columns=LEGACY_NAMES)))
+
+    assert len(events_df) == len(legacy_df)
+    pd.testing.assert_frame_equal(events_df[legacy_df.columns], legacy_df)
+
+
+def test_absent_flags_are_false():
+    raw_events = make_raw_events(1, 600)
+    events_df = by_event(preprocess_events(raw_events))
+    expected = {event['id']: bool(event.get('isShot', False)) for event in raw_events}
+    assert events_df['is_shot'].tolist() == events_df['event_id'].map(expected).tolist()
+
+
+def test_recipients_stay_within_their_match():
+    # The row-wise version handed the last pass of a match the first passer of the next one
+    events_df = preprocess_events(make_raw_events(3, 300))
+    successful = events_df[(events_df['type'] == 'Pass') & (events_df['type_outcome'] == 'Successful')]
+    last_passes = successful.groupby('match_id').tail(1)
+    assert len(last_passes) == 3
+    assert last_passes['recipient'].isna().all()
+    assert successful.drop(last_passes.index)['recipient'].notna().all()
@@ -0,0 +1,22 @@
+import pytest
+
+mongomock = pytest.importorskip('mongomock')
+
+from archive import archive_path, save_raw_match
+from benchmark import make_match_centre_data
+from scraper import replay_archive
+
+
+def test_corrupt_archive_entries_are_skipped(tmp_path):
+    archive_dir = str(tmp_path)
+    for match_id in [1821060, 1839402]:
+        save_raw_match(match_id, 'La Liga', None, make_match_centre_data(match_id, 300), archive_dir)
+    with open(archive_path(1821071, archive_dir), 'wb') as f:
+        f.write(b"not gzip")
+    save_raw_match(1821072, 'La Liga', None, {'events': []}, archive_dir)
+
+    db = mongomock.MongoClient().db
+    failures = replay_archive(db, archive_dir, workers=2)
+
+    assert sorted(match_id for match_id, _ in failures) == [1821071, 1821072]
+    assert sorted(db.matches.distinct('_id')) == [1821060, 1839402]
@@ -0,0 +1,46 @@
+import re
+
+from archive import load_raw_match
+from benchmark import FIXTURE_MATCHES, make_match_centre_data, serve_fixtures, write_fixture_pages
+from fetchers import FetchError, HttpFetcher, fetcher_factory
+from scraper import TokenBucket, extract_match_urls, scrape_matches_parallel
+
+EVENTS_PER_MATCH = 200
+
+
+def test_http_pool_scrapes_the_served_pages(tmp_path):
+    pages_dir, archive_dir = tmp_path / 'pages', tmp_path / 'archive'
+    write_fixture_pages(str(pages_dir), EVENTS_PER_MATCH)
+    with serve_fixtures(str(pages_dir)) as base_url:
+        fetcher = HttpFetcher()
+        laliga_urls, champions_league_urls = extract_match_urls(fetcher, base_url)
+        fetcher.close()
+        urls = [(url, "La Liga") for url in laliga_urls] + [(url, "Champions League") for url in champions_league_urls]
+        jobs = [(int(re.search(r"Matches/(\d+)/", url).group(1)), url, competition) for url, competition in urls]
+        results = list(scrape_matches_parallel(jobs, 2, TokenBucket(100), fetcher_factory('http'), str(archive_dir)))
+
+    assert sorted(match_id for match_id, *_ in results) == sorted(match_id for match_id, *_ in FIXTURE_MATCHES)
+    assert all(error is None for *_, error in results)
+    for match_id, slug, home_team_id, away_team_id in FIXTURE_MATCHES:
+        # The archived payload is what the page served, parsed back
+        expected = make_match_centre_data(match_id, EVENTS_PER_MATCH, home_team_id=home_team_id,
+                                          away_team_id=away_team_id)
+        assert load_raw_match(match_id, str(archive_dir))['matchCentreData'] == expected
+    for match_id, competition, (matches_df, teams_df, players_df, events_df), _ in results:
+        assert competition == ("Champions League" if match_id == 1839402 else "La Liga")
+        assert matches_df['_id'].tolist() == [match_id]
+        assert set(events_df['match_id']) == {match_id}
+
+
+def test_pool_reports_missing_pages(tmp_path):
+    pages_dir = tmp_path / 'pages'
+    write_fixture_pages(str(pages_dir), EVENTS_PER_MATCH)
+    (pages_dir / '1821060.html').unlink()
+    with serve_fixtures(str(pages_dir)) as base_url:
+        url = base_url.replace('/Teams/65/Fixtures/Spain-Barcelona', '/Matches/1821060/Live/Missing')
+        results = list(scrape_matches_parallel([(1821060, url, "La Liga")], 1, TokenBucket(100),
+                                               fetcher_factory('http'), str(tmp_path / 'archive')))
+
+    [(match_id, _, result, error)] = results
+    assert match_id == 1821060 and result is None
+    assert isinstance(error, FetchError)
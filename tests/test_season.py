@@ -0,0 +1,92 @@
+import pandas as pd
+import pytest
+
+mongomock = pytest.importorskip('mongomock')
+
+import season
+from benchmark import make_match_centre_data
+from scraper import build_match_data
+from season import check_season_aggregates, update_season_aggregates
+from storage import prune_match_data, write_match_data
+
+
+def store_match(db, match_id, seed=0, date=None, team_id=None):
+    # Stored like commit_match does, without the season update; another seed gives other events.
+    # `date` moves the match, `team_id` moves every player of the home side to that team
+    frames = build_match_data(make_match_centre_data(match_id, 300, seed=seed), match_id, 'La Liga')
+    if date is not None:
+        frames[0]['date'] = pd.Timestamp(date)
+    if team_id is not None:
+        frames[2].loc[frames[2]['team_id'] == 65, 'team_id'] = team_id
+    write_match_data(db, *frames)
+    prune_match_data(db, match_id, frames[2], frames[3])
+    matches_df, _, players_df, events_df = frames
+    return matches_df, players_df, events_df
+
+
+@pytest.fixture
+def db():
+    db = mongomock.MongoClient().db
+    for match_id in [1, 2]:
+        update_season_aggregates(db, *store_match(db, match_id))
+    return db
+
+
+def test_recommit_leaves_totals_unchanged(db):
+    totals = list(db.player_season_stats.find())
+    update_season_aggregates(db, *store_match(db, 2))
+    assert list(db.player_season_stats.find()) == totals
+    assert check_season_aggregates(db) == []
+
+
+def test_recommit_with_other_data(db):
+    update_season_aggregates(db, *store_match(db, 2, seed=1))
+    assert check_season_aggregates(db) == []
+
+
+def test_update_interrupted_after_totals(db, monkeypatch):
+    # Crash on the last write, once both the player and the team totals are updated
+    upsert_documents = season.upsert_documents
+    calls = []
+
+    def crash_on_team_rows(collection, documents, *args):
+        calls.append(collection.name)
+        if collection.name == 'team_match_stats':
+            raise RuntimeError("interrupted")
+        return upsert_documents(collection, documents, *args)
+
+    frames = store_match(db, 2, seed=1)
+    monkeypatch.setattr(season, 'upsert_documents', crash_on_team_rows)
+    with pytest.raises(RuntimeError):
+        update_season_aggregates(db, *frames)
+    monkeypatch.undo()
+    assert calls == ['player_match_stats', 'team_match_stats']
+
+    update_season_aggregates(db, *frames)
+    assert check_season_aggregates(db) == []
+
+
+def test_update_interrupted_halfway_through_totals(db, monkeypatch):
+    # Crash after half of the player totals are written
+    bulk_write_batches = season.bulk_write_batches
+
+    def crash_halfway(collection, operations, *args):
+        bulk_write_batches(collection, operations[:len(operations) // 2], *args)
+        raise RuntimeError("interrupted")
+
+    frames = store_match(db, 2, seed=1)
+    monkeypatch.setattr(season, 'bulk_write_batches', crash_halfway)
+    with pytest.raises(RuntimeError):
+        update_season_aggregates(db, *frames)
+    monkeypatch.undo()
+
+    update_season_aggregates(db, *frames)
+    assert check_season_aggregates(db) == []
+
+
+def test_team_of_the_latest_match_out_of_order(db):
+    # Match 4 is played after match 3 but committed first, the home players moved team in between
+    update_season_aggregates(db, *store_match(db, 4, date='2024-09-20', team_id=99))
+    update_season_aggregates(db, *store_match(db, 3, date='2024-09-10'))
+    assert db.player_season_stats.find_one({'_id': '65001_2024-2025'})['team_id'] == 99
+    assert check_season_aggregates(db) == []
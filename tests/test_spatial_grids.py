@@ -0,0 +1,40 @@
+import numpy as np
+
+from benchmark import make_match_centre_data
+from scraper import build_match_data
+from utilities import DEFENSIVE_TYPES, build_spatial_grids, cell_index
+
+BINS = (12, 8)
+
+
+def test_cells_cover_the_pitch():
+    assert cell_index([0, 99.9, 100, 120], [0, 99.9, 100, -5], *BINS).tolist() == [0, 95, 95, 88]
+
+
+def test_grids_match_a_histogram_per_group():
+    events_df = build_match_data(make_match_centre_data(1839402, 1200), 1839402, 'La Liga')[3]
+    documents = build_spatial_grids(events_df, bins=BINS)
+    families = {
+        'touches': events_df['is_touch'],
+        'passes': events_df['type'] == 'Pass',
+        'shots': events_df['is_shot'],
+        'defensive': events_df['type'].isin(DEFENSIVE_TYPES),
+    }
+
+    assert len({document['_id'] for document in documents}) == len(documents)
+    for document in documents:
+        assert document['shape'] == list(BINS)
+        family_events = events_df[families[document['family']] & (events_df['team_id'] == document['team_id'])]
+        if document['player_id'] is None:
+            family_events = family_events[family_events['player_id'].isna()]
+        else:
+            family_events = family_events[family_events['player_id'] == document['player_id']]
+        expected, _, _ = np.histogram2d(family_events['x'], family_events['y'], bins=BINS, range=[[0, 100], [0, 100]])
+        counts = np.frombuffer(document['counts'], dtype=np.uint16).reshape(BINS)
+        assert counts.tolist() == expected.astype(int).tolist()
+
+    # Every located event of a family is in one of the grids
+    for family, mask in families.items():
+        total = sum(np.frombuffer(document['counts'], dtype=np.uint16).sum()
+                    for document in documents if document['family'] == family)
+        assert total == mask.sum()
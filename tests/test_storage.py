@@ -0,0 +1,39 @@
+import pytest
+
+mongomock = pytest.importorskip('mongomock')
+
+from benchmark import make_match_centre_data
+from scraper import build_match_data
+from storage import write_match_data
+
+COLLECTIONS = ['matches', 'teams', 'players', 'appearances', 'events']
+
+
+def snapshot(db):
+    return {name: sorted(db[name].find(), key=lambda doc: str(doc['_id'])) for name in COLLECTIONS}
+
+
+def test_reingesting_a_match_is_a_no_op():
+    db = mongomock.MongoClient().db
+    frames = build_match_data(make_match_centre_data(1, 300), 1, 'La Liga')
+    first = write_match_data(db, *frames, batch_size=100)
+    stored = snapshot(db)
+    assert first['events'] == (len(frames[3]), 0)
+
+    again = write_match_data(db, *build_match_data(make_match_centre_data(1, 300), 1, 'La Liga'), batch_size=100)
+    assert again == dict.fromkeys(COLLECTIONS, (0, 0))
+    assert snapshot(db) == stored
+
+
+def test_events_without_an_id_are_not_stored():
+    matchdict = make_match_centre_data(1, 300)
+    for event in matchdict['events'][10:15]:
+        del event['id']
+    matchdict['events'][20]['id'] = None
+    events_df = build_match_data(matchdict, 1, 'La Liga')[3]
+
+    assert events_df['_id'].is_unique
+    assert not events_df['_id'].str.contains('NA').any()
+    db = mongomock.MongoClient().db
+    write_match_data(db, *build_match_data(matchdict, 1, 'La Liga'))
+    assert db.events.count_documents({}) == len(events_df)
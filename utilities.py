@@ -1,31 +1,41 @@
-from PIL import Image, ImageOps
-from datetime import datetime
-import base64
-from io import BytesIO
+import hashlib
+import os
+import numpy as np
 import pandas as pd
 
+# Events after which play restarts, the next touch starts a new possession chain
+RESTART_TYPES = [
+    'Start', 'End', 'Goal', 'Foul', 'Card', 'CornerAwarded', 'OffsideGiven', 'OffsideProvoked', 'OffsidePass',
+    'SubstitutionOff', 'SubstitutionOn', 'FormationChange',
+]
+# Lost duels do not hand the ball to the other team
+DUEL_TYPES = ['Aerial', 'Challenge', 'Tackle', 'Foul']
 
-def format_team_name(name):
-    return name.lower().replace(" ", "_")
+# Resolution of the spatial grids, cells along x "by" cells along y, e.g. SPATIAL_GRID_BINS=24x16
+SPATIAL_GRID_BINS = tuple(int(n) for n in os.getenv('SPATIAL_GRID_BINS', '24x16').split('x'))
+DEFENSIVE_TYPES = ['Tackle', 'Interception', 'Clearance', 'BallRecovery', 'BlockedPass', 'Aerial']
 
+# In-memory dtype of each events column: categoricals for the enumerations, float32 coordinates and the
+# narrowest integers that hold the values (nullable where an event can have none)
+EVENT_SCHEMA = {
+    'competition': 'category', 'match_id': 'int32', 'event_type_id': 'Int16', 'minute': 'int16', 'second': 'int8',
+    'team_id': 'int32', 'period': 'category', 'player_id': 'Int32', 'type': 'category', 'type_outcome': 'category',
+    'x': 'float32', 'y': 'float32', 'end_x': 'float32', 'end_y': 'float32',
+    'goal_mouth_z': 'float32', 'goal_mouth_y': 'float32', 'card_type': 'category', 'total_seconds': 'int32',
+    'passer': 'Int32', 'recipient': 'Int32', 'xt': 'float32', 'chain_id': 'Int16',
+}
 
-def load_and_resize_logo(team_name, box_size=(150, 150)):
-    logo_path = f"team_logos/{format_team_name(team_name)}_logo.png"
-    logo = Image.open(logo_path).convert("RGBA")  # Convert to RGBA to handle transparency
 
-    # Crop transparent padding around the image
-    bbox = logo.getbbox()
-    if bbox:
-        logo = logo.crop(bbox)
+def cell_index(x, y, length, width):
+    # Flat cell index of pitch coordinates in 0-100, as seen by the team on the ball
+    column = np.clip((np.asarray(x, dtype=float) / 100 * length).astype(int), 0, length - 1)
+    row = np.clip((np.asarray(y, dtype=float) / 100 * width).astype(int), 0, width - 1)
+    return column * width + row
 
-    logo.thumbnail(box_size, Image.LANCZOS)
-    
-    # Convert image to Base64
-    buffered = BytesIO()
-    logo.save(buffered, format="PNG")
-    encoded_logo = base64.b64encode(buffered.getvalue()).decode('utf-8')
-    
-    return encoded_logo
+
+def compact_events(events_df):
+    # Cast the events columns to EVENT_SCHEMA, the columns it does not list keep their dtype
+    return events_df.astype({column: dtype for column, dtype in EVENT_SCHEMA.items() if column in events_df})
 
 
 # Define individual functions for each DataFrame
@@ -64,16 +74,27 @@ def preprocess_teams(all_teams):
 def preprocess_players(all_player_stats):
     players_df = pd.DataFrame(all_player_stats)
     players_df = players_df[[
-        '_id', 'name', 'shirt_no', 'position', 'age', 'team_id', 'stats', 'competition', 'match_id'
+        '_id', 'player_id', 'name', 'shirt_no', 'position', 'age', 'team_id', 'stats', 'competition', 'match_id'
     ]]
-    players_df['age'] = players_df['age'].fillna(0).astype(int)
+    players_df['player_id'] = players_df['player_id'].astype(int)
+    players_df['age'] = pd.to_numeric(players_df['age'], errors='coerce').fillna(0).astype(int)
     players_df['shirt_no'] = players_df['shirt_no'].astype(int)
     players_df['position'] = players_df['position'].astype('category')
     players_df['competition'] = players_df['competition'].astype('category')
     return players_df
 
+def split_players(players_df):
+    """Split the preprocessed players into the player dimension and the per-match appearances.
+
+    The dimension holds one row per player_id (keyed by `_id`) with the attributes that do not change
+    between matches; the appearances keep what belongs to a single match.
+    """
+    player_info_df = players_df[['player_id', 'name', 'age']].drop_duplicates('player_id', keep='last')
+    player_info_df = player_info_df.rename(columns={'player_id': '_id'})
+    appearances_df = players_df.drop(columns=['name', 'age'])
+    return player_info_df, appearances_df
+
 def preprocess_events(all_events):
-    events_df = pd.DataFrame(all_events)
     # Define the required columns with their default values
     required_columns = {
         'competition': None,
@@ -100,16 +121,30 @@ def preprocess_events(all_events):
         'isOwnGoal': False
     }
     
+    # Only build the columns we keep, the nested qualifier lists are never used
+    if isinstance(all_events, list) and all_events:
+        present_columns = set().union(*all_events)
+        events_df = pd.DataFrame.from_records(
+            all_events, columns=[col for col in required_columns if col in present_columns]
+        )
+    else:
+        events_df = pd.DataFrame(all_events)
+
     # Ensure all required columns exist in the DataFrame
     for col, default_value in required_columns.items():
         if col not in events_df:
             events_df[col] = default_value
     events_df = events_df.dropna(subset=['playerId'])
+    # Events without a WhoScored id would all get the same _id and overwrite each other when upserted
+    events_df = events_df[pd.to_numeric(events_df['id'], errors='coerce').notna()]
     
     
-   # Extract display names for dictionary columns
+    # Extract display names for dictionary columns in bulk; plain values are kept as they are
     for col in ['period', 'type', 'outcomeType', 'cardType']:
-        events_df[col] = events_df[col].apply(lambda x: x['displayName'] if isinstance(x, dict) else x)
+        if events_df[col].dtype != object:
+            continue
+        display_names = events_df[col].str.get('displayName')
+        events_df[col] = display_names.where(display_names.notna(), events_df[col])
         
     numeric_columns = ['minute', 'second', 'x', 'y', 'endX', 'endY', 'goalMouthZ', 'goalMouthY']
     for col in numeric_columns:
@@ -118,7 +153,7 @@ def preprocess_events(all_events):
     # Convert boolean columns
     boolean_columns = ['isTouch', 'isShot', 'isGoal', 'isOwnGoal']
     for col in boolean_columns:
-        events_df[col] = events_df[col].astype(bool)
+        events_df[col] = events_df[col].fillna(False).astype(bool)
     
     
     # Select and rename columns
@@ -126,22 +161,18 @@ def preprocess_events(all_events):
         'competition', 'match_id', 'id', 'eventId', 'minute', 'second', 'teamId', 'period',
         'playerId', 'type', 'outcomeType', 'x', 'y', 'endX', 'endY',
         'goalMouthZ', 'goalMouthY', 'isTouch', 'isShot', 'isGoal', 'cardType', 'isOwnGoal'
-    ]]
+    ]].copy()
     
     # Calculate total_seconds and sort
     events_df['total_seconds'] = events_df['minute'] * 60 + events_df['second']
-    events_df = events_df.sort_values(by=['match_id', 'total_seconds'])
+    events_df = events_df.sort_values(by=['match_id', 'total_seconds'], kind='stable').reset_index(drop=True)
     
     # Assign passer and recipient
-    events_df['passer'] = events_df.apply(lambda row: row['playerId'] if row['type'] == 'Pass' else None, axis=1)
-    successful_passes = events_df[(events_df['type'] == 'Pass') & (events_df['outcomeType'] == 'Successful')].copy()
-    successful_passes['recipient'] = successful_passes['playerId'].shift(-1)
-    events_df = pd.merge(
-        events_df,
-        successful_passes[['id', 'total_seconds', 'type', 'recipient']],
-        how='left',
-        on=['id', 'total_seconds', 'type']
-    )
+    is_pass = events_df['type'] == 'Pass'
+    events_df['passer'] = events_df['playerId'].where(is_pass)
+    # The recipient is the player making the next successful pass of the same match
+    successful_passes = events_df.loc[is_pass & (events_df['outcomeType'] == 'Successful'), ['match_id', 'playerId']]
+    events_df['recipient'] = successful_passes.groupby('match_id', sort=False)['playerId'].shift(-1)
     
     # Final adjustments
 
@@ -154,7 +185,179 @@ def preprocess_events(all_events):
     'goalMouthZ': 'goal_mouth_z', 'goalMouthY': 'goal_mouth_y', 'isTouch': 'is_touch',
     'isShot': 'is_shot', 'isGoal': 'is_goal', 'cardType': 'card_type', 'isOwnGoal': 'is_own_goal'
         }, inplace=True)
-    return events_df
+
+    # Deterministic _id (match_id + WhoScored event id) so re-ingesting a match upserts the same documents
+    event_ids = pd.to_numeric(events_df['event_id'], errors='coerce').astype(pd.Int64Dtype()).astype(str)
+    events_df.insert(0, '_id', events_df['match_id'].astype(str) + '_' + event_ids)
+    events_df['chain_id'] = possession_chain_ids(events_df)
+    return compact_events(events_df)
+
+def possession_chain_ids(events_df):
+    """Possession chain of each event, numbered from 1 within its match (events sorted by time).
+
+    A chain is a run of on-ball events by one team. A new chain starts when the other team touches the
+    ball (lost duels aside), at a new period and at the first touch after a restart (foul, corner, offside,
+    goal, card, substitution), whether the restart event is a touch itself or not. Events without a touch
+    belong to the chain they happen in, and those before the first touch of a match have none.
+    """
+    match_id = events_df['match_id']
+    is_restart = events_df['type'].isin(RESTART_TYPES)
+    restarts = is_restart.astype(int).groupby(match_id, sort=False).cumsum()
+    lost_duel = events_df['type'].isin(DUEL_TYPES) & (events_df['type_outcome'] == 'Unsuccessful')
+    touches = events_df[events_df['is_touch'] & ~lost_duel]
+
+    previous = touches.groupby('match_id', sort=False)[['period', 'team_id']].shift(1)
+    # Restarts strictly before each touch; any restart at or after the previous touch starts a new chain
+    restarts_before = (restarts - is_restart.astype(int))[touches.index]
+    restarts_before_previous = restarts_before.groupby(touches['match_id'], sort=False).shift(1)
+    new_chain = (
+        previous['team_id'].isna()
+        | (touches['team_id'] != previous['team_id'])
+        | (touches['period'] != previous['period'])
+        | (restarts_before > restarts_before_previous)
+    )
+    chain_ids = new_chain.astype(int).groupby(touches['match_id'], sort=False).cumsum()
+    # Events between touches inherit the chain of the last touch of their match
+    chain_ids = chain_ids.reindex(events_df.index).groupby(match_id, sort=False).ffill()
+    return chain_ids.astype(pd.Int64Dtype())
+
+def momentum_per_minute(events_df, match_id, home_team_id, away_team_id, metric='final_third'):
+    """Momentum of each side per minute, a (home, away) pair of Series indexed by minute.
+
+    metric: 'final_third' counts the passes into the final third, 'xt' sums the threat added by the
+    successful passes (the xT stored at ingest, scaled by 100).
+    """
+    match_events = events_df[(events_df['match_id'] == match_id) & (events_df['type'] == 'Pass')]
+    if metric == 'xt':
+        threat = match_events.assign(threat=match_events['xt'].clip(lower=0).fillna(0) * 100)
+        home = threat[threat['team_id'] == home_team_id].groupby('minute')['threat'].sum()
+        away = threat[threat['team_id'] == away_team_id].groupby('minute')['threat'].sum()
+    else:
+        # Identify final third for each team
+        home = match_events[(match_events['team_id'] == home_team_id) & (match_events['end_x'] >= 66.7)].groupby('minute').size()
+        away = match_events[(match_events['team_id'] == away_team_id) & (match_events['end_x'] <= 33.3)].groupby('minute').size()
+    return home, away
+
+def match_data_version(matches_df, players_df, events_df):
+    # Fingerprint of a match's stored data, part of its cached figures' keys: re-ingesting the same data
+    # keeps them, any change draws them again
+    digest = hashlib.sha256()
+    for df in [matches_df, players_df, events_df]:
+        digest.update(pd.util.hash_pandas_object(df.astype(str), index=False).to_numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+def build_spatial_grids(events_df, bins=SPATIAL_GRID_BINS):
+    """2D histograms of event locations per match, team, player and event family.
+
+    Each document holds a (length, width) uint16 array of counts as raw bytes, so grids of the same
+    resolution add up across players and matches. Events without a player are kept under player_id None.
+    """
+    length, width = bins
+    families = {
+        'touches': events_df['is_touch'],
+        'passes': events_df['type'] == 'Pass',
+        'shots': events_df['is_shot'],
+        'defensive': events_df['type'].isin(DEFENSIVE_TYPES),
+    }
+    keys = ['match_id', 'team_id', 'player_id', 'family']
+    located = pd.concat(
+        [events_df.loc[mask, ['match_id', 'team_id', 'player_id', 'x', 'y']].assign(family=family)
+         for family, mask in families.items()],
+        ignore_index=True
+    )
+    located['player_id'] = located['player_id'].astype(pd.Int64Dtype())
+    located['group'] = located.groupby(keys, dropna=False, sort=False).ngroup()
+    group_keys = located.drop_duplicates('group').sort_values('group')[keys]
+    counts = np.zeros((len(group_keys), length * width), dtype=np.uint16)
+    np.add.at(counts, (located['group'].to_numpy(), cell_index(located['x'], located['y'], length, width)), 1)
+
+    documents = []
+    for (match_id, team_id, player_id, family), group in zip(group_keys.itertuples(index=False), counts):
+        player_id = None if pd.isna(player_id) else int(player_id)
+        documents.append({
+            '_id': f"{match_id}_{team_id}_{player_id}_{family}_{length}x{width}",
+            'match_id': int(match_id), 'team_id': int(team_id), 'player_id': player_id, 'family': family,
+            'shape': [length, width], 'counts': group.tobytes(),
+        })
+    return documents
+
+def build_possession_chains(events_df):
+    """Summary of every possession chain, one document per chain.
+
+    Only the chain team's events count. Progression is how much further up the pitch (in pitch x units)
+    the team took the ball than where the chain started; the xT is summed when the events carry it.
+    """
+    chained = events_df[events_df['chain_id'].notna()]
+    first = chained.groupby(['match_id', 'chain_id']).first()
+    own = chained[chained['team_id'] == chained.join(first['team_id'].rename('chain_team_id'), on=['match_id', 'chain_id'])['chain_team_id']]
+
+    is_pass = own['type'] == 'Pass'
+    successful_pass = is_pass & (own['type_outcome'] == 'Successful')
+    own = own.assign(
+        passes=is_pass, passes_successful=successful_pass,
+        furthest_x=own['end_x'].where(successful_pass, own['x']).clip(lower=own['x']),
+    )
+    aggregations = {
+        'start_seconds': ('total_seconds', 'min'), 'end_seconds': ('total_seconds', 'max'),
+        'events': ('type', 'size'), 'passes': ('passes', 'sum'), 'passes_successful': ('passes_successful', 'sum'),
+        'furthest_x': ('furthest_x', 'max'), 'shots': ('is_shot', 'sum'), 'goals': ('is_goal', 'sum'),
+    }
+    if 'xt' in own:
+        aggregations['xt'] = ('xt', 'sum')
+    chains = own.groupby(['match_id', 'chain_id']).agg(**aggregations).join(first[['team_id', 'period', 'x']])
+    chains['duration'] = chains['end_seconds'] - chains['start_seconds']
+    chains['progression'] = (chains['furthest_x'] - chains['x']).clip(lower=0)
+    chains['ended_in_shot'] = chains['shots'] > 0
+    chains = chains.drop(columns=['furthest_x', 'x']).reset_index()
+    chains.insert(0, '_id', chains['match_id'].astype(str) + '_' + chains['chain_id'].astype(str))
+    return [
+        {key: (value.item() if hasattr(value, 'item') else value) for key, value in chain.items()}
+        for chain in chains.to_dict(orient='records')
+    ]
+
+def build_pass_networks(events_df, players_df):
+    """Pass network of every team-match, computed once at ingest.
+
+    Only successful passes before the team's first substitution (capped at halftime) count.
+    Returns one document per team-match with the cutoff, the average location and pass count
+    of each passer (nodes) and the passer -> recipient pass counts (edges).
+    """
+    keys = ['match_id', 'team_id']
+
+    # Time of each team's first substitution, never earlier than halftime; NaN when there was none
+    team_index = pd.MultiIndex.from_frame(events_df[keys].drop_duplicates())
+    first_sub = events_df[events_df['type'] == 'SubstitutionOn'].groupby(keys)['total_seconds'].min()
+    first_sub = first_sub.reindex(team_index).clip(lower=60 * 45).rename('first_sub')
+
+    # Successful passes before the first substitution
+    passes = events_df[(events_df['type'] == 'Pass') & (events_df['type_outcome'] == 'Successful')]
+    passes = passes.join(first_sub, on=keys)
+    passes = passes[passes['first_sub'].isna() | (passes['total_seconds'] < passes['first_sub'])]
+
+    # Average location and pass count of each passer, with their jersey number
+    nodes = passes.groupby(keys + ['passer']).agg(x=('x', 'mean'), y=('y', 'mean'), count=('x', 'size')).reset_index()
+    shirts = players_df[['match_id', 'player_id', 'shirt_no']].rename(columns={'player_id': 'passer'})
+    nodes = nodes.astype({'passer': 'int64'}).merge(shirts, on=['match_id', 'passer'])
+    nodes = nodes.rename(columns={'passer': 'player_id'})
+
+    # Number of passes between each player pair
+    edges = passes.groupby(keys + ['passer', 'recipient']).size().rename('pass_count').reset_index()
+
+    node_groups = dict(list(nodes.groupby(keys)))
+    edge_groups = dict(list(edges.groupby(keys)))
+    documents = []
+    for (match_id, team_id), cutoff in first_sub.items():
+        team_nodes = node_groups.get((match_id, team_id), nodes.iloc[:0])
+        team_edges = edge_groups.get((match_id, team_id), edges.iloc[:0])
+        documents.append({
+            '_id': f"{match_id}_{team_id}",
+            'match_id': int(match_id),
+            'team_id': int(team_id),
+            'first_sub_seconds': None if pd.isna(cutoff) else float(cutoff),
+            'nodes': team_nodes[['player_id', 'shirt_no', 'x', 'y', 'count']].to_dict(orient='records'),
+            'edges': team_edges[['passer', 'recipient', 'pass_count']].to_dict(orient='records'),
+        })
+    return documents
 
 # Main processing function
 def preprocess_data(all_matches, all_teams, all_player_stats, all_events):
@@ -173,13 +376,37 @@ def preprocess_data(all_matches, all_teams, all_player_stats, all_events):
     return matches_df, teams_df, players_df, events_df
 
 
+def column_values(series):
+    """Values of a column as native Python objects, None where they are null."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # Code -1 (null) picks the trailing None
+        categories = np.array(series.cat.categories.tolist() + [None], dtype=object)
+        return categories[series.cat.codes.to_numpy()].tolist()
+    if series.dtype == np.float32:
+        # Rounded to float32's 6 significant digits, so 45.3 is stored and not 45.29999923706055
+        values = series.to_numpy(dtype=np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scale = 10.0 ** (5 - np.floor(np.log10(np.abs(values))))
+            rounded = np.round(values * scale) / scale
+        series = pd.Series(np.where(np.isfinite(scale), rounded, values), index=series.index)
+    values = series.tolist()  # numpy scalars become int, float, bool and Timestamp
+    for position in np.flatnonzero(series.isna().to_numpy()):
+        values[position] = None
+    return values
+
+def iter_documents(df, batch_size=1000):
+    # Insert-ready documents, converted one column at a time and yielded in lists of batch_size
+    columns = df.columns.tolist()
+    for start in range(0, len(df), batch_size):
+        chunk = df.iloc[start:start + batch_size]
+        values = [column_values(chunk[column]) for column in columns]
+        yield [dict(zip(columns, row)) for row in zip(*values)]
+
 # Function to convert DataFrames to JSON-like format with <NA> replaced by None for MongoDB
-def convert_to_json(matches_df, teams_df, players_df, events_df):
-    def safe_to_dict(df):
-        if df.empty:
-            return []
-        return df.applymap(lambda x: None if pd.isna(x) else x).to_dict(orient='records')
+def safe_to_dict(df):
+    return [document for batch in iter_documents(df) for document in batch]
 
+def convert_to_json(matches_df, teams_df, players_df, events_df):
     matches_data = safe_to_dict(matches_df)
     teams_data = safe_to_dict(teams_df)
     players_data = safe_to_dict(players_df)
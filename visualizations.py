@@ -1,84 +1,89 @@
 import pandas as pd
-import math
+import numpy as np
 from mplsoccer import VerticalPitch
 import matplotlib.pyplot as plt
 import matplotlib.transforms as transforms
-
-# Filter match events up to the first substitution or halftime
-def filter_match_events(events_data, match_id, team_id):
-    match_events = events_data[(events_data['match_id'] == match_id) & 
-                               (events_data['team_id'] == team_id)]
-    
-    # Find the time of the first substitution
-    sub_df = match_events.loc[(match_events['type'] == "SubstitutionOn")]
-    first_sub = sub_df["total_seconds"].min()
-
-    # Cap it at halftime if the first substitution was in the first half
-    if first_sub <= (60 * 45):
-        first_sub = 60 * 45
-
-    # Filter events to only passes before the first substitution
-    match_events = match_events.loc[match_events['total_seconds'] < first_sub]
-    match_events = match_events[(match_events['type'] == 'Pass') & 
-                            (match_events['type_outcome'] == 'Successful')]
-    return match_events
-
-# Calculate average locations and pass counts
-def calculate_average_locations_and_pass_counts(match_events, players_data):
-
-    # Calculate average locations and pass counts for each player
-    average_locs_and_count = match_events.groupby('passer').agg({'x': 'mean', 'y':['mean','count']})
-    average_locs_and_count.columns = ['x', 'y', 'count']
-
-    # Find number of passes between each player-pair path
-    passes_between = match_events.groupby(['passer', 'recipient'])['_id'].count().reset_index()
-    passes_between.rename({'_id': 'pass_count'}, axis='columns', inplace=True)
-
-    # Merge pass counts with average locations for plotting
-    passes_between = passes_between.merge(average_locs_and_count, left_on='passer', right_index=True)
+from matplotlib.collections import LineCollection, PathCollection, PolyCollection
+from matplotlib.font_manager import FontProperties
+from matplotlib.textpath import TextPath
+from matplotlib.transforms import Affine2D
+from utilities import momentum_per_minute
+
+# Bump whenever a figure's look changes, it is part of every cached figure's key
+VISUALIZATION_VERSION = 2
+
+# Render profiles of the match stats and momentum figures. `scale` multiplies the figure size and every
+# font, marker and line size together, so a profile only changes the pixel count, not the look.
+RENDER_PROFILES = {
+    'thumbnail': {'scale': 0.25, 'dpi': 100},
+    'dashboard': {'scale': 0.5, 'dpi': 150},  # Shown at a third of the page width
+    'print': {'scale': 1.0, 'dpi': 200},      # Full resolution, for exports
+}
+
+# What the momentum graph plots for each metric, used in its labels and the dashboard title
+MOMENTUM_LABELS = {'final_third': 'Passes in Final Third', 'xt': 'Threat Added (xT)'}
+
+# Shot classes of the shot map: event types, marker, color, size and marker edge width
+SHOT_STYLES = [
+    (['Goal'], 'o', '#00FF00', 300, 0.8),                    # Green circles for goals
+    (['SavedShot'], 's', '#A50044', 100, 0.8),               # Custom red squares for saved shots
+    (['MissedShots', 'ShotOnPost'], 'x', '#FDCB13', 100, 2),  # Bold yellow crosses for missed shots and shots on post
+]
+
+def pass_arrows(ax, passes_between, line_color='#A50044', head_color='#FDCB13', dist_delta=4.6,
+                head_length=2.2, head_width=1.1):
+    """Draws every pass arrow of a network as one line collection and one arrowhead collection.
+
+    Arrows stop `dist_delta` short of the recipient so they end at the edge of the player circles,
+    and their width grows with the number of passes between the two players.
+    """
+    # Pitch coordinates are (x, y), the vertical pitch draws them as (y, x)
+    start = passes_between[['y', 'x']].to_numpy(dtype=float)
+    end = passes_between[['y_end', 'x_end']].to_numpy(dtype=float)
+    vector = end - start
+    length = np.hypot(vector[:, 0], vector[:, 1])[:, None]
+    direction = np.divide(vector, length, out=np.zeros_like(vector), where=length > 0)
+    tip = start + direction * np.maximum(length - dist_delta, 0)
+
+    # Lines end where the arrowheads start
+    base = tip - direction * head_length
+    normal = np.column_stack([-direction[:, 1], direction[:, 0]]) * head_width
+    line_widths = passes_between['pass_count'].to_numpy() / 4  # Line width based on pass count
+    ax.add_collection(LineCollection(
+        np.stack([start, base], axis=1), linewidths=line_widths, colors=line_color, alpha=0.85, zorder=1
+    ))
+    ax.add_collection(PolyCollection(
+        np.stack([tip, base + normal, base - normal], axis=1), facecolors=head_color, edgecolors=line_color,
+        linewidths=0.5, alpha=0.85, zorder=1
+    ))
+
+def text_labels(ax, labels, x, y, size=10, color='#0A0A2A', fontweight='bold'):
+    """Draws centered text labels at data coordinates (x, y) as a single path collection."""
+    font = FontProperties(weight=fontweight)
+    paths = []
+    for label in labels:
+        path = TextPath((0, 0), label, size=size, prop=font)
+        extents = path.get_extents()
+        paths.append(path.transformed(Affine2D().translate(-extents.x0 - extents.width / 2, -extents.y0 - extents.height / 2)))
+    # Label paths are in points, placed at the data offsets; dpi_scale_trans follows savefig's dpi
+    ax.add_collection(PathCollection(
+        paths, offsets=np.column_stack([x, y]), offset_transform=ax.transData,
+        transform=Affine2D().scale(1 / 72) + ax.figure.dpi_scale_trans,
+        facecolors=color, edgecolors='none', zorder=3
+    ))
+
+# Merge the pass counts of a team's pass network with the average locations of both players
+def pass_network_edges(nodes, edges, min_passes=4):
+    average_locs_and_count = nodes.set_index('player_id')[['x', 'y', 'count']]
+    passes_between = edges.merge(average_locs_and_count, left_on='passer', right_index=True)
     passes_between = passes_between.merge(average_locs_and_count, left_on='recipient', right_index=True, suffixes=['', '_end'])
-    passes_between = passes_between.loc[(passes_between['pass_count'] >= 4)]  # Threshold for pass display
-
-    # Merge in player jersey numbers
-    players_data['player_id'] = players_data['_id'].apply(lambda x: int(x.split('_')[0]))
-    average_locs_and_count = average_locs_and_count.merge(players_data[['player_id', 'shirt_no']], left_index=True, right_on='player_id')
-
-    return average_locs_and_count, passes_between
-
-def pass_line_template(ax, x, y, end_x, end_y, line_color='#A50044', head_color='#FDCB13'):
-    """Draws an arrow between two points with different colors for the line and arrowhead."""
-    ax.annotate(
-        '',
-        xy=(end_y, end_x),         # Arrow endpoint
-        xytext=(y, x),             # Arrow startpoint
-        zorder=1,
-        arrowprops=dict(
-            arrowstyle='-|>,head_width=0.4,head_length=0.8',  # Arrowhead style with custom dimensions
-            linewidth=3,                                     # Line thickness
-            color=line_color,                                # Line color
-            alpha=0.85,
-            shrinkA=0,                                       # Ensures no gap on start
-            shrinkB=0,                                       # Ensures no gap on end
-            mutation_scale=8,                               # Scales the arrowhead
-            fc=head_color                                    # Fill color for the arrowhead
-        )
-    )
-
-def pass_line_template_shrink(ax, x, y, end_x, end_y, line_color='#A50044', dist_delta=1.2):
-    """Shortens arrow length to stop at the edge of player circles."""
-    dist = math.hypot(end_x - x, end_y - y)
-    angle = math.atan2(end_y - y, end_x - x)
-    upd_x = x + (dist - dist_delta) * math.cos(angle)
-    upd_y = y + (dist - dist_delta) * math.sin(angle)
-    pass_line_template(ax, x, y, upd_x, upd_y, line_color=line_color)
+    return passes_between.loc[(passes_between['pass_count'] >= min_passes)]  # Threshold for pass display
 
-#plot the pass network
-def plot_pass_network(events_data, match_id, team_id, players_data):
-    # Filter events before the first substitution
-    match_events = filter_match_events(events_data, match_id, team_id)
-
-    # Calculate average locations and pass counts
-    average_locs_and_count, passes_between = calculate_average_locations_and_pass_counts(match_events, players_data)
+#plot the pass network from the aggregate stored at ingest (see utilities.build_pass_networks)
+def plot_pass_network(nodes, edges):
+    # nodes: player_id, shirt_no, x, y, count of one team-match; edges: passer, recipient, pass_count
+    average_locs_and_count = nodes
+    passes_between = pass_network_edges(nodes, edges)
 
     # Set up the pitch
     pitch = VerticalPitch(pitch_type='custom', pitch_length=100, pitch_width=100, line_color='#FDCB13', pitch_color='#0A0A2A', line_zorder=1)
@@ -88,34 +93,24 @@ def plot_pass_network(events_data, match_id, team_id, players_data):
     ax.set_position([0, 0, 1, 1])
 
     # Plot arrows for passes
-    line_width = 1
-    for index, row in passes_between.iterrows():
-        line_width = row['pass_count'] / 4  # Adjust line width based on pass count
-        pass_line_template_shrink(ax, row['x'], row['y'], row['x_end'], row['y_end'], '#A50044')
+    pass_arrows(ax, passes_between)
 
     # Plot player locations
     pitch.scatter(
         average_locs_and_count['x'], average_locs_and_count['y'], s=500,
-        color='#FDCB13', edgecolors="#A50044", linewidth=line_width, alpha=1, ax=ax, zorder=2
+        color='#FDCB13', edgecolors="#A50044", linewidth=1, alpha=1, ax=ax, zorder=2
     )
 
     # Annotate jersey numbers
-    for index, row in average_locs_and_count.iterrows():
-        pitch.annotate(
-            str(int(row['shirt_no'])),
-            xy=(row.x, row.y),
-            c='#0A0A2A',
-            va='center',
-            ha='center',
-            size=10,
-            fontweight='bold',
-            ax=ax
-        )
+    text_labels(ax, average_locs_and_count['shirt_no'].astype(int).astype(str), average_locs_and_count['y'], average_locs_and_count['x'])
 
     return fig
 
 #plot the shot map
-def create_shotmap(events_df, match_id, team_id, ax):
+def create_shotmap(events_df, match_id, team_id, ax=None, figsize=(6, 4)):
+    # Draw on the given axis, or on a new figure of `figsize` when none is passed
+    if ax is None:
+        fig, ax = plt.subplots(figsize=figsize)
     # Set up the pitch with half field view in theme colors
     pitch = VerticalPitch(
         pitch_type='custom', pitch_length=100, pitch_width=100, half=True, 
@@ -125,37 +120,18 @@ def create_shotmap(events_df, match_id, team_id, ax):
     fig = ax.get_figure()
     fig.patch.set_facecolor('#0A0A2A')
     ax.set_position([0, 0, 1, 1])
-    plt.subplots_adjust(left=0, right=1, top=1, bottom=0)
+    fig.subplots_adjust(left=0, right=1, top=1, bottom=0)
     
     # Filter shots for the specified match and team
-    team_shots = events_df[
-        (events_df['match_id'] == match_id) & 
-        (events_df['team_id'] == team_id) & 
-        (events_df['type'].isin(['Goal', 'SavedShot', 'MissedShots', 'ShotOnPost']))
-    ]
+    team_shots = events_df[(events_df['match_id'] == match_id) & (events_df['team_id'] == team_id)]
     
-    # Plot each shot based on its outcome
-    for _, shot in team_shots.iterrows():
-        line_width = 0.8 
-        if shot['type'] == 'Goal':
-            marker = 'o'  # Circle for goals
-            color = '#00FF00'  # Green for goals
-            size = 300  # Larger size for goals
-            line_width = 0.8  # Standard line width for circles
-        elif shot['type'] == 'SavedShot':
-            marker = 's'  # Square for saved shots
-            color = '#A50044'  # Custom red for saved shots
-            size = 100  # Smaller size for saved shots
-            line_width = 0.8  # Standard line width for squares
-        elif shot['type'] in ['MissedShots', 'ShotOnPost']:  # Combine missed shots and shots on post
-            marker = 'x'  # Cross for missed shots
-            color = '#FDCB13'  # Yellow for missed shots
-            size = 100  # Smaller size for missed shots
-            line_width = 2  # Increase line width for "X" to make it bolder
-        
-        # Plot the shot
+    # One scatter per shot outcome class
+    for shot_types, marker, color, size, line_width in SHOT_STYLES:
+        shots = team_shots[team_shots['type'].isin(shot_types)]
+        if shots.empty:
+            continue
         pitch.scatter(
-            shot['x'], shot['y'], ax=ax, s=size, color=color, marker=marker,
+            shots['x'], shots['y'], ax=ax, s=size, color=color, marker=marker,
             edgecolor='black', linewidth=line_width, alpha=0.8
         )
         
@@ -169,13 +145,13 @@ def create_shotmap(events_df, match_id, team_id, ax):
 
     # Remove padding and ensure the pitch takes up the full axis space
     ax.set_position([0, 0, 1, 1])
-    plt.subplots_adjust(left=0, right=1, top=1, bottom=0)
+    fig.subplots_adjust(left=0, right=1, top=1, bottom=0)
 
 
     return fig
 
 #plot the stats
-def create_match_stats_graph_dynamic(matches_df, match_id):
+def create_match_stats_graph_dynamic(matches_df, match_id, profile='print'):
     # Get match-specific data from the dataframe
     match_data = matches_df[matches_df['_id'] == match_id].iloc[0]
     
@@ -244,7 +220,11 @@ def create_match_stats_graph_dynamic(matches_df, match_id):
 
     # Create figure
     stats = ["Possession (%)", "Total Shots", "Shots on Target", "Total Passes", "Pass Completion (%)", "Corners", "Offsides"]
-    fig, axes = plt.subplots(len(stats), 1, figsize=(11, len(stats) * 1.5), facecolor="#0A0A2A")
+    scale = RENDER_PROFILES[profile]['scale']
+    fig, axes = plt.subplots(
+        len(stats), 1, figsize=(11 * scale, len(stats) * 1.5 * scale), dpi=RENDER_PROFILES[profile]['dpi'],
+        facecolor="#0A0A2A"
+    )
 
     line_offset = -0.003
     # Loop through each stat and create a back-to-back horizontal bar chart
@@ -262,20 +242,20 @@ def create_match_stats_graph_dynamic(matches_df, match_id):
             ax.barh(stat, barcelona_stat, color=barcelona_color,height=0.05, align='center')
             ax.barh(stat, -opponent_stat, color=opponent_color,height=0.05, align='center')
             # Labels and colored underlines
-            ax.text(max_val * 1.1, stat, f"{int(barcelona_stat)}", va='center', ha='left', color='white', fontsize=22,fontweight='bold')
-            ax.text(-max_val * 1.1, stat, f"{int(opponent_stat)}", va='center', ha='right', color='white', fontsize=22,fontweight='bold')
-            ax.hlines(y=line_offset, xmin=0, xmax=max_val, color=barcelona_color, linewidth=2.5)
-            ax.hlines(y=line_offset, xmin=-max_val, xmax=0, color=opponent_color, linewidth=2.5)
+            ax.text(max_val * 1.1, stat, f"{int(barcelona_stat)}", va='center', ha='left', color='white', fontsize=22 * scale,fontweight='bold')
+            ax.text(-max_val * 1.1, stat, f"{int(opponent_stat)}", va='center', ha='right', color='white', fontsize=22 * scale,fontweight='bold')
+            ax.hlines(y=line_offset, xmin=0, xmax=max_val, color=barcelona_color, linewidth=2.5 * scale)
+            ax.hlines(y=line_offset, xmin=-max_val, xmax=0, color=opponent_color, linewidth=2.5 * scale)
         else:
             # Barcelona stats on the right
             trans = transforms.blended_transform_factory(ax.transData, ax.transData + transforms.ScaledTranslation(0, line_offset, ax.figure.dpi_scale_trans))
             ax.barh(stat, -barcelona_stat, color=barcelona_color, height=0.03, align='edge')
             ax.barh(stat, opponent_stat, color=opponent_color, height=0.03, align='edge')
             # Labels and colored underlines
-            ax.text(max_val * 1.1, stat, f"{int(opponent_stat)}", va='center', ha='left', color='white', fontsize=25,fontweight='bold')
-            ax.text(-max_val * 1.1, stat, f"{int(barcelona_stat)}", va='center', ha='right', color='white', fontsize=25,fontweight='bold')
-            ax.hlines(y=line_offset, xmin=-max_val, xmax=0, color=barcelona_color, linewidth=2.5)
-            ax.hlines(y=line_offset, xmin=0, xmax=max_val, color=opponent_color, linewidth=2.5)
+            ax.text(max_val * 1.1, stat, f"{int(opponent_stat)}", va='center', ha='left', color='white', fontsize=25 * scale,fontweight='bold')
+            ax.text(-max_val * 1.1, stat, f"{int(barcelona_stat)}", va='center', ha='right', color='white', fontsize=25 * scale,fontweight='bold')
+            ax.hlines(y=line_offset, xmin=-max_val, xmax=0, color=barcelona_color, linewidth=2.5 * scale)
+            ax.hlines(y=line_offset, xmin=0, xmax=max_val, color=opponent_color, linewidth=2.5 * scale)
 
         # Set x-axis limits and remove bottom border
         ax.set_xlim(-max_val * 1.2, max_val * 1.2)
@@ -287,7 +267,7 @@ def create_match_stats_graph_dynamic(matches_df, match_id):
         # Customize appearance
         ax.set_facecolor("#0A0A2A")
         #ax.set_title(stat, color="white", loc="center", fontsize=25, pad=20, fontweight='bold')
-        ax.text(0, 0.10, stat, color="white", ha='center', va='bottom', fontsize=23, fontweight='bold')
+        ax.text(0, 0.10, stat, color="white", ha='center', va='bottom', fontsize=23 * scale, fontweight='bold')
         ax.tick_params(left=False, bottom=False)
         ax.set_xticks([])
         ax.set_yticklabels([])
@@ -296,7 +276,10 @@ def create_match_stats_graph_dynamic(matches_df, match_id):
     return fig
 
 #plot the stats
-def create_momentum_graph(events_df, match_id, home_team_id, away_team_id, interval=3):
+def create_momentum_graph(events_df, match_id, home_team_id, away_team_id, interval=3, profile='print',
+                          metric='final_third', per_minute=None):
+    # Momentum per minute comes from momentum_per_minute, or precomputed as `per_minute` (live matches),
+    # then only the goals are read from events_df
     # Ensure Barcelona is always assigned the red color
     barcelona_color = '#A50044'  # Red for Barcelona
     opponent_color = '#FDCB13'   # Yellow for opponent
@@ -306,32 +289,37 @@ def create_momentum_graph(events_df, match_id, home_team_id, away_team_id, inter
     else:
         home_color = opponent_color
         away_color = barcelona_color
-    # Filter data for the specified match and only include pass events in the final third
-    match_events = events_df[(events_df['match_id'] == match_id) & (events_df['type'] == 'Pass')]
     # Filter for goal events within the specified match
     goal_events = events_df[(events_df['match_id'] == match_id) & (events_df['type'] == 'Goal')]
-    # Identify final third for each team
-    home_passes_final_third = match_events[(match_events['team_id'] == home_team_id) & (match_events['end_x'] >= 66.7)]
-    away_passes_final_third = match_events[(match_events['team_id'] == away_team_id) & (match_events['end_x'] <= 33.3)]
+    if per_minute is None:
+        per_minute = momentum_per_minute(events_df, match_id, home_team_id, away_team_id, metric)
+    home_minutes, away_minutes = per_minute
 
     # Group by time intervals
-    home_pass_intervals = home_passes_final_third.groupby((home_passes_final_third['minute'] // interval) * interval).size()
-    away_pass_intervals = away_passes_final_third.groupby((away_passes_final_third['minute'] // interval) * interval).size()
+    home_pass_intervals = home_minutes.groupby((home_minutes.index // interval) * interval).sum()
+    away_pass_intervals = away_minutes.groupby((away_minutes.index // interval) * interval).sum()
 
     # Create a DataFrame for plotting
-    momentum_df = pd.DataFrame({'Home Passes in Final Third': home_pass_intervals, 'Away Passes in Final Third': away_pass_intervals}).fillna(0)
+    label = MOMENTUM_LABELS[metric]
+    home_column, away_column = f"Home {label}", f"Away {label}"
+    home_name, away_name = ('Barcelona', 'Opponent') if home_team_id == 65 else ('Opponent', 'Barcelona')
+    momentum_df = pd.DataFrame({home_column: home_pass_intervals, away_column: away_pass_intervals}).fillna(0)
+    if momentum_df.empty:
+        # A live match before its first pass
+        momentum_df = pd.DataFrame({home_column: [0], away_column: [0]})
 
     # Plot
     # Adjusted Plotting Section
-    fig, ax = plt.subplots(figsize=(24, 14), dpi=150, facecolor="#0A0A2A")
+    scale = RENDER_PROFILES[profile]['scale']
+    fig, ax = plt.subplots(figsize=(24 * scale, 14 * scale), dpi=RENDER_PROFILES[profile]['dpi'], facecolor="#0A0A2A")
 
-    # Plot Barcelona's passes above 50 and the opponent's below 50
-    ax.plot(momentum_df.index, 50 + momentum_df['Home Passes in Final Third'], color=home_color, label='Barcelona Passes in Final Third')
-    ax.plot(momentum_df.index, 50 - momentum_df['Away Passes in Final Third'], color=away_color, label='Opponent Passes in Final Third')
+    # Plot the home side above 50 and the away side below 50
+    ax.plot(momentum_df.index, 50 + momentum_df[home_column], color=home_color, linewidth=1.5 * scale, label=f"{home_name} {label}")
+    ax.plot(momentum_df.index, 50 - momentum_df[away_column], color=away_color, linewidth=1.5 * scale, label=f"{away_name} {label}")
 
     # Fill area between the lines and 50 for a clearer visual separation
-    ax.fill_between(momentum_df.index, 50, 50 + momentum_df['Home Passes in Final Third'], color=home_color, alpha=0.4)
-    ax.fill_between(momentum_df.index, 50, 50 - momentum_df['Away Passes in Final Third'], color=away_color, alpha=0.4)
+    ax.fill_between(momentum_df.index, 50, 50 + momentum_df[home_column], color=home_color, alpha=0.4)
+    ax.fill_between(momentum_df.index, 50, 50 - momentum_df[away_column], color=away_color, alpha=0.4)
     # Add goal markers
     # Add goal markers
     for _, goal in goal_events.iterrows():
@@ -340,12 +328,12 @@ def create_momentum_graph(events_df, match_id, home_team_id, away_team_id, inter
 
         if goal_team == home_team_id:
             # Plot goal for home team directly on the peak of that interval
-            y_position = 50 + momentum_df['Home Passes in Final Third'].get(goal_minute // interval * interval, 0)
-            ax.scatter(goal_minute, y_position, color=home_color, edgecolor="white", s=900, zorder=3, marker='o', label='Goal' if 'Goal' not in ax.get_legend_handles_labels()[1] else "")
+            y_position = 50 + momentum_df[home_column].get(goal_minute // interval * interval, 0)
+            ax.scatter(goal_minute, y_position, color=home_color, edgecolor="white", s=900 * scale ** 2, linewidth=1.5 * scale, zorder=3, marker='o', label='Goal' if 'Goal' not in ax.get_legend_handles_labels()[1] else "")
         else:
             # Plot goal for away team directly on the peak of that interval
-            y_position = 50 - momentum_df['Away Passes in Final Third'].get(goal_minute // interval * interval, 0)
-            ax.scatter(goal_minute, y_position, color=away_color, edgecolor="white", s=900, zorder=3, marker='o', label='Goal' if 'Goal' not in ax.get_legend_handles_labels()[1] else "")
+            y_position = 50 - momentum_df[away_column].get(goal_minute // interval * interval, 0)
+            ax.scatter(goal_minute, y_position, color=away_color, edgecolor="white", s=900 * scale ** 2, linewidth=1.5 * scale, zorder=3, marker='o', label='Goal' if 'Goal' not in ax.get_legend_handles_labels()[1] else "")
 
     
     # Customize appearance
@@ -354,8 +342,8 @@ def create_momentum_graph(events_df, match_id, home_team_id, away_team_id, inter
     ax.spines['left'].set_visible(False)
     ax.spines['right'].set_visible(False)
     ax.set_facecolor("#0A0A2A")
-    ax.axhline(y=50, color="white", linestyle='--', linewidth=0.5)
-    ax.tick_params(colors="white")
+    ax.axhline(y=50, color="white", linestyle='--', linewidth=0.5 * scale)
+    ax.tick_params(colors="white", length=3.5 * scale, width=0.8 * scale)
 
     plt.xticks(momentum_df.index)
     ax.set_yticks([])
@@ -364,7 +352,7 @@ def create_momentum_graph(events_df, match_id, home_team_id, away_team_id, inter
     ax.set_xticks(range(0, int(momentum_df.index.max()) + interval, 10))
     #ax.tick_params(axis='x', labelsize=30, colors='white', labelweight='bold')  # Adjust labelsize as needed
     for label in ax.get_xticklabels():
-        label.set_fontsize(33)  # Set label size
+        label.set_fontsize(33 * scale)  # Set label size
         label.set_color('white')  # Set label color
         label.set_fontweight('bold')  # Set label weight to bold
 
@@ -0,0 +1,143 @@
+# xt.py
+# Expected Threat (xT): the probability that possession in a pitch cell ends in a goal within the next
+# few actions. The grid is fitted from every stored pass and shot, and every successful pass is scored
+# at ingest with the threat it added (xT of the end cell minus xT of the start cell).
+# Run with: python xt.py fit [--no-rescore]
+import argparse
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from pymongo import UpdateOne
+from storage import bulk_write_batches
+from utilities import cell_index
+
+GRID_LENGTH = 16  # Cells along the pitch, towards the opponent's goal
+GRID_WIDTH = 12   # Cells across the pitch
+MAX_ITERATIONS = 100
+TOLERANCE = 1e-6
+
+# Event fields the grid is fitted from
+XT_EVENT_FIELDS = {
+    '_id': 'object', 'match_id': 'int64', 'type': 'object', 'type_outcome': 'object',
+    'x': 'float64', 'y': 'float64', 'end_x': 'float64', 'end_y': 'float64',
+    'is_shot': 'boolean', 'is_goal': 'boolean',
+}
+
+
+def fit_xt_grid(events_df, length=GRID_LENGTH, width=GRID_WIDTH, max_iterations=MAX_ITERATIONS, tolerance=TOLERANCE):
+    """Fit the xT grid, a (length, width) array, from passes and shots.
+
+    Solves xT = shoot * score + move * (T @ xT) by iteration, where T holds the probability that a
+    pass from one cell reaches each other cell; unsuccessful passes lose the ball and add nothing.
+    """
+    cells = length * width
+    is_shot = events_df['is_shot'].fillna(False).astype(bool).to_numpy()
+    is_goal = events_df['is_goal'].fillna(False).astype(bool).to_numpy()
+    is_pass = (events_df['type'] == 'Pass').to_numpy()
+    successful = is_pass & (events_df['type_outcome'] == 'Successful').to_numpy()
+    start = cell_index(events_df['x'], events_df['y'], length, width)
+    end = cell_index(events_df['end_x'], events_df['end_y'], length, width)
+
+    shots = np.bincount(start[is_shot], minlength=cells)
+    goals = np.bincount(start[is_shot & is_goal], minlength=cells)
+    moves = np.bincount(start[is_pass], minlength=cells)
+    transitions = np.zeros((cells, cells))
+    np.add.at(transitions, (start[successful], end[successful]), 1)
+
+    actions = shots + moves
+    shoot_probability = np.divide(shots, actions, out=np.zeros(cells), where=actions > 0)
+    move_probability = np.divide(moves, actions, out=np.zeros(cells), where=actions > 0)
+    score_probability = np.divide(goals, shots, out=np.zeros(cells), where=shots > 0)
+    transitions = np.divide(transitions, moves[:, None], out=np.zeros_like(transitions), where=moves[:, None] > 0)
+
+    shot_value = shoot_probability * score_probability
+    grid = np.zeros(cells)
+    for _ in range(max_iterations):
+        updated = shot_value + move_probability * (transitions @ grid)
+        converged = np.abs(updated - grid).max() < tolerance
+        grid = updated
+        if converged:
+            break
+    return grid.reshape(length, width)
+
+
+def score_xt(events_df, grid):
+    """xT added by each successful pass, NaN for every other event."""
+    length, width = grid.shape
+    flat = grid.ravel()
+    added = flat[cell_index(events_df['end_x'], events_df['end_y'], length, width)] - \
+        flat[cell_index(events_df['x'], events_df['y'], length, width)]
+    successful = (events_df['type'] == 'Pass') & (events_df['type_outcome'] == 'Successful')
+    return pd.Series(added, index=events_df.index).where(successful)
+
+
+def load_xt_grid(db):
+    # The fitted grid, None until `python xt.py fit` has run
+    model = db.xt_model.find_one({'_id': 'grid'})
+    return None if model is None else np.array(model['grid'])
+
+
+def load_xt_version(db):
+    # When the grid was fitted, None until `python xt.py fit` has run. Refitting rescores the stored
+    # passes, so whatever was drawn or cached from their earlier xT is stale
+    model = db.xt_model.find_one({'_id': 'grid'}, {'fitted_at': 1})
+    return None if model is None else model['fitted_at'].isoformat()
+
+
+def save_xt_grid(db, grid, events):
+    db.xt_model.replace_one(
+        {'_id': 'grid'}, {'_id': 'grid', 'grid': grid.tolist(), 'events': int(events), 'fitted_at': datetime.utcnow()},
+        upsert=True
+    )
+
+
+def rescore_stored_events(db, grid, events_df):
+    # Only successful passes carry an xT value, every other event keeps None
+    xt = score_xt(events_df, grid).dropna()
+    operations = [
+        UpdateOne({'_id': event_id}, {'$set': {'xt': float(value)}})
+        for event_id, value in zip(events_df.loc[xt.index, '_id'], xt)
+    ]
+    return bulk_write_batches(db.events, operations)
+
+
+def load_player_xt(db, match_ids=None):
+    # Players ranked by the xT their successful passes added, summed by MongoDB from the stored values
+    match = {'xt': {'$gte': -1}}  # xT added lies in [-1, 1], this skips None and NaN
+    if match_ids is not None:
+        match['match_id'] = {'$in': [int(match_id) for match_id in match_ids]}
+    rows = db.events.aggregate([
+        {'$match': match},
+        {'$group': {'_id': '$player_id', 'team_id': {'$first': '$team_id'}, 'xt': {'$sum': '$xt'},
+                    'passes': {'$sum': 1}}},
+        {'$sort': {'xt': -1}},
+    ])
+    return pd.DataFrame(
+        [{'player_id': row['_id'], 'team_id': row['team_id'], 'xt': row['xt'], 'passes': row['passes']} for row in rows],
+        columns=['player_id', 'team_id', 'xt', 'passes']
+    )
+
+
+def main():
+    from pymongo import MongoClient
+    from data_loader import DB_NAME, get_mongo_uri, read_collection
+
+    parser = argparse.ArgumentParser(description="Expected Threat model")
+    parser.add_argument('command', choices=['fit'])
+    parser.add_argument('--no-rescore', action='store_true', help="only fit the grid, keep the stored event xT")
+    args = parser.parse_args()
+
+    client = MongoClient(get_mongo_uri())
+    db = client[DB_NAME]
+    events_df = read_collection(db.events, XT_EVENT_FIELDS)
+    grid = fit_xt_grid(events_df)
+    save_xt_grid(db, grid, len(events_df))
+    print(f"Fitted a {grid.shape[0]}x{grid.shape[1]} xT grid from {len(events_df)} events, max xT {grid.max():.3f}")
+    if not args.no_rescore:
+        rescore_stored_events(db, grid, events_df)
+        print("Rescored the stored events")
+    client.close()
+
+
+if __name__ == "__main__":
+    main()